@@ -0,0 +1,101 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Compare the stdlib asyncio loop with uvloop on the mock-server load simulation.
+
+对每个房间规模，依次用各事件循环运行 load_simulation.py 的完整主循环(共用同一个模拟平台服务)，对比：
+  - 每轮耗时与每轮 CPU 时间(调度跟得上时每轮耗时约等于检测间隔，CPU 时间更能反映事件循环开销)
+  - 平均调度延迟与平均检测耗时
+  - 峰值 RSS
+未安装 uvloop 时该项被跳过。
+
+用法:
+    python benchmarks/event_loop_benchmark.py --rooms 1000 10000 --cycles 3 --output loops.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import load_simulation  # noqa: E402
+from src.event_loop import uvloop_available  # noqa: E402
+
+
+def summarize(result: dict) -> Dict[str, float]:
+    cycles = result['cycles'] or [{'seconds': 0, 'cpu_seconds': 0}]
+    checks = sum(p['checks'] for p in result['platforms'].values())
+    check_seconds = sum(p['checks'] * p['mean_seconds'] for p in result['platforms'].values())
+    return {
+        'cycle_seconds': round(sum(c['seconds'] for c in cycles) / len(cycles), 3),
+        'cpu_seconds': round(sum(c['cpu_seconds'] for c in cycles) / len(cycles), 3),
+        'schedule_lag_seconds': result['schedule_lag_mean_seconds'],
+        'check_seconds': round(check_seconds / max(1, checks), 3),
+        'peak_rss_mb': result['peak_rss_mb'],
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='标准库事件循环与 uvloop 对比')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1000, 10000], help='直播间数量，可多个')
+    parser.add_argument('--loops', nargs='+', default=['asyncio', 'uvloop'], choices=['asyncio', 'uvloop'])
+    parser.add_argument('--cycles', type=int, default=3, help='每个规模运行的检测轮数')
+    parser.add_argument('--interval', type=int, default=10, help='检测间隔(秒)')
+    parser.add_argument('--mock-port', type=int, default=8900)
+    parser.add_argument('--mock-args', default='', help='透传给 mock_platform_server.py 的参数')
+    parser.add_argument('--timeout', type=float, default=0, help='单次压测的超时时间(秒)')
+    parser.add_argument('--output', default='', help='结果 JSON 输出路径')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    loops = [loop for loop in args.loops if loop != 'uvloop' or uvloop_available()]
+    if len(loops) < len(args.loops):
+        print("未安装 uvloop，跳过 uvloop", file=sys.stderr)
+
+    mock = load_simulation._start_mock(args.mock_port, args.mock_args)
+    mock_url = f'http://127.0.0.1:{args.mock_port}'
+    results: List[dict] = []
+    print(f"{'规模':>8} {'事件循环':>8} {'每轮(s)':>8} {'CPU/轮(s)':>10} {'调度延迟(s)':>11} "
+          f"{'检测耗时(s)':>11} {'RSS(MB)':>8}")
+    try:
+        for rooms in args.rooms:
+            baseline = None
+            for loop in loops:
+                sim_args = load_simulation.parse_args([
+                    '--rooms', str(rooms), '--cycles', str(args.cycles), '--interval', str(args.interval),
+                    '--timeout', str(args.timeout), '--loop', loop])
+                result = load_simulation.run_size(rooms, sim_args, mock_url)
+                if result is None:
+                    continue
+                summary = summarize(result)
+                summary.update(rooms=rooms, loop=result.get('loop', loop), outcomes=result['outcomes'])
+                if baseline is None:
+                    baseline = summary
+                else:
+                    # CPU 时间相对第一个事件循环的比值
+                    summary['cpu_ratio'] = round(summary['cpu_seconds'] / max(1e-9, baseline['cpu_seconds']), 3)
+                results.append(summary)
+                print(f"{rooms:>8} {summary['loop']:>8} {summary['cycle_seconds']:>8.2f} "
+                      f"{summary['cpu_seconds']:>10.2f} {summary['schedule_lag_seconds']:>11.3f} "
+                      f"{summary['check_seconds']:>11.3f} {summary['peak_rss_mb']:>8.1f}", flush=True)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    if args.output:
+        report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+                  'interval': args.interval, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Large-scale load simulation of the real monitor loop against the mock platform server.
+
+对每个房间规模(默认 1k/10k/50k)：
+  1. 在临时工作目录生成 config/config.yml 与包含对应数量直播间的 config/urls.yml
+  2. 启动子进程，将 async_req 的请求转发到本地模拟平台服务，运行真正的 main() 主循环若干轮
+  3. 记录每轮耗时、CPU 时间、RSS、调度延迟与检测结果分布
+每轮指所有直播间各完成一次检测，调度跟得上时约等于检测间隔，落后时调度延迟会持续增长。
+结果输出为 JSON，可用 --output 保存，便于对比不同版本的扩展性。
+
+用法:
+    python benchmarks/load_simulation.py --rooms 1000 10000 50000 --cycles 3 --output load.json
+模拟平台服务的参数(开播比例、延迟、错误率、429 比例)可通过 --mock-args 透传，或用 --mock-url 指向已启动的服务。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(ROOT, 'benchmarks', 'mock_platform_server.py')
+
+# 平台 -> (URL 模板, 权重)
+PLATFORM_URLS = {
+    'douyin': ('https://live.douyin.com/{id}', 30),
+    'bilibili': ('https://live.bilibili.com/{id}', 25),
+    'huya': ('https://www.huya.com/{id}', 15),
+    'douyu': ('https://www.douyu.com/{id}', 15),
+    'tiktok': ('https://www.tiktok.com/@user{id}/live', 5),
+    'xiaohongshu': ('https://www.xiaohongshu.com/user/profile/{id}?host_id={id}', 10),
+}
+
+
+def generate_urls(rooms: int, platforms: List[str], high_ratio: float = 0, low_ratio: float = 0) -> dict:
+    """按权重生成直播间列表，平台交错排列，按比例设置高/低优先级"""
+    weights = [(p, PLATFORM_URLS[p][1]) for p in platforms]
+    total = sum(w for _, w in weights)
+    items = []
+    for index in range(rooms):
+        # 乘以大质数打散顺序，使任意前缀中各平台比例都接近权重
+        slot = (index * 7919) % total
+        for platform, weight in weights:
+            if slot < weight:
+                break
+            slot -= weight
+        room_id = 100000 + index
+        item = {'url': PLATFORM_URLS[platform][0].format(id=room_id), 'name': f'{platform}-{room_id}'}
+        # 同样用大质数打散，使各平台中的优先级比例接近
+        position = (index * 104729) % 1000 / 1000
+        if position < high_ratio:
+            item['priority'] = 'high'
+        elif position < high_ratio + low_ratio:
+            item['priority'] = 'low'
+        items.append(item)
+    return {'urls': items}
+
+
+def write_workdir(workdir: str, rooms: int, platforms: List[str], interval: int, verbose: bool = False,
+                  shards: int = 0, high_ratio: float = 0, low_ratio: float = 0) -> None:
+    os.makedirs(os.path.join(workdir, 'config'), exist_ok=True)
+    config = {
+        'global': {'use_proxy': False, 'clean_emoji': True},
+        'push': {'channels': [], 'check_interval': interval, 'confirm_count': 2, 'confirm_delay': 5},
+        'report': {'slow_check_threshold': 0, 'top_n': 5},
+        'profiling': {'enabled': False},
+        'logging': {'console_level': 'DEBUG' if verbose else 'WARNING', 'file_level': 'INFO'},
+        'sharding': {'workers': shards},
+    }
+    with open(os.path.join(workdir, 'config', 'config.yml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    with open(os.path.join(workdir, 'config', 'urls.yml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(generate_urls(rooms, platforms, high_ratio, low_ratio), f, allow_unicode=True)
+
+
+def _raise_fd_limit() -> None:
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+async def _run_worker(cycles: int, mock_url: str, rooms: int, verbose: bool) -> dict:
+    sys.path.insert(0, ROOT)
+    import main as monitor
+    from src.http_clients import async_http
+    from src.logger import logger
+    from src.memory import process_rss
+    from src.metrics import CHECK_LATENCY, CHECK_RESULTS, CYCLE_DURATION, CYCLES, HTTP_REQUESTS, SCHEDULE_LAG
+    from src import event_loop
+    from src.scheduler import PRIORITIES
+
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+    async_http.UPSTREAM_OVERRIDE = mock_url
+    results = []
+    task = asyncio.create_task(monitor.main())
+    done = 0
+    last_sum = 0.0
+    cpu_start = time.process_time()
+    peak_rss = 0
+    try:
+        while done < cycles:
+            await asyncio.sleep(0.2)
+            peak_rss = max(peak_rss, process_rss())
+            if task.done():
+                task.result()
+            if CYCLES.get() > done:
+                done = int(CYCLES.get())
+                cycle_sum = CYCLE_DURATION.get_sum()
+                cpu_now = time.process_time()
+                results.append({
+                    'cycle': done,
+                    'seconds': round(cycle_sum - last_sum, 3),
+                    'cpu_seconds': round(cpu_now - cpu_start, 3),
+                    'rss_mb': round(process_rss() / 1024 / 1024, 1),
+                })
+                last_sum, cpu_start = cycle_sum, cpu_now
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    outcomes: Dict[str, int] = {}
+    for (_, outcome), value in CHECK_RESULTS.samples().items():
+        outcomes[outcome] = outcomes.get(outcome, 0) + int(value)
+    http: Dict[str, int] = {}
+    for (_, outcome), value in HTTP_REQUESTS.samples().items():
+        http[outcome] = http.get(outcome, 0) + int(value)
+    platforms = {}
+    for platform in sorted({labels[0] for labels in CHECK_RESULTS.samples()}):
+        count = CHECK_LATENCY.get_count(platform)
+        platforms[platform] = {'checks': count,
+                               'mean_seconds': round(CHECK_LATENCY.get_sum(platform) / max(1, count), 3)}
+    lag_count = sum(SCHEDULE_LAG.get_count(priority) for priority in PRIORITIES)
+    schedule_lag = round(sum(SCHEDULE_LAG.get_sum(priority) for priority in PRIORITIES) / max(1, lag_count), 3)
+    priority_lag = {priority: round(SCHEDULE_LAG.get_sum(priority) / SCHEDULE_LAG.get_count(priority), 3)
+                    for priority in PRIORITIES if SCHEDULE_LAG.get_count(priority)}
+    return {'rooms': rooms, 'loop': event_loop.current(), 'cycles': results, 'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+            'schedule_lag_mean_seconds': schedule_lag, 'schedule_lag_by_priority': priority_lag,
+            'outcomes': outcomes, 'http': http, 'platforms': platforms}
+
+
+def worker_main(args: argparse.Namespace) -> None:
+    """子进程入口：在工作目录中运行 main() 并输出 JSON 结果"""
+    _raise_fd_limit()
+    os.chdir(args.workdir)
+    sys.path.insert(0, ROOT)
+    from src import event_loop
+    event_loop.install(args.loop)
+    result = asyncio.run(_run_worker(args.cycles, args.mock_url, args.rooms[0], args.verbose))
+    print('RESULT ' + json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def _start_mock(port: int, extra_args: str) -> subprocess.Popen:
+    command = [sys.executable, MOCK_SERVER, '--port', str(port)] + shlex.split(extra_args)
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # 等待服务启动
+    return process
+
+
+def run_size(rooms: int, args: argparse.Namespace, mock_url: str) -> Optional[dict]:
+    with tempfile.TemporaryDirectory(prefix=f'live-load-{rooms}-') as workdir:
+        write_workdir(workdir, rooms, args.platforms, args.interval, args.verbose, args.shards,
+                      args.high_ratio, args.low_ratio)
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--workdir', workdir,
+                   '--rooms', str(rooms), '--cycles', str(args.cycles), '--mock-url', mock_url]
+        if args.verbose:
+            command.append('--verbose')
+        started = time.perf_counter()
+        # 多进程模式下检测进程通过环境变量转发请求、选择事件循环
+        env = dict(os.environ, LIVE_HTTP_UPSTREAM=mock_url, LIVE_EVENT_LOOP=args.loop)
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, env=env,
+                                   timeout=args.timeout or None)
+        for line in completed.stdout.splitlines():
+            if line.startswith('RESULT '):
+                result = json.loads(line[len('RESULT '):])
+                result['wall_seconds'] = round(time.perf_counter() - started, 1)
+                return result
+    print(f"{rooms} 个直播间的压测未产生结果，退出码 {completed.returncode}", file=sys.stderr)
+    return None
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='监控主循环规模压测')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1000, 10000, 50000], help='直播间数量，可多个')
+    parser.add_argument('--cycles', type=int, default=3, help='每个规模运行的检测轮数')
+    parser.add_argument('--interval', type=int, default=10, help='检测间隔(秒)，main() 最小为 10')
+    parser.add_argument('--platforms', nargs='+', default=list(PLATFORM_URLS), choices=list(PLATFORM_URLS))
+    parser.add_argument('--mock-url', default='', help='已启动的模拟平台服务地址，为空时自动启动')
+    parser.add_argument('--mock-port', type=int, default=8900)
+    parser.add_argument('--mock-args', default='', help='透传给 mock_platform_server.py 的参数')
+    parser.add_argument('--timeout', type=float, default=0, help='单个规模的超时时间(秒)')
+    parser.add_argument('--output', default='', help='结果 JSON 输出路径')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='检测进程数(sharding.workers)，多进程时只统计协调进程的 CPU、RSS 与检测结果')
+    parser.add_argument('--high-ratio', type=float, default=0, help='高优先级直播间比例')
+    parser.add_argument('--low-ratio', type=float, default=0, help='低优先级直播间比例')
+    parser.add_argument('--loop', default='asyncio', choices=['asyncio', 'uvloop', 'auto'], help='事件循环实现')
+    parser.add_argument('--verbose', action='store_true', help='输出监控程序的完整日志')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', default='', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.worker:
+        worker_main(args)
+        return
+
+    mock = None
+    mock_url = args.mock_url
+    if not mock_url:
+        mock = _start_mock(args.mock_port, args.mock_args)
+        mock_url = f'http://127.0.0.1:{args.mock_port}'
+    try:
+        results = []
+        for rooms in args.rooms:
+            print(f"=== {rooms} 个直播间 ===", flush=True)
+            result = run_size(rooms, args, mock_url)
+            if result is None:
+                continue
+            results.append(result)
+            for cycle in result['cycles']:
+                print(f"  第{cycle['cycle']}轮 {cycle['seconds']:.2f}s CPU {cycle['cpu_seconds']:.2f}s "
+                      f"RSS {cycle['rss_mb']}MB", flush=True)
+            print(f"  结果 {result['outcomes']} HTTP {result['http']} 峰值 RSS {result['peak_rss_mb']}MB "
+                  f"平均调度延迟 {result['schedule_lag_mean_seconds']}s {result['schedule_lag_by_priority']}", flush=True)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+              'platforms': args.platforms, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
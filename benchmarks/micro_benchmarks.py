@@ -0,0 +1,301 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Micro-benchmarks for CPU hot spots with JSON output and baseline comparison.
+
+覆盖签名(ab_sign / SM3 / RC4)、虎牙防盗链参数、m3u8 解析、名称清理、推送内容渲染、
+YAML 配置加载以及平台响应的 JSON 解码。每项自动校准迭代次数，重复多轮取中位数。
+
+用法:
+    python benchmarks/micro_benchmarks.py                          # 运行全部并打印结果
+    python benchmarks/micro_benchmarks.py -k sign                  # 只运行名称包含 sign 的项
+    python benchmarks/micro_benchmarks.py --save baseline.json     # 保存为基线
+    python benchmarks/micro_benchmarks.py --compare baseline.json  # 与基线对比，变慢超过阈值时标记
+JSON 解码项优先使用 HTTP 录制夹具(fixtures/http)，没有夹具时使用模拟平台服务生成的响应。
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from src.logger import logger  # noqa: E402
+
+logger.remove()
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """注册基准项，被装饰的函数负责准备数据并返回待测的无参函数"""
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+# --- 签名 ---
+
+DOUYIN_QUERY = ('aid=6383&app_name=douyin_web&live_id=1&device_platform=web&language=zh-CN&browser_language=zh-CN'
+                '&browser_platform=Win32&browser_name=Chrome&browser_version=116.0.0.0&web_rid=335354047186&msToken=')
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/116.0.5845.97 Safari/537.36 Core/1.116.567.400 QQBrowser/19.7.6764.400')
+
+
+@benchmark('sign.ab_sign')
+def bench_ab_sign():
+    from src.ab_sign import ab_sign
+    return lambda: ab_sign(DOUYIN_QUERY, USER_AGENT)
+
+
+@benchmark('sign.sm3_sum')
+def bench_sm3_sum():
+    from src.ab_sign import SM3
+    sm3 = SM3()
+    return lambda: sm3.sum(DOUYIN_QUERY + 'dhzx')
+
+
+@benchmark('sign.rc4_encrypt')
+def bench_rc4_encrypt():
+    from src.ab_sign import rc4_encrypt
+    return lambda: rc4_encrypt(DOUYIN_QUERY, USER_AGENT)
+
+
+@benchmark('huya.anti_code')
+def bench_huya_anti_code():
+    import base64
+    import urllib.parse
+    from src.stream import get_huya_anti_code
+    fm = urllib.parse.quote(base64.b64encode(b'DWq8BcJ3h6DJt6TY_$0_$1_$2_$3').decode())
+    anti_code = f'wsSecret=0&wsTime=0&fm={fm}&ctype=huya_live&fs=bgct&t=100'
+    return lambda: get_huya_anti_code(anti_code, '1199561386366-1199561386366-5325371447286202368-2399123149188-10057-A-0-1')
+
+
+# --- 解析 ---
+
+M3U8_MASTER = '#EXTM3U\n' + ''.join(
+    f'#EXT-X-STREAM-INF:PROGRAM-ID=1,BANDWIDTH={bandwidth},RESOLUTION={width}x{height}\n'
+    f'https://pull.example.com/live/stream_{height}.m3u8?token=abcdef&expire=1700000000\n'
+    for bandwidth, width, height in ((800000, 640, 360), (2500000, 1920, 1080), (1400000, 1280, 720),
+                                     (500000, 480, 270), (4000000, 2560, 1440))
+)
+
+
+@benchmark('parse.play_url_list')
+def bench_play_url_list():
+    from src.spider import parse_play_url_list
+    return lambda: parse_play_url_list(M3U8_MASTER)
+
+
+NAMES = ['🔥主播小明🎮の直播间✨', '★B站UP主★（官方）', 'Normal Name 123', '虎牙/斗鱼 双栖:主播?', '😀😃😄😁😆😅😂🤣']
+
+
+@benchmark('parse.remove_emojis')
+def bench_remove_emojis():
+    from src.utils import remove_emojis
+    return lambda: [remove_emojis(name, '_') for name in NAMES]
+
+
+@benchmark('parse.clean_name')
+def bench_clean_name():
+    from main import PlatformDetector
+    detector = PlatformDetector({'clean_emoji': True})
+    return lambda: [detector.clean_name(name) for name in NAMES]
+
+
+# --- 推送与配置 ---
+
+@benchmark('push.build_content')
+def bench_build_content():
+    from main import ConfigManager, PushHandler, build_push_config
+    config = build_push_config(ConfigManager({'push': {
+        'custom_start_msg': '[直播间名称] 已开播！\n[标题]\n[时间] [平台] 观看人数 [观看人数]'}}))
+    handler = PushHandler(config)
+    info = {'title': '今晚一起来打游戏', 'platform': '抖音', 'viewers': '1.2万', 'live_since': time.time() - 3600}
+    return lambda: handler._build_content('主播小明', 'https://live.douyin.com/123456', '开播啦', info)
+
+
+def _write_urls_yml(directory: str, rooms: int) -> str:
+    from load_simulation import generate_urls, PLATFORM_URLS
+    path = os.path.join(directory, 'urls.yml')
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(generate_urls(rooms, list(PLATFORM_URLS)), f, allow_unicode=True)
+    return path
+
+
+@benchmark('config.load_config_yml')
+def bench_load_config():
+    from main import ConfigManager
+    path = os.path.join(ROOT, 'config', 'config.example.yml')
+
+    def run():
+        with open(path, encoding='utf-8') as f:
+            return ConfigManager(yaml.safe_load(f))
+    return run
+
+
+@benchmark('config.load_urls_1k')
+def bench_load_urls():
+    import main
+    directory = tempfile.mkdtemp(prefix='live-bench-')
+    atexit.register(shutil.rmtree, directory, True)
+    main.URL_CONFIG_FILE = _write_urls_yml(directory, 1000)
+    return main.load_url_config
+
+
+# --- JSON 解码 ---
+
+def _recorded_payloads() -> List[str]:
+    """读取 HTTP 录制夹具中的 JSON 响应体"""
+    payloads = []
+    for path in glob.glob(os.path.join(ROOT, 'fixtures', 'http', '*', '*.json')):
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = json.load(f).get('text', '')
+            json.loads(text)
+            payloads.append(text)
+        except (OSError, ValueError):
+            continue
+    return payloads
+
+
+def _mock_payloads() -> List[str]:
+    from mock_platform_server import MockOptions, MockPlatforms
+    mock = MockPlatforms(MockOptions(live_ratio=0.5))
+    payloads = []
+    for room in range(20):
+        payloads.append(mock.douyin('/webcast/room/web/enter/', {'web_rid': str(room)})[2])
+        payloads.append(mock.bilibili('/room/v1/Room/room_init', {'id': str(room)})[2])
+        payloads.append(mock.douyu('www.douyu.com', f'/betard/{room}', {})[2])
+    return payloads
+
+
+@benchmark('json.decode_payloads')
+def bench_json_decode():
+    payloads = _recorded_payloads() or _mock_payloads()
+    return lambda: [json.loads(p) for p in payloads]
+
+
+# --- 运行与对比 ---
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    """自动校准迭代次数，使每轮耗时不少于 min_time，返回单次调用耗时(微秒)统计"""
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'median_us': round(statistics.median(timings) * 1e6, 3),
+        'min_us': round(min(timings) * 1e6, 3),
+        'mean_us': round(statistics.fmean(timings) * 1e6, 3),
+        'stdev_us': round(statistics.pstdev(timings) * 1e6, 3),
+        'iterations': number,
+        'repeat': repeat,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """对比中位数，返回变慢超过阈值的项"""
+    regressions = []
+    print(f"\n{'名称':<26}{'基线(us)':>12}{'当前(us)':>12}{'变化':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<28}{'-':>12}{result['median_us']:>12.2f}{'新增':>10}")
+            continue
+        change = (result['median_us'] - base['median_us']) / base['median_us'] * 100
+        mark = ''
+        if change > threshold:
+            mark = ' 变慢'
+            regressions.append(name)
+        elif change < -threshold:
+            mark = ' 变快'
+        print(f"{name:<28}{base['median_us']:>12.2f}{result['median_us']:>12.2f}{change:>+9.1f}%{mark}")
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='CPU 热点微基准测试')
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的项')
+    parser.add_argument('--repeat', type=int, default=7, help='重复轮数')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每轮最短耗时(秒)')
+    parser.add_argument('--output', default='', help='结果 JSON 输出路径')
+    parser.add_argument('--save', default='', help='将结果保存为基线文件')
+    parser.add_argument('--compare', default='', help='与基线文件对比')
+    parser.add_argument('--threshold', type=float, default=10, help='判定变慢/变快的百分比阈值')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在变慢项时以非零状态退出')
+    parser.add_argument('--list', action='store_true', help='列出所有基准项')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    results: Dict[str, dict] = {}
+    for name in names:
+        func = BENCHMARKS[name]()
+        results[name] = measure(func, args.repeat, args.min_time)
+        r = results[name]
+        print(f"{name:<28}{r['median_us']:>12.2f} us  (min {r['min_us']:.2f}, ±{r['stdev_us']:.2f}, "
+              f"{r['iterations']} x {r['repeat']})", flush=True)
+
+    report = {
+        'meta': {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+                 'platform': platform.platform(), 'machine': platform.machine(), 'revision': _git_revision()},
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get('results', {}), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
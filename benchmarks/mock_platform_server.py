@@ -0,0 +1,291 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Local mock server imitating the platform endpoints used by the spiders.
+
+模拟抖音、B站、虎牙、斗鱼、TikTok、小红书的检测接口，返回与真实接口结构一致的最小数据。
+配合 async_req 的 LIVE_HTTP_UPSTREAM 环境变量使用：所有请求被转发到本服务，
+原始域名通过 X-Forwarded-Host 请求头传递。
+
+每个直播间的开播状态由 (平台, 房间号, 时间片) 的哈希决定，结果确定且会随时间片切换产生开播/关播，
+可配置开播比例、响应延迟、错误率与 429 限流比例。GET /__stats 返回请求统计。
+
+用法:
+    python benchmarks/mock_platform_server.py --port 8900 --live-ratio 0.3 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+import urllib.parse
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+
+class MockOptions:
+    def __init__(self, live_ratio: float = 0.3, flip_period: float = 600, latency_ms: float = 50,
+                 latency_jitter_ms: float = 50, error_rate: float = 0.01, rate_limit_rate: float = 0.01,
+                 seed: int = 0):
+        self.live_ratio = live_ratio
+        self.flip_period = flip_period
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+
+
+def _unit(*parts) -> float:
+    """把若干值哈希为 [0, 1) 内的确定性数值"""
+    digest = hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+class MockPlatforms:
+    def __init__(self, options: MockOptions):
+        self.options = options
+        self.stats: Counter = Counter()
+        self.started = time.time()
+
+    # --- 状态模型 ---
+
+    def is_live(self, platform: str, room: str) -> bool:
+        """每个房间的时间片相位不同，避免所有房间同时切换状态"""
+        period = self.options.flip_period
+        phase_offset = _unit(self.options.seed, 'phase', platform, room) * period
+        epoch = int((time.time() + phase_offset) // period) if period > 0 else 0
+        return _unit(self.options.seed, platform, room, epoch) < self.options.live_ratio
+
+    def live_start(self, platform: str, room: str) -> int:
+        """当前时间片的开始时间，作为开播时间返回，用于测量检测延迟"""
+        period = self.options.flip_period
+        if period <= 0:
+            return int(self.started)
+        phase_offset = _unit(self.options.seed, 'phase', platform, room) * period
+        return int((time.time() + phase_offset) // period * period - phase_offset)
+
+    @staticmethod
+    def nickname(platform: str, room: str) -> str:
+        return f"{platform}主播{room}"
+
+    # --- 各平台响应 ---
+
+    def douyin(self, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        if not path.startswith('/webcast/room/web/enter'):
+            return 404, 'text/plain', 'not found'
+        room = query.get('web_rid', '0')
+        live = self.is_live('douyin', room)
+        room_data = {'status': 2 if live else 4, 'title': f'抖音直播间{room}',
+                     'user_count_str': str(int(_unit(room) * 10000)), 'id_str': room}
+        if live:
+            room_data['create_time'] = self.live_start('douyin', room)
+            room_data['stream_url'] = {'live_core_sdk_data': {}, 'pull_datas': {},
+                                       'flv_pull_url': {}, 'hls_pull_url_map': {}}
+        body = {'data': {'data': [room_data], 'user': {'nickname': self.nickname('douyin', room)}},
+                'status_code': 0}
+        return 200, 'application/json', json.dumps(body, ensure_ascii=False)
+
+    def bilibili(self, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        if path.startswith('/room/v1/Room/room_init'):
+            room = query.get('id', '0')
+            live = self.is_live('bilibili', room)
+            live_time = time.strftime('%Y-%m-%d %H:%M:%S',
+                                      time.gmtime(self.live_start('bilibili', room) + 8 * 3600)) if live else '0000-00-00 00:00:00'
+            body = {'code': 0, 'data': {'room_id': int(room) if room.isdigit() else 0,
+                                        'uid': room, 'live_status': 1 if live else 0, 'live_time': live_time}}
+        elif path.startswith('/live_user/v1/Master/info'):
+            uid = query.get('uid', '0')
+            body = {'code': 0, 'data': {'info': {'uid': uid, 'uname': self.nickname('bilibili', uid)}}}
+        elif path.startswith('/xlive/web-room/v1/index/getH5InfoByRoom'):
+            room = query.get('room_id', '0')
+            body = {'code': 0, 'data': {'room_info': {'title': f'B站直播间{room}'}}}
+        else:
+            return 404, 'text/plain', 'not found'
+        return 200, 'application/json', json.dumps(body, ensure_ascii=False)
+
+    def huya(self, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        room = path.strip('/') or '0'
+        live = self.is_live('huya', room)
+        stream_list = []
+        if live:
+            fm = urllib.parse.quote(base64.b64encode(b'DWq8BcJ3h6DJt6TY_$0_$1_$2_$3').decode())
+            stream_list.append({
+                'sFlvUrl': 'http://al.flv.huya.com/src', 'sStreamName': f'mock-{room}', 'sFlvUrlSuffix': 'flv',
+                'sHlsUrl': 'http://al.hls.huya.com/src', 'sHlsUrlSuffix': 'm3u8',
+                'sFlvAntiCode': f'wsSecret=0&wsTime=0&fm={fm}&ctype=huya_live&fs=bgct&t=100',
+            })
+        stream = {'data': [{'gameLiveInfo': {'introduction': f'虎牙直播间{room}',
+                                             'nick': self.nickname('huya', room)},
+                            'gameStreamInfoList': stream_list}],
+                  'vMultiStreamInfo': []}
+        html = (f'<html><body><script>var hyPlayerConfig = {{stream: {json.dumps(stream, ensure_ascii=False)[:-1]},'
+                f'"iWebDefaultBitRate": 0}}}};</script></body></html>')
+        return 200, 'text/html', html
+
+    def douyu(self, host: str, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        if host.startswith('m.'):
+            rid = path.strip('/') or '0'
+            context = {'pageProps': {'room': {'roomInfo': {'roomInfo': {'rid': rid}}}}}
+            html = (f'<html><script id="vike_pageContext" type="application/json">'
+                    f'{json.dumps(context)}</script></html>')
+            return 200, 'text/html', html
+        match = re.match(r'/betard/(\w+)', path)
+        if not match:
+            return 404, 'text/plain', 'not found'
+        rid = match.group(1)
+        live = self.is_live('douyu', rid)
+        body = {'room': {'room_id': rid, 'nickname': self.nickname('douyu', rid), 'videoLoop': 0,
+                         'show_status': 1 if live else 2, 'room_name': f'斗鱼直播间{rid}',
+                         'show_time': self.live_start('douyu', rid) if live else 0}}
+        return 200, 'application/json', json.dumps(body, ensure_ascii=False)
+
+    def tiktok(self, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        match = re.match(r'/@([^/]+)', path)
+        user = match.group(1) if match else '0'
+        live = self.is_live('tiktok', user)
+        state = {'LiveRoom': {'liveRoomUserInfo': {
+            'user': {'nickname': self.nickname('tiktok', user), 'uniqueId': user, 'status': 2 if live else 4},
+            'liveRoom': {'title': f'TikTok live {user}'},
+        }}}
+        html = (f'<html><script id="SIGI_STATE" type="application/json">'
+                f'{json.dumps(state, ensure_ascii=False)}</script></html>')
+        return 200, 'text/html', html
+
+    def xiaohongshu(self, path: str, query: Dict[str, str]) -> Tuple[int, str, str]:
+        match = re.match(r'/user/profile/([^/?]+)', path)
+        user = query.get('host_id') or (match.group(1) if match else '0')
+        name = self.nickname('xiaohongshu', user)
+        if self.is_live('xiaohongshu', user):
+            deeplink = 'xhsdiscover://live?' + urllib.parse.urlencode({
+                'host_nickname': name, 'flvUrl': f'http://live-source-play.xhscdn.com/live/{user}.flv'})
+            state = {'liveStream': {'liveStatus': 'success', 'roomData': {'roomInfo': {
+                'roomTitle': f'小红书直播间{user}', 'deeplink': deeplink}}}}
+        else:
+            state = {'liveStream': None}
+        html = (f'<html><head><title>{name} - 小红书</title></head>'
+                f'<script>window.__INITIAL_STATE__={json.dumps(state, ensure_ascii=False)}</script></html>')
+        return 200, 'text/html', html
+
+    def route(self, host: str, target: str) -> Tuple[str, int, str, str]:
+        """返回 (平台, 状态码, Content-Type, 响应体)"""
+        parts = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        path = parts.path
+        if 'douyin' in host:
+            return ('douyin',) + self.douyin(path, query)
+        if 'bilibili' in host:
+            return ('bilibili',) + self.bilibili(path, query)
+        if 'huya' in host:
+            return ('huya',) + self.huya(path, query)
+        if 'douyu' in host:
+            return ('douyu',) + self.douyu(host, path, query)
+        if 'tiktok' in host:
+            return ('tiktok',) + self.tiktok(path, query)
+        if 'xiaohongshu' in host:
+            return ('xiaohongshu',) + self.xiaohongshu(path, query)
+        return 'unknown', 404, 'text/plain', 'unknown host'
+
+    async def respond(self, host: str, target: str) -> Tuple[int, str, str]:
+        if target.startswith('/__stats'):
+            stats = {'uptime': round(time.time() - self.started, 1),
+                     'requests': {f'{k[0]}:{k[1]}': v for k, v in sorted(self.stats.items())}}
+            return 200, 'application/json', json.dumps(stats)
+
+        options = self.options
+        delay = options.latency_ms + random.random() * options.latency_jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        roll = random.random()
+        if roll < options.rate_limit_rate:
+            platform, status, content_type, body = self.route(host, target)[0], 429, 'text/plain', 'Too Many Requests'
+        elif roll < options.rate_limit_rate + options.error_rate:
+            platform, status, content_type, body = self.route(host, target)[0], 500, 'text/plain', 'Internal Error'
+        else:
+            platform, status, content_type, body = self.route(host, target)
+        self.stats[(platform, status)] += 1
+        return status, content_type, body
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str]]]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) < 2:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line or line in (b'\r\n', b'\n'):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length:
+        await reader.readexactly(length)
+    return parts[0], parts[1], headers
+
+
+async def serve(options: MockOptions, host: str = '127.0.0.1', port: int = 8900) -> asyncio.AbstractServer:
+    platforms = MockPlatforms(options)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await _read_request(reader)
+            if request is None:
+                return
+            _, target, headers = request
+            origin = headers.get('x-forwarded-host') or headers.get('host', '')
+            status, content_type, body = await platforms.respond(origin.split(':')[0], target)
+            payload = body.encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status} MOCK\r\nContent-Type: {content_type}; charset=utf-8\r\n'
+                f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + payload
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port, backlog=8192)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='本地模拟平台服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--live-ratio', type=float, default=0.3, help='开播房间比例')
+    parser.add_argument('--flip-period', type=float, default=600, help='状态切换时间片(秒)，0 表示不切换')
+    parser.add_argument('--latency-ms', type=float, default=50, help='基础响应延迟(毫秒)')
+    parser.add_argument('--latency-jitter-ms', type=float, default=50, help='额外随机延迟上限(毫秒)')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='返回 500 的比例')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.01, help='返回 429 的比例')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def options_from_args(args: argparse.Namespace) -> MockOptions:
+    return MockOptions(live_ratio=args.live_ratio, flip_period=args.flip_period, latency_ms=args.latency_ms,
+                       latency_jitter_ms=args.latency_jitter_ms, error_rate=args.error_rate,
+                       rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    server = await serve(options_from_args(args), args.host, args.port)
+    print(f"mock platform server listening on http://{args.host}:{args.port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_main(parse_args()))
+    except KeyboardInterrupt:
+        pass
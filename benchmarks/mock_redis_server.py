@@ -0,0 +1,140 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Minimal in-memory Redis stand-in for the coordination backend.
+
+只实现 src/coordination.py 用到的命令：PING、AUTH、SELECT、GET、MGET、SET [NX|XX] [PX|EX] [GET]、
+DEL、PTTL、KEYS，数据只在内存中，单进程内所有连接共享。用于本地验证多实例协调，不用于生产。
+
+用法:
+    python benchmarks/mock_redis_server.py --port 6390
+    # config.yml: coordination.backend: redis, coordination.url: redis://127.0.0.1:6390/0
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class Store:
+    def __init__(self):
+        # key -> (value, 过期时间 time.monotonic()，None 为不过期)
+        self.data: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return item[0]
+
+    def execute(self, args: List[str]):
+        command = args[0].upper()
+        if command == 'PING':
+            return 'PONG'
+        if command in ('AUTH', 'SELECT'):
+            return 'OK'
+        if command == 'GET':
+            return self.get(args[1])
+        if command == 'MGET':
+            return [self.get(key) for key in args[1:]]
+        if command == 'DEL':
+            return sum(1 for key in args[1:] if self.get(key) is not None and self.data.pop(key))
+        if command == 'PTTL':
+            if self.get(args[1]) is None:
+                return -2
+            expires = self.data[args[1]][1]
+            return -1 if expires is None else int((expires - time.monotonic()) * 1000)
+        if command == 'KEYS':
+            return [key for key in list(self.data) if self.get(key) is not None and fnmatch.fnmatchcase(key, args[1])]
+        if command == 'SET':
+            return self._set(args[1], args[2], [arg.upper() for arg in args[3:]], args[3:])
+        raise ValueError(f"unknown command '{args[0]}'")
+
+    def _set(self, key: str, value: str, options: List[str], raw: List[str]):
+        previous = self.get(key)
+        expires = None
+        for index, option in enumerate(options):
+            if option == 'PX':
+                expires = time.monotonic() + int(raw[index + 1]) / 1000
+            elif option == 'EX':
+                expires = time.monotonic() + int(raw[index + 1])
+        if ('NX' in options and previous is not None) or ('XX' in options and previous is None):
+            return previous if 'GET' in options else None
+        self.data[key] = (value, expires)
+        return previous if 'GET' in options else 'OK'
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+    if value in ('OK', 'PONG'):
+        return f'+{value}\r\n'.encode()
+    data = value.encode()
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[str]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        # 内联命令，如 telnet 中输入的 PING
+        return line.decode().split()
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2].decode())
+    return args
+
+
+async def serve(host: str = '127.0.0.1', port: int = 6390) -> asyncio.AbstractServer:
+    store = Store()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    break
+                try:
+                    reply = encode(store.execute(args))
+                except (ValueError, IndexError) as e:
+                    reply = f'-ERR {e}\r\n'.encode()
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='本地 Redis 替身(协调存储)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    server = await serve(args.host, args.port)
+    print(f"mock redis server listening on redis://{args.host}:{args.port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_main(parse_args()))
+    except KeyboardInterrupt:
+        pass
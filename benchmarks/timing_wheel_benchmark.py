@@ -0,0 +1,153 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Benchmark the hierarchical timing wheel against a heapq scheduler.
+
+堆的实现与原 RoomScheduler 相同(到期时间字典 + 惰性删除)。每个规模依次测量:
+  - insert: 插入全部条目，到期时间均匀分布在一个检测间隔内
+  - churn: 随机 10% 的条目改期(取消后重新加入)，模拟配置重载与优先级调整
+  - run: 以 tick 为步长推进一个完整间隔，到期的条目按 当前时间 + 间隔 重新加入
+结果为每次操作的平均耗时(纳秒)；--memory 时额外用 tracemalloc 统计插入与改期后的内存占用(较慢)。
+
+用法:
+    python benchmarks/timing_wheel_benchmark.py --sizes 10000 100000 1000000 --output wheel.json
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.timing_wheel import TimingWheel  # noqa: E402
+
+
+class HeapScheduler:
+    """堆 + 惰性删除，与时间轮提供相同的接口"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        self._due: Dict[int, float] = {}
+        self._seq = itertools.count()
+
+    def add(self, key: int, deadline: float) -> None:
+        self._due[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+
+    def cancel(self, key: int) -> bool:
+        return self._due.pop(key, None) is not None
+
+    def advance(self, now: float) -> List[Tuple[int, float]]:
+        expired = []
+        heap, due = self._heap, self._due
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if due.get(key) == deadline:
+                del due[key]
+                expired.append((key, deadline))
+        return expired
+
+
+def _expired_keys(scheduler, now: float) -> List[int]:
+    if isinstance(scheduler, TimingWheel):
+        return [entry.key for entry in scheduler.advance(now)]
+    return [key for key, _ in scheduler.advance(now)]
+
+
+def measure_memory(factory, size: int, interval: float, seed: int) -> float:
+    """插入全部条目并改期 10% 后的内存占用(MB)，堆中会残留被惰性删除的旧条目"""
+    rng = random.Random(seed)
+    tracemalloc.start()
+    scheduler = factory()
+    for key in range(size):
+        scheduler.add(key, rng.uniform(0, interval))
+    for key in rng.sample(range(size), size // 10):
+        scheduler.cancel(key)
+        scheduler.add(key, rng.uniform(0, interval))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(current / 1024 / 1024, 1)
+
+
+def run_case(factory, size: int, interval: float, tick: float, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    deadlines = [rng.uniform(0, interval) for _ in range(size)]
+    churn_keys = rng.sample(range(size), size // 10)
+    churn_deadlines = [rng.uniform(0, interval) for _ in churn_keys]
+    result = {}
+
+    scheduler = factory()
+    start = time.perf_counter()
+    for key, deadline in enumerate(deadlines):
+        scheduler.add(key, deadline)
+    result['insert_ns'] = (time.perf_counter() - start) / size * 1e9
+
+    start = time.perf_counter()
+    for key, deadline in zip(churn_keys, churn_deadlines):
+        scheduler.cancel(key)
+        scheduler.add(key, deadline)
+    result['churn_ns'] = (time.perf_counter() - start) / max(1, len(churn_keys)) * 1e9
+
+    fired = 0
+    steps = int(interval / tick)
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        now = step * tick
+        keys = _expired_keys(scheduler, now)
+        fired += len(keys)
+        for key in keys:
+            scheduler.add(key, now + interval)
+    elapsed = time.perf_counter() - start
+    result['run_ns'] = elapsed / max(1, fired) * 1e9
+    result = {k: round(v, 1) for k, v in result.items()}
+    result.update(run_fired=fired, run_seconds=round(elapsed, 3))
+    return result
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='时间轮与 heapq 调度对比')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='条目数量，可多个')
+    parser.add_argument('--interval', type=float, default=60, help='检测间隔(秒)')
+    parser.add_argument('--tick', type=float, default=0.1, help='推进步长(秒)，与时间轮 tick 相同')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--memory', action='store_true', help='同时统计内存占用')
+    parser.add_argument('--output', default='', help='结果 JSON 输出路径')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    factories = {
+        'heapq': HeapScheduler,
+        'wheel': lambda: TimingWheel(tick=args.tick, now=0),
+    }
+    results = []
+    print(f"{'规模':>10} {'实现':>6} {'插入(ns)':>10} {'改期(ns)':>10} {'推进+重排(ns)':>14} {'推进耗时(s)':>12}")
+    for size in args.sizes:
+        for name, factory in factories.items():
+            result = run_case(factory, size, args.interval, args.tick, args.seed)
+            result.update(size=size, implementation=name)
+            if args.memory:
+                result['memory_mb'] = measure_memory(factory, size, args.interval, args.seed)
+            results.append(result)
+            memory = f" {result['memory_mb']:>8.1f}MB" if args.memory else ''
+            print(f"{size:>10} {name:>6} {result['insert_ns']:>10.1f} {result['churn_ns']:>10.1f} "
+                  f"{result['run_ns']:>14.1f} {result['run_seconds']:>12.3f}{memory}", flush=True)
+
+    if args.output:
+        report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+                  'interval': args.interval, 'tick': args.tick, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,37 @@
 # -*- encoding: utf-8 -*-
 import asyncio
 import datetime
+import json
 import os
 import re
 import shutil
+import signal
 import sys
+import time
 import yaml
-from typing import Any, Dict, List, Optional, Tuple, Set
-from src import spider, stream, kuaishou_spider
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Set
+from src import event_loop, spider, stream, kuaishou_spider, profiling
+from src.memory import MemoryDiagnostics
+from src.http_clients.replay import http_replay
 from src.utils import logger, remove_emojis
+from src.logger import setup_logging
+from src.push_template import compile_template
+from src.routing import DEFAULT_GROUP, DeliveryTarget, RoutingIndex, deep_merge
+from src.platforms import canonical_room_key, get_platform
+from src.health import OutageDetector, outcome_of
+from src.transitions import TransitionHistory, parse_start_time
+from src.check_timing import CycleReport, track_check
+from src.tracing import setup_tracing, span, tracer
+from src.scheduler import DEFAULT_PRIORITY, PRIORITIES, RoomScheduler, priority_rank
+from src.sharding import ShardPool, serve_requests, shard_of
+from src.coordination import LeaseCoordinator, create_backend
+from src.deadline import DeadlineExceeded, deadline
+from src.concurrency import PlatformLimits, SingleFlight
+from src.metrics import (
+    CHECK_LATENCY, CHECK_RESULTS, CHECKS_COALESCED, CHECKS_IN_FLIGHT, CONFIRM_DELAY, CYCLE_DURATION, CYCLES,
+    DETECTION_LATENCY, DUPLICATE_TRANSITIONS, NOTIFICATION_LATENCY, PUSH_LATENCY, PUSH_RESULTS, ROOMS,
+    register_route, start_metrics_server, stop_metrics_server
+)
 from msg_push import (
     dingtalk, xizhi, tg_bot, send_email, bark, ntfy, pushplus, gotify, feishubot
 )
@@ -30,9 +53,13 @@ DEFAULT_VIDEO_QUALITY = 'LD'
 class ConfigManager:
     """配置管理器，基于 YAML 的配置读取和验证"""
 
-    def __init__(self):
+    def __init__(self, config: Optional[dict] = None):
         self.config = {}
-        self._load_config()
+        if config is not None:
+            # 直接使用给定的配置字典（如推送分组配置）
+            self.config = config
+        else:
+            self._load_config()
 
     def _load_config(self):
         """加载 YAML 配置文件"""
@@ -94,17 +121,77 @@ class ConfigManager:
         except (ValueError, TypeError):
             return default
 
+# --- 推送配置构建 ---
+def build_push_config(config_mgr: ConfigManager) -> Dict[str, Any]:
+    """从配置管理器中读取 push 配置段，转换为推送处理器使用的扁平配置"""
+    return {
+        'channels': '|'.join(config_mgr.get('push.channels', [])),
+        'title': config_mgr.get_str('push.title', '直播间通知'),
+        'custom_start_msg': config_mgr.get_str('push.custom_start_msg', '[直播间名称] 已开播！\n[时间]'),
+        'custom_stop_msg': config_mgr.get_str('push.custom_stop_msg', '[直播间名称] 已结束直播。\n[时间]'),
+        'push_start': config_mgr.get_bool('push.push_start', True),
+        'push_stop': config_mgr.get_bool('push.push_stop', True),
+
+        # 各渠道配置
+        'wx_url': config_mgr.get_str('push.wechat.url', ''),
+        'dd_url': config_mgr.get_str('push.dingtalk.url', ''),
+        'dd_at': config_mgr.get_str('push.dingtalk.at_mobiles', ''),
+        'dd_all': config_mgr.get_bool('push.dingtalk.is_at_all', False),
+        'tg_token': config_mgr.get_str('push.telegram.token', ''),
+        'tg_chat_id': config_mgr.get_str('push.telegram.chat_id', ''),
+        'bark_url': config_mgr.get_str('push.bark.url', ''),
+        'bark_lv': config_mgr.get_str('push.bark.level', 'active'),
+        'bark_ring': config_mgr.get_str('push.bark.ring', ''),
+        'ntfy_url': config_mgr.get_str('push.ntfy.url', ''),
+        'ntfy_tag': config_mgr.get_str('push.ntfy.tag', 'tada'),
+        'ntfy_email': config_mgr.get_str('push.ntfy.email', ''),
+        'pp_token': config_mgr.get_str('push.pushplus.token', ''),
+        'fs_url': config_mgr.get_str('push.feishu.url', ''),
+        'fs_at': config_mgr.get_str('push.feishu.at', ''),
+        'gt_url': config_mgr.get_str('push.gotify.url', ''),
+        'gt_token': config_mgr.get_str('push.gotify.token', ''),
+        'gt_prio': config_mgr.get_int('push.gotify.priority', 5),
+        'email_srv': config_mgr.get_str('push.email.smtp_host', ''),
+        'email_acc': config_mgr.get_str('push.email.login_email', ''),
+        'email_pwd': config_mgr.get_str('push.email.email_pass', ''),
+        'email_from': config_mgr.get_str('push.email.sender_email', ''),
+        'email_nick': config_mgr.get_str('push.email.sender_nick', ''),
+        'email_to': config_mgr.get_str('push.email.receiver_email', ''),
+        'email_port': config_mgr.get_int('push.email.smtp_port', 465),
+        'email_ssl': config_mgr.get_bool('push.email.use_ssl', True)
+    }
+
 # --- 推送处理器 ---
 class PushHandler:
     """推送处理器，统一管理所有推送渠道"""
     
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, push_section: Optional[dict] = None):
         self.config = config
+        # 原始 push 配置段，推送分组在此基础上覆盖
+        self.push_section = push_section or {}
         self.channels = self._parse_channels(config.get('channels', ''))
         self.push_start = config.get('push_start', True)
         self.push_stop = config.get('push_stop', True)
         self.custom_start_msg = config.get('custom_start_msg', '[直播间名称] 已开播！ \n [时间]')
         self.custom_stop_msg = config.get('custom_stop_msg', '[直播间名称] 已结束直播。 \n [时间]')
+        # 模板在加载配置时编译一次
+        self.start_template = compile_template(self.custom_start_msg)
+        self.stop_template = compile_template(self.custom_stop_msg)
+        self.default_target = DeliveryTarget(
+            DEFAULT_GROUP, config, self.channels, self.start_template, self.stop_template
+        )
+        self.routing = RoutingIndex(self.build_target, self.default_target)
+    
+    def build_target(self, name: str, overrides: dict) -> DeliveryTarget:
+        """基于全局 push 配置和覆盖项构建推送目标"""
+        section = deep_merge(self.push_section, overrides)
+        config = build_push_config(ConfigManager({'push': section}))
+        channels = self._parse_channels(config.get('channels', ''))
+        return DeliveryTarget(
+            name, config, channels,
+            compile_template(config.get('custom_start_msg', '')),
+            compile_template(config.get('custom_stop_msg', ''))
+        )
     
     def _parse_channels(self, channels_str: str) -> Set[str]:
         """解析推送渠道字符串"""
@@ -140,135 +227,161 @@ class PushHandler:
         
         return {channel_mapping.get(ch, ch) for ch in channels if ch in channel_mapping}
     
-    def _parse_template(self, template: str, anchor: str, url: str, now_time: str) -> str:
-        """解析模板，替换变量和换行符"""
-        if not template:
-            return f"主播：{anchor}\n时间：{now_time}\n链接：{url}"
-        
-        # 替换变量
-        content = template.replace('[直播间名称]', anchor) \
-                         .replace('[时间]', now_time) \
-                         .replace('[链接]', url) \
-                         .replace('[URL]', url)
-        
-        # 处理换行符 - 将字符串中的 \n 转换为实际的换行符
-        # 注意：配置文件中可能是 "\\n" 或 "\n"，这里统一处理
-        content = content.replace('\\n', '\n').replace(r'\n', '\n')
-        
-        # 确保包含完整信息
-        if url not in content:
-            content += f"\n链接：{url}"
-        
-        return content
-    
-    def _build_content(self, anchor: str, url: str, status: str) -> Tuple[str, str]:
+    def _build_content(self, anchor: str, url: str, status: str,
+                       info: Optional[Dict[str, Any]] = None,
+                       target: Optional[DeliveryTarget] = None) -> Tuple[str, str]:
         """构建推送标题和内容"""
-        now_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        title = self.config.get('title', '直播间通知')
+        target = target or self.default_target
+        title = target.config.get('title', '直播间通知')
         
         if status == "开播啦":
-            template = self.custom_start_msg
+            template = target.start_template
         else:
-            template = self.custom_stop_msg
+            template = target.stop_template
         
-        # 解析模板
-        content = self._parse_template(template, anchor, url, now_time)
+        content = template.render(anchor, url, info)
         
         return title, content
     
-    async def push(self, anchor: str, url: str, status: str) -> None:
-        """执行推送操作"""
+    async def push(self, anchor: str, url: str, status: str, info: Optional[Dict[str, Any]] = None) -> None:
+        """执行推送操作，按路由索引分发给该直播间的所有订阅者"""
         if (status == "开播啦" and not self.push_start) or \
            (status == "直播结束" and not self.push_stop):
             return
         
-        title, content = self._build_content(anchor, url, status)
-        
         logger.info(f"推送消息: {anchor} -> {status}")
         
+        with span('push', root=True, url=url, status=status) as push_span:
+            push_tasks = []
+            # 相同模板与标题的订阅者共用一次渲染结果
+            rendered: Dict[Tuple[int, str], Tuple[str, str]] = {}
+            for target in self.routing.targets_for(url):
+                template = target.start_template if status == "开播啦" else target.stop_template
+                key = (id(template), target.config.get('title', ''))
+                if key not in rendered:
+                    rendered[key] = self._build_content(anchor, url, status, info, target)
+                title, content = rendered[key]
+                push_tasks.extend(self._channel_tasks(target, title, content, url))
+            if push_span is not None:
+                push_span.set('deliveries', len(push_tasks))
+            
+            if push_tasks:
+                results = await asyncio.gather(*push_tasks, return_exceptions=True)
+                for i, result in enumerate(results):
+                    if isinstance(result, Exception):
+                        logger.error(f"推送失败: {result}")
+
+    @staticmethod
+    async def _deliver(func: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+        """在线程中执行单个渠道的推送，并记录耗时与结果指标"""
+        channel = func.__name__
+        start = time.perf_counter()
+        try:
+            with span(f'push.{channel}', channel=channel):
+                result = await asyncio.to_thread(func, *args)
+        except Exception:
+            PUSH_RESULTS.inc(channel, 'failure')
+            raise
+        finally:
+            PUSH_LATENCY.observe(channel, value=time.perf_counter() - start)
+        if isinstance(result, dict):
+            PUSH_RESULTS.inc(channel, 'success', amount=len(result.get('success', [])))
+            PUSH_RESULTS.inc(channel, 'failure', amount=len(result.get('error', [])))
+        return result
+
+    def _channel_tasks(self, target: DeliveryTarget, title: str, content: str, url: str) -> list:
+        """生成单个推送目标在各渠道上的推送任务"""
         push_tasks = []
-        channels = self.channels
+        config = target.config
+        channels = target.channels
         
         # 微信推送
-        if '微信' in channels and self.config.get('wx_url'):
-            push_tasks.append(asyncio.to_thread(xizhi, self.config['wx_url'], title, content))
+        if '微信' in channels and config.get('wx_url'):
+            push_tasks.append(self._deliver(xizhi, config['wx_url'], title, content))
         
         # 钉钉推送
-        if '钉钉' in channels and self.config.get('dd_url'):
-            push_tasks.append(asyncio.to_thread(
-                dingtalk, self.config['dd_url'], content, 
-                self.config.get('dd_at', ''), 
-                self.config.get('dd_all', False)
+        if '钉钉' in channels and config.get('dd_url'):
+            push_tasks.append(self._deliver(
+                dingtalk, config['dd_url'], content, 
+                config.get('dd_at', ''), 
+                config.get('dd_all', False)
             ))
         
         # Telegram推送
-        if 'TG' in channels and self.config.get('tg_token') and self.config.get('tg_chat_id'):
-            push_tasks.append(asyncio.to_thread(
-                tg_bot, self.config['tg_chat_id'], self.config['tg_token'], content
+        if 'TG' in channels and config.get('tg_token') and config.get('tg_chat_id'):
+            push_tasks.append(self._deliver(
+                tg_bot, config['tg_chat_id'], config['tg_token'], content
             ))
         
         # Bark推送
-        if 'BARK' in channels and self.config.get('bark_url'):
-            push_tasks.append(asyncio.to_thread(
-                bark, self.config['bark_url'], title, content,
-                self.config.get('bark_lv', 'active'),
-                self.config.get('bark_ring', '')
+        if 'BARK' in channels and config.get('bark_url'):
+            push_tasks.append(self._deliver(
+                bark, config['bark_url'], title, content,
+                config.get('bark_lv', 'active'),
+                config.get('bark_ring', '')
             ))
         
         # Ntfy推送
-        if 'NTFY' in channels and self.config.get('ntfy_url'):
-            push_tasks.append(asyncio.to_thread(
-                ntfy, self.config['ntfy_url'], title, content,
-                self.config.get('ntfy_tag', 'tada'),
-                url, self.config.get('ntfy_email', '')
+        if 'NTFY' in channels and config.get('ntfy_url'):
+            push_tasks.append(self._deliver(
+                ntfy, config['ntfy_url'], title, content,
+                config.get('ntfy_tag', 'tada'),
+                url, config.get('ntfy_email', '')
             ))
         
         # Pushplus推送
-        if 'PUSHPLUS' in channels and self.config.get('pp_token'):
-            push_tasks.append(asyncio.to_thread(
-                pushplus, self.config['pp_token'], title, content
+        if 'PUSHPLUS' in channels and config.get('pp_token'):
+            push_tasks.append(self._deliver(
+                pushplus, config['pp_token'], title, content
             ))
         
         # 飞书推送
-        if '飞书' in channels and self.config.get('fs_url'):
-            push_tasks.append(asyncio.to_thread(
-                feishubot, self.config['fs_url'], title, content,
-                self.config.get('fs_at', '')
+        if '飞书' in channels and config.get('fs_url'):
+            push_tasks.append(self._deliver(
+                feishubot, config['fs_url'], title, content,
+                config.get('fs_at', '')
             ))
         
         # Gotify推送
-        if 'GOTIFY' in channels and self.config.get('gt_url') and self.config.get('gt_token'):
-            push_tasks.append(asyncio.to_thread(
-                gotify, self.config['gt_url'], self.config['gt_token'], 
-                title, content, self.config.get('gt_prio', 5)
+        if 'GOTIFY' in channels and config.get('gt_url') and config.get('gt_token'):
+            push_tasks.append(self._deliver(
+                gotify, config['gt_url'], config['gt_token'], 
+                title, content, config.get('gt_prio', 5)
             ))
         
         # 邮箱推送
-        if '邮箱' in channels and all(self.config.get(k) for k in [
+        if '邮箱' in channels and all(config.get(k) for k in [
             'email_srv', 'email_acc', 'email_pwd', 'email_from', 'email_to'
         ]):
-            push_tasks.append(asyncio.to_thread(
-                send_email, self.config['email_srv'], 
-                self.config['email_acc'], self.config['email_pwd'],
-                self.config['email_from'], self.config.get('email_nick', ''),
-                self.config['email_to'], title, content,
-                self.config.get('email_port', 465),
-                self.config.get('email_ssl', True)
+            push_tasks.append(self._deliver(
+                send_email, config['email_srv'], 
+                config['email_acc'], config['email_pwd'],
+                config['email_from'], config.get('email_nick', ''),
+                config['email_to'], title, content,
+                config.get('email_port', 465),
+                config.get('email_ssl', True)
             ))
         
-        if push_tasks:
-            results = await asyncio.gather(*push_tasks, return_exceptions=True)
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"推送失败: {result}")
+        return push_tasks
 
 # --- 平台检测器 ---
 class PlatformDetector:
     """平台检测器，统一管理各平台的检测逻辑"""
     
-    def __init__(self, config: Dict[str, str]):
+    def __init__(self, config: Dict[str, str], check_budget: float = 30, limits: Optional[PlatformLimits] = None,
+                 priority_shares: Optional[Dict[str, float]] = None):
         self.config = config
+        # 单次检测的时间预算(秒)，传递给所有网络请求与浏览器操作
+        self.check_budget = check_budget
+        # 各平台的自适应并发上限，None 表示不限制
+        self.limits = limits
+        # 各优先级可占用的平台并发上限比例，限流时低优先级先被挤出
+        self.priority_shares = priority_shares or {}
+        # 同一直播间的并发检测(如定时检测与确认复查)共享一次请求
+        self._flights = SingleFlight()
         self.cookies = {}
+        # 当前轮次的耗时汇总，由主循环设置
+        self.report: Optional[CycleReport] = None
         self._load_cookies(config)
     
     def _load_cookies(self, config: Dict[str, str]):
@@ -341,90 +454,214 @@ class PlatformDetector:
             cleaned_name = remove_emojis(cleaned_name, '_').strip('_')
             
         return cleaned_name or '空白昵称'
-    async def check_status(self, url: str) -> Tuple[Optional[bool], str]:
-        """检测直播状态"""
+    async def check_status(self, url: str, name: str = '',
+                           priority: str = DEFAULT_PRIORITY) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        """检测直播状态，并记录检测耗时与结果指标"""
+        platform = get_platform(url)[0]
+        CHECKS_IN_FLIGHT.inc(platform)
+        with track_check(url, platform, name) as timing, \
+                span('check', root=True, url=url, platform=platform) as check_span:
+            outcome = 'cancelled'
+            try:
+                result = await self._coalesced_check(url, name, timing, priority)
+                outcome = outcome_of(result[0])
+            finally:
+                CHECKS_IN_FLIGHT.dec(platform)
+                timing.finish(outcome)
+                CHECK_LATENCY.observe(platform, value=timing.elapsed)
+                if self.report is not None:
+                    self.report.add(timing)
+                if check_span is not None:
+                    check_span.set('outcome', outcome)
+                    check_span.set('requests', timing.requests)
+                    check_span.set('retries', timing.retries)
+        CHECK_RESULTS.inc(platform, outcome)
+        return result
+
+    async def _coalesced_check(self, url: str, name: str, timing,
+                               priority: str) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        (is_live, anchor_name, info), shared = await self._flights.do(
+            canonical_room_key(url), lambda: self._limited_check(url, name, timing, priority))
+        if shared:
+            CHECKS_COALESCED.inc(timing.platform)
+        return is_live, anchor_name, dict(info)
+
+    async def _limited_check(self, url: str, name: str, timing,
+                             priority: str) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        """在平台并发上限内检测，并把延迟与限流信号反馈给并发控制"""
+        if self.limits is None:
+            return (await self._budgeted_check(url, name))[0]
+        limit = self.limits.get(timing.platform)
+        async with limit.slot(priority_rank({'priority': priority}), self.priority_shares.get(priority, 1.0)):
+            # 拿到名额后才开始计算时间预算，排队等待不会被记为超时
+            started = time.perf_counter()
+            result, timed_out = await self._budgeted_check(url, name)
+            # 超出预算时按实际耗时计入延迟，其他失败不作为延迟样本
+            limit.feedback(time.perf_counter() - started, throttled=timing.throttled > 0,
+                           failed=result[0] is None and not timed_out)
+            return result
+
+    async def _budgeted_check(self, url: str, name: str) -> Tuple[Tuple[Optional[bool], str, Dict[str, Any]], bool]:
+        """在时间预算内检测，返回 (检测结果, 是否超出预算)"""
+        with deadline(self.check_budget):
+            try:
+                # 预算用完时取消仍在进行的操作，结果记为未知
+                return await asyncio.wait_for(self._check_status(url), self.check_budget or None), False
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                logger.warning(f"检测超出时间预算({self.check_budget}s): {name or ''} {url}")
+                platform, platform_name = get_platform(url)
+                return (None, "检测超时", {'platform': platform_name, 'platform_key': platform}), True
+
+    async def _check_status(self, url: str) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        """
+        检测直播状态，返回 (是否开播, 主播名, 附加信息)
+
+        是否开播为 None 表示状态未知（请求失败、触发风控等），与确认未开播(False)区分开。
+        """
+        platform, platform_name = get_platform(url)
+        info: Dict[str, Any] = {'platform': platform_name, 'platform_key': platform}
 
         try:
             # 抖音平台
-            if "douyin.com" in url or "iesdouyin.com" in url:
+            if platform == 'douyin':
                 cookie = self.cookies.get('douyin', '')
                 data = await spider.get_douyin_web_stream_data(url, cookies=cookie)
                 anchor_name = data.get('anchor_name') or data.get('nickname') or "抖音主播"
-                return data.get('is_live', False), anchor_name
+                info.update(title=data.get('title'), viewers=data.get('user_count_str'),
+                            started_at=parse_start_time(data.get('create_time')))
+                # status: 2 直播中，4 未开播；缺失说明接口请求失败
+                status = data.get('status')
+                return (None if status is None else status == 2), anchor_name, info
 
             # B站平台
-            elif "bilibili.com" in url:
+            elif platform == 'bilibili':
                 cookie = self.cookies.get('bilibili', '')
                 data = await spider.get_bilibili_room_info(url, cookies=cookie)
-                anchor_name = data.get('uname', 'B站主播')
-                return data.get('live_status') == 1, anchor_name
+                anchor_name = data.get('anchor_name') or 'B站主播'
+                info.update(title=data.get('title'), started_at=parse_start_time(data.get('live_time')))
+                live_status = data.get('live_status')
+                return (None if live_status is None else live_status == 1), anchor_name, info
 
             # 虎牙平台
-            elif "huya.com" in url:
+            elif platform == 'huya':
                 cookie = self.cookies.get('huya', '')
                 data = await spider.get_huya_stream_data(url, cookies=cookie)
                 port_info = await stream.get_huya_stream_url(data, DEFAULT_VIDEO_QUALITY)
+                if not port_info:
+                    return None, "虎牙主播", info
                 anchor_name = port_info.get("anchor_name", "虎牙主播")
                 is_live = port_info.get('is_live', False)
-                return is_live, anchor_name
+                info.update(title=port_info.get('title'), started_at=parse_start_time(port_info.get('start_time')))
+                return is_live, anchor_name, info
             
             # 斗鱼平台
-            elif "douyu.com" in url:
+            elif platform == 'douyu':
                 cookie = self.cookies.get('douyu', '')
                 data = await spider.get_douyu_info_data(url, cookies=cookie)
+                if not data:
+                    return None, "斗鱼主播", info
                 anchor_name = data.get('anchor_name', '斗鱼主播')
-                return data.get('is_live', False), anchor_name
+                info.update(title=data.get('title'), started_at=parse_start_time(data.get('start_time')))
+                return data.get('is_live', False), anchor_name, info
             
             # 快手平台
-            elif "kuaishou.com" in url or "kuaishou.cn" in url:
+            elif platform == 'kuaishou':
                 cookie = self.cookies.get('kuaishou', '')
                 data = await kuaishou_spider.get_kuaishou_stream_data(url, cookies=cookie)
-                return data.get('is_live', False), data.get('anchor_name', '快手主播')
+                if not data:
+                    return None, "快手主播", info
+                return data.get('is_live'), data.get('anchor_name', '快手主播'), info
             
             # TikTok平台
-            elif "tiktok.com" in url:
+            elif platform == 'tiktok':
                 cookie = self.cookies.get('tiktok', '')
                 data = await spider.get_tiktok_stream_data(url, cookies=cookie)
-                return data.get('is_live', False), data.get('anchor_name', 'TikTok主播')
+                if not data:
+                    return None, "TikTok主播", info
+                user = data['LiveRoom']['liveRoomUserInfo']['user']
+                live_room = data['LiveRoom'].get('liveRoomUserInfo', {}).get('liveRoom', {})
+                info.update(title=live_room.get('title'), started_at=parse_start_time(live_room.get('startTime')))
+                return user.get('status') == 2, user.get('nickname') or 'TikTok主播', info
 
             # 小红书平台
-            elif "xhslink.com" in url or "xiaohongshu.com" in url or "redelight.cn" in url:
+            elif platform == 'xiaohongshu':
                 cookie = self.cookies.get('xiaohongshu', '')
                 
                 # 调用小红书的爬虫
                 port_info = await spider.get_xhs_stream_url(url, cookies=cookie)
                 
-                if port_info:
-                    is_live = port_info.get('is_live', False)
-                    anchor_name = port_info.get("anchor_name", "小红书主播")
-                    
-                    # 清理主播名
-                    if anchor_name:
-                        anchor_name = self.clean_name(anchor_name)
-                    
-                    return is_live, anchor_name
-                else:
-                    return False, "小红书主播"
+                # 未获取到主播信息说明页面请求失败，状态未知
+                if not port_info or not (port_info.get('is_live') or port_info.get('anchor_name')):
+                    return None, "小红书主播", info
+                
+                is_live = port_info.get('is_live', False)
+                anchor_name = port_info.get("anchor_name") or "小红书主播"
+                info['title'] = port_info.get('title')
+                
+                # 清理主播名
+                anchor_name = self.clean_name(anchor_name)
+                
+                return is_live, anchor_name, info
             
             # 添加其他平台的检测逻辑...
             # 可以根据需要添加更多平台
             
             else:
                 logger.warning(f"不支持的平台: {url}")
-                return False, "未知平台"
+                return False, "未知平台", info
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.debug(f"检测出错 [{url}]: {e}")
-            return None, "检测失败"
+            return None, "检测失败", info
 
 # --- URL 配置读取器 ---
-def load_url_config() -> List[Dict[str, str]]:
-    """加载URL配置（YAML格式）"""
+# 已提示过的重复 URL，每轮重新加载配置时不重复提示
+_reported_duplicates: Set[Tuple[str, str]] = set()
+
+
+def _report_duplicates(duplicates: List[Tuple[str, str, str]]) -> None:
+    """提示 urls.yml 中以不同形式重复配置的直播间"""
+    for key, first_url, url in duplicates:
+        if (key, url) in _reported_duplicates:
+            continue
+        _reported_duplicates.add((key, url))
+        logger.warning(f"重复的直播间 {key}: {url} 与 {first_url} 为同一直播间，只检测一次")
+
+
+def _split_values(value: Any, sep: Optional[str] = None) -> List[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if value in (None, ''):
+        return []
+    return [v.strip() for v in str(value).split(sep)] if sep else [str(value).strip()]
+
+
+def _merge_room_routes(merged: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    """合并重复直播间的房间级推送配置：渠道与 @对象 取并集，模板保留先出现的"""
+    channels = list(dict.fromkeys(_split_values(merged.get('channels')) + _split_values(entry.get('channels'))))
+    if channels:
+        merged['channels'] = channels
+    mentions = list(dict.fromkeys(_split_values(merged.get('mentions'), ',') + _split_values(entry.get('mentions'), ',')))
+    if mentions:
+        merged['mentions'] = ','.join(mentions)
+    template = entry.get('template')
+    if template and not merged.get('template'):
+        merged['template'] = template
+    elif template and template != merged['template'] and (merged['key'], 'template') not in _reported_duplicates:
+        _reported_duplicates.add((merged['key'], 'template'))
+        logger.warning(f"重复的直播间 {merged['key']} 配置了不同的推送模板，使用 {merged['url']} 的模板")
+
+
+def load_url_config() -> Tuple[List[Dict[str, Any]], Dict[str, dict]]:
+    """加载URL配置（YAML格式），返回 (直播间列表, 推送分组)"""
     urls = []
+    groups: Dict[str, dict] = {}
 
     if not os.path.exists(URL_CONFIG_FILE):
         logger.warning(f"URL配置文件不存在: {URL_CONFIG_FILE}")
-        return urls
+        return urls, groups
 
     try:
         with open(URL_CONFIG_FILE, 'r', encoding=TEXT_ENCODING) as f:
@@ -433,8 +670,16 @@ def load_url_config() -> List[Dict[str, str]]:
         urls_list = config.get('urls', [])
         if not isinstance(urls_list, list):
             logger.error("URL配置文件格式错误，'urls' 应该是列表类型")
-            return urls
+            return urls, groups
+
+        groups = config.get('groups') or {}
+        if not isinstance(groups, dict):
+            logger.error("URL配置文件格式错误，'groups' 应该是字典类型")
+            groups = {}
 
+        # 同一直播间被多次配置(包括不同形式的 URL)时只检测一次，合并其推送分组与房间级推送配置
+        seen: Dict[str, Dict[str, Any]] = {}
+        duplicates: List[Tuple[str, str, str]] = []
         for item in urls_list:
             if not isinstance(item, dict):
                 logger.warning(f"跳过无效的URL配置项: {item}")
@@ -444,50 +689,250 @@ def load_url_config() -> List[Dict[str, str]]:
             name = item.get('name', '未知主播').strip()
 
             if url and ('http' in url.lower()):
-                urls.append({'url': url, 'name': name})
+                room_key = canonical_room_key(url)
+                entry = {'url': url, 'name': name, 'key': room_key}
+                priority = str(item.get('priority') or DEFAULT_PRIORITY).strip().lower()
+                if priority not in PRIORITIES:
+                    logger.warning(f"未知的优先级 {priority}，按 {DEFAULT_PRIORITY} 处理: {name} {url}")
+                    priority = DEFAULT_PRIORITY
+                entry['priority'] = priority
+                for key in ('channels', 'mentions', 'template'):
+                    if item.get(key):
+                        entry[key] = item[key]
+                item_groups = item.get('groups') or []
+                if isinstance(item_groups, str):
+                    item_groups = [item_groups]
+                entry['groups'] = list(item_groups)
+
+                if room_key in seen:
+                    merged = seen[room_key]
+                    merged['groups'] = list(dict.fromkeys(merged['groups'] + entry['groups']))
+                    # 取较高的优先级
+                    merged['priority'] = min(merged['priority'], priority, key=PRIORITIES.index)
+                    _merge_room_routes(merged, entry)
+                    if url != merged['url']:
+                        duplicates.append((room_key, merged['url'], url))
+                    logger.debug(f"重复的直播间配置已合并: {name} {url}")
+                    continue
+                seen[room_key] = entry
+                urls.append(entry)
             else:
                 logger.warning(f"跳过无效的URL: {url}")
 
+        _report_duplicates(duplicates)
         logger.info(f"加载了 {len(urls)} 个直播间")
     except yaml.YAMLError as e:
         logger.error(f"URL YAML 配置文件解析失败: {e}")
     except Exception as e:
         logger.error(f"加载URL配置文件失败: {e}")
 
-    return urls
+    return urls, groups
 
 # --- 状态追踪器 ---
 class StatusTracker:
     """状态追踪器，管理主播状态变化"""
     
-    def __init__(self, push_handler: PushHandler):
+    def __init__(self, push_handler: PushHandler, confirm_count: int = 1, confirm_delay: float = 5,
+                 recheck: Optional[Callable[[str], Awaitable[Tuple[Optional[bool], str, Dict[str, Any]]]]] = None,
+                 health: Optional[OutageDetector] = None, history: Optional[TransitionHistory] = None,
+                 dedupe: Optional[Callable[[str, str], Awaitable[bool]]] = None):
         self.push_handler = push_handler
+        # 多实例去重：(直播间 key, 新状态) -> 是否需要由本实例推送
+        self.dedupe = dedupe
+        # 状态变化历史，记录端到端延迟
+        self.history = history
+        # 本地故障检测，故障期间冻结状态、跳过推送
+        self.health = health
         self.status_map: Dict[str, bool] = {}
+        # 记录开播时间，用于计算开播时长
+        self.live_since: Dict[str, float] = {}
+        # 状态变化确认：需连续 confirm_count 次一致的检测结果才提交
+        self.confirm_count = max(1, confirm_count)
+        self.confirm_delay = confirm_delay
+        self.recheck = recheck
+        # url -> (疑似的新状态, 已观察到的次数)
+        self.pending: Dict[str, Tuple[bool, int]] = {}
+        self._confirm_tasks: Dict[str, asyncio.Task] = {}
+        # 首次得到确定检测结果的时间，早于此时间开播的直播不计入延迟统计
+        self._first_observed: Dict[str, float] = {}
+        # 首次观察到疑似状态变化的时间
+        self._suspected_at: Dict[str, float] = {}
     
-    async def process(self, url: str, custom_name: str, is_live: bool, anchor_name: str) -> None:
+    async def process(self, url: str, custom_name: str, is_live: bool, anchor_name: str,
+                      info: Optional[Dict[str, Any]] = None) -> None:
         """处理状态变化"""
+        prev_status = self.status_map.get(url, False)
+        if self.health is not None:
+            platform = (info or {}).get('platform_key') or get_platform(url)[0]
+            self.health.record(platform, is_live, prev_status)
+        
         if is_live is None:
-            logger.debug(f"检测失败，跳过: {url}")
+            logger.debug(f"检测失败，状态未知，跳过: {url}")
             return
         
+        is_live = bool(is_live)
         display_name = custom_name if custom_name != "未知主播" else anchor_name
-        prev_status = self.status_map.get(url, False)
+        now = time.time()
+        self._first_observed.setdefault(url, now)
+        
+        if is_live == prev_status:
+            # 状态未变化，记录日志
+            self._suspected_at.pop(url, None)
+            if self.pending.pop(url, None):
+                logger.debug(f"疑似状态变化未被确认: {display_name}")
+            status_str = "直播中" if is_live else "未开播"
+            logger.debug(f"状态未变: {display_name} {status_str}")
+            return
+        
+        # 疑似状态变化，累计一致的观察次数
+        self._suspected_at.setdefault(url, now)
+        pending_status, count = self.pending.get(url, (is_live, 0))
+        count = count + 1 if pending_status == is_live else 1
+        if count < self.confirm_count:
+            self.pending[url] = (is_live, count)
+            logger.debug(f"疑似状态变化: {display_name} {'开播' if is_live else '关播'} "
+                         f"({count}/{self.confirm_count})，等待确认")
+            self._schedule_confirm(url, custom_name)
+            return
         
-        # 状态变化判断
-        if is_live and not prev_status:
+        self.pending.pop(url, None)
+        if self.health is not None and self.health.in_outage:
+            # 丢弃本次疑似变化的开始时间，故障结束后重新确认的变化不把故障时长计入确认耗时
+            self._suspected_at.pop(url, None)
+            logger.warning(f"疑似本地网络故障，冻结状态并跳过推送: {display_name} "
+                           f"{'开播' if is_live else '关播'}")
+            return
+        await self._commit(url, display_name, is_live, info)
+    
+    async def _commit(self, url: str, display_name: str, is_live: bool,
+                      info: Optional[Dict[str, Any]] = None) -> None:
+        """提交已确认的状态变化并推送"""
+        info = dict(info or {})
+        detected_at = time.time()
+        suspected_at = self._suspected_at.pop(url, detected_at)
+        duplicate = self.dedupe is not None and \
+            not await self.dedupe(canonical_room_key(url), 'live' if is_live else 'offline')
+        if is_live:
             self.status_map[url] = True
-            await self.push_handler.push(display_name, url, "开播啦")
-            logger.info(f"状态变化: {display_name} 开播")
-            
-        elif not is_live and prev_status:
+            # 优先使用平台返回的开播时间
+            self.live_since[url] = info['live_since'] = info.get('started_at') or detected_at
+        else:
             self.status_map[url] = False
-            await self.push_handler.push(display_name, url, "直播结束")
+            info['live_since'] = self.live_since.pop(url, None)
+        if duplicate:
+            # 分区刚从其他实例转移过来，该变化已由其他实例推送
+            DUPLICATE_TRANSITIONS.inc(info.get('platform_key') or get_platform(url)[0])
+            logger.info(f"状态变化已由其他实例推送，跳过: {display_name} {'开播' if is_live else '关播'}")
+            return
+        if is_live:
+            await self.push_handler.push(display_name, url, "开播啦", info)
+            logger.info(f"状态变化: {display_name} 开播")
+        else:
+            await self.push_handler.push(display_name, url, "直播结束", info)
             logger.info(f"状态变化: {display_name} 关播")
+        self._record_transition(url, display_name, is_live, info, suspected_at, detected_at, time.time())
+    
+    def _record_transition(self, url: str, display_name: str, is_live: bool, info: Dict[str, Any],
+                           suspected_at: float, detected_at: float, notified_at: float) -> None:
+        """记录状态变化的端到端延迟指标与历史"""
+        platform = info.get('platform_key') or get_platform(url)[0]
+        transition = 'live' if is_live else 'offline'
+        CONFIRM_DELAY.observe(platform, transition, value=detected_at - suspected_at)
         
-        elif is_live == prev_status:
-            # 状态未变化，记录日志
-            status_str = "直播中" if is_live else "未开播"
-            logger.debug(f"状态未变: {display_name} {status_str}")
+        entry: Dict[str, Any] = {
+            'time': datetime.datetime.fromtimestamp(detected_at).strftime('%Y-%m-%d %H:%M:%S'),
+            'url': url,
+            'name': display_name,
+            'platform': platform,
+            'transition': transition,
+            'suspected_at': round(suspected_at, 3),
+            'detected_at': round(detected_at, 3),
+            'notified_at': round(notified_at, 3),
+            'confirm_delay': round(detected_at - suspected_at, 3),
+        }
+        started_at = info.get('started_at') if is_live else None
+        if started_at:
+            entry['started_at'] = started_at
+            # 程序开始观察该直播间之前就已开播的，延迟没有意义
+            if started_at >= self._first_observed.get(url, detected_at):
+                detection = max(0.0, detected_at - started_at)
+                notification = max(0.0, notified_at - started_at)
+                entry.update(detection_latency=round(detection, 3), notification_latency=round(notification, 3))
+                DETECTION_LATENCY.observe(platform, value=detection)
+                NOTIFICATION_LATENCY.observe(platform, value=notification)
+                logger.info(f"开播检测延迟: {display_name} 检测 {detection:.1f}s，通知 {notification:.1f}s")
+            else:
+                entry['initial'] = True
+        if self.history is not None:
+            self.history.record(entry)
+    
+    async def drain(self, timeout: float) -> None:
+        """等待进行中的状态确认(可能产生推送)完成，超时后取消"""
+        tasks = list(self._confirm_tasks.values())
+        if not tasks:
+            return
+        pending = set(tasks)
+        if timeout > 0:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pending:
+            logger.warning(f"退出时取消了 {len(pending)} 个未完成的状态确认")
+    
+    def save_state(self, path: str) -> None:
+        """保存已确认的直播状态，重启后据此判断状态变化，避免重复推送开播"""
+        state = {
+            'saved_at': time.time(),
+            'live': {url: self.live_since.get(url) for url, live in self.status_map.items() if live},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        logger.info(f"已保存 {len(state['live'])} 个直播中的直播间状态: {path}")
+    
+    def load_state(self, path: str, max_age: float = 86400) -> None:
+        """加载上次退出时保存的直播状态，超过 max_age 秒的视为过期"""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取状态文件失败: {e}")
+            return
+        age = time.time() - state.get('saved_at', 0)
+        if max_age and age > max_age:
+            logger.info(f"状态文件已过期({age / 3600:.1f} 小时前保存)，忽略")
+            return
+        for url, live_since in (state.get('live') or {}).items():
+            self.status_map[url] = True
+            if live_since:
+                self.live_since[url] = live_since
+        logger.info(f"已恢复 {len(state.get('live') or {})} 个直播中的直播间状态")
+    
+    def _schedule_confirm(self, url: str, custom_name: str) -> None:
+        """为疑似状态变化的直播间安排一次快速复查"""
+        if self.recheck is None or url in self._confirm_tasks:
+            return
+        self._confirm_tasks[url] = asyncio.create_task(self._confirm(url, custom_name))
+    
+    async def _confirm(self, url: str, custom_name: str) -> None:
+        """在 confirm_delay 秒后只复查该直播间，直到状态被确认或否定"""
+        try:
+            # 复查次数上限，避免平台持续异常时无限复查
+            for _ in range(self.confirm_count + 2):
+                if url not in self.pending:
+                    break
+                await asyncio.sleep(self.confirm_delay)
+                is_live, anchor_name, info = await self.recheck(url)
+                await self.process(url, custom_name, is_live, anchor_name, info)
+        except Exception as e:
+            logger.error(f"复查直播间失败 [{custom_name}]: {e}")
+        finally:
+            self._confirm_tasks.pop(url, None)
 
 
 # --- 配置文件备份功能 ---
@@ -560,20 +1005,8 @@ def backup_config_files_at_startup() -> None:
         logger.warning(f"URL配置文件不存在: {URL_CONFIG_FILE}")
     
     logger.info("=== 配置文件备份完成 ===")
-# --- 主程序 ---
-async def main():
-    """主程序入口"""
-    # 程序启动时备份配置文件
-    backup_config_files_at_startup()
-
-    logger.info("=== 直播监测模式启动 ===")
-    
-    # 初始化配置管理器
-    config_mgr = ConfigManager()
-
-    # 读取基础配置
-    logger.info("正在读取配置...")
-
+def build_runtime_config(config_mgr: ConfigManager) -> Tuple[Dict[str, Any], int]:
+    """合并全局、推送与 Cookie 配置，返回 (合并后的配置, 检测间隔)"""
     # 全局配置
     global_config = {
         'language': config_mgr.get_str('global.language', 'zh-cn'),
@@ -587,42 +1020,7 @@ async def main():
     }
 
     # 推送配置
-    push_config = {
-        'channels': '|'.join(config_mgr.get('push.channels', [])),
-        'title': config_mgr.get_str('push.title', '直播间通知'),
-        'custom_start_msg': config_mgr.get_str('push.custom_start_msg', '[直播间名称] 已开播！\n[时间]'),
-        'custom_stop_msg': config_mgr.get_str('push.custom_stop_msg', '[直播间名称] 已结束直播。\n[时间]'),
-        'push_start': config_mgr.get_bool('push.push_start', True),
-        'push_stop': config_mgr.get_bool('push.push_stop', True),
-
-        # 各渠道配置
-        'wx_url': config_mgr.get_str('push.wechat.url', ''),
-        'dd_url': config_mgr.get_str('push.dingtalk.url', ''),
-        'dd_at': config_mgr.get_str('push.dingtalk.at_mobiles', ''),
-        'dd_all': config_mgr.get_bool('push.dingtalk.is_at_all', False),
-        'tg_token': config_mgr.get_str('push.telegram.token', ''),
-        'tg_chat_id': config_mgr.get_str('push.telegram.chat_id', ''),
-        'bark_url': config_mgr.get_str('push.bark.url', ''),
-        'bark_lv': config_mgr.get_str('push.bark.level', 'active'),
-        'bark_ring': config_mgr.get_str('push.bark.ring', ''),
-        'ntfy_url': config_mgr.get_str('push.ntfy.url', ''),
-        'ntfy_tag': config_mgr.get_str('push.ntfy.tag', 'tada'),
-        'ntfy_email': config_mgr.get_str('push.ntfy.email', ''),
-        'pp_token': config_mgr.get_str('push.pushplus.token', ''),
-        'fs_url': config_mgr.get_str('push.feishu.url', ''),
-        'fs_at': config_mgr.get_str('push.feishu.at', ''),
-        'gt_url': config_mgr.get_str('push.gotify.url', ''),
-        'gt_token': config_mgr.get_str('push.gotify.token', ''),
-        'gt_prio': config_mgr.get_int('push.gotify.priority', 5),
-        'email_srv': config_mgr.get_str('push.email.smtp_host', ''),
-        'email_acc': config_mgr.get_str('push.email.login_email', ''),
-        'email_pwd': config_mgr.get_str('push.email.email_pass', ''),
-        'email_from': config_mgr.get_str('push.email.sender_email', ''),
-        'email_nick': config_mgr.get_str('push.email.sender_nick', ''),
-        'email_to': config_mgr.get_str('push.email.receiver_email', ''),
-        'email_port': config_mgr.get_int('push.email.smtp_port', 465),
-        'email_ssl': config_mgr.get_bool('push.email.use_ssl', True)
-    }
+    push_config = build_push_config(config_mgr)
 
     # 读取Cookie配置
     cookie_config = config_mgr.get('cookies', {})
@@ -636,53 +1034,475 @@ async def main():
     if check_interval is None or check_interval < 10:  # 最小间隔保护
         check_interval = 10
         logger.warning(f"检测间隔过小，调整为{check_interval}秒")
+    return push_config, check_interval
+
+def build_priority_intervals(config_mgr: ConfigManager, check_interval: int) -> Dict[str, float]:
+    """各优先级的检测间隔，默认 high 为检测间隔的 1/4(不低于 10 秒)，low 为 2 倍"""
+    defaults = {'high': max(10, check_interval // 4), 'normal': check_interval, 'low': check_interval * 2}
+    return {priority: config_mgr.get_int(f'scheduler.priorities.{priority}.interval', 0) or defaults[priority]
+            for priority in PRIORITIES}
+
+def build_priority_shares(config_mgr: ConfigManager) -> Dict[str, float]:
+    """各优先级可占用的平台并发上限比例"""
+    defaults = {'high': 1.0, 'normal': 1.0, 'low': 0.5}
+    return {priority: float(config_mgr.get(f'scheduler.priorities.{priority}.share', defaults[priority]))
+            for priority in PRIORITIES}
+
+def build_detector(config_mgr: ConfigManager, push_config: Dict[str, Any], shards: int = 1) -> PlatformDetector:
+    """创建检测器，多进程模式下每个工作进程分得 1/shards 的并发上限"""
+    def split(options: Dict[str, Any]) -> Dict[str, Any]:
+        options = dict(options)
+        for key in ('initial', 'maximum'):
+            if key in options:
+                options[key] = max(1, int(options[key]) // shards)
+        return options
+
+    limits = None
+    if config_mgr.get_bool('concurrency.enabled', True):
+        limits = PlatformLimits(
+            defaults=split({
+                'initial': config_mgr.get_int('concurrency.initial', 10),
+                'minimum': config_mgr.get_int('concurrency.minimum', 1),
+                'maximum': config_mgr.get_int('concurrency.maximum', 100),
+                'decrease': float(config_mgr.get('concurrency.decrease', 0.5)),
+                'latency_tolerance': float(config_mgr.get('concurrency.latency_tolerance', 2.0)),
+            }),
+            platforms={platform: split(options or {})
+                       for platform, options in (config_mgr.get('concurrency.platforms', {}) or {}).items()},
+        )
+    return PlatformDetector(push_config, check_budget=config_mgr.get_int('scheduler.check_budget', 30),
+                            limits=limits, priority_shares=build_priority_shares(config_mgr))
+
+def configure_http_replay(config_mgr: ConfigManager) -> None:
+    """HTTP 录制/回放，环境变量 LIVE_HTTP_MODE 等已设置时以环境变量为准"""
+    replay_mode = config_mgr.get_str('http_replay.mode', 'off')
+    if replay_mode != 'off' and 'LIVE_HTTP_MODE' not in os.environ:
+        http_replay.configure(
+            replay_mode,
+            config_mgr.get_str('http_replay.directory', 'fixtures/http'),
+            config_mgr.get('http_replay.latency', 0),
+        )
+
+def build_coordinator(config_mgr: ConfigManager, instance_id: str = '') -> LeaseCoordinator:
+    """多实例协调器，instance_id 为空时使用 主机名-进程号"""
+    backend = create_backend(
+        config_mgr.get_str('coordination.backend', 'sqlite'),
+        path=config_mgr.get_str('coordination.path', 'logs/coordination.db'),
+        url=config_mgr.get_str('coordination.url', ''),
+    )
+    return LeaseCoordinator(
+        backend,
+        instance_id=instance_id or config_mgr.get_str('coordination.instance_id', ''),
+        partitions=config_mgr.get_int('coordination.partitions', 64),
+        lease_ttl=config_mgr.get_int('coordination.lease_ttl', 30),
+        heartbeat=config_mgr.get_int('coordination.heartbeat', 10),
+        dedupe_ttl=config_mgr.get_int('coordination.dedupe_ttl', 7 * 86400),
+    )
+
+# --- 主程序 ---
+async def main():
+    """主程序入口"""
+    # 程序启动时备份配置文件
+    backup_config_files_at_startup()
+
+    logger.info("=== 直播监测模式启动 ===")
+    
+    # 初始化配置管理器
+    config_mgr = ConfigManager()
+    
+    # 日志配置：按模块级别、重复日志限流、JSON 日志
+    setup_logging(config_mgr.get('logging', {}) or {})
+    
+    event_loop.tune(config_mgr.get_int('event_loop.executor_workers', 0))
+    logger.info(f"事件循环: {event_loop.current()}")
+
+    # 读取基础配置
+    logger.info("正在读取配置...")
+    push_config, check_interval = build_runtime_config(config_mgr)
     
     logger.info(f"检测间隔: {check_interval}秒")
     logger.info(f"开播推送: {'开启' if push_config['push_start'] else '关闭'}")
     logger.info(f"关播推送: {'开启' if push_config['push_stop'] else '关闭'}")
     
     # 初始化各个组件
-    push_handler = PushHandler(push_config)
-    detector = PlatformDetector(push_config)
-    tracker = StatusTracker(push_handler)
+    push_handler = PushHandler(push_config, config_mgr.get('push', {}) or {})
+    detector = build_detector(config_mgr, push_config)
+    
+    # 多实例协调：按租约分配直播间，推送前去重
+    coordinator = None
+    if config_mgr.get_bool('coordination.enabled', False):
+        coordinator = build_coordinator(config_mgr)
+        await coordinator.start()
+    
+    tracker = StatusTracker(
+        push_handler,
+        confirm_count=config_mgr.get_int('push.confirm_count', 2),
+        confirm_delay=config_mgr.get_int('push.confirm_delay', 5),
+        recheck=detector.check_status,
+        health=OutageDetector(
+            window=config_mgr.get_int('health.window', 120),
+            min_samples=config_mgr.get_int('health.min_samples', 10),
+            failure_ratio=config_mgr.get_int('health.failure_percent', 60) / 100,
+            drop_ratio=config_mgr.get_int('health.drop_percent', 80) / 100,
+            max_outage=config_mgr.get_int('health.max_outage', 900),
+        ) if config_mgr.get_bool('health.enabled', True) else None,
+        history=TransitionHistory(
+            config_mgr.get_str('history.path', 'logs/transitions.jsonl'),
+            keep=config_mgr.get_int('history.keep', 1000),
+        ) if config_mgr.get_bool('history.enabled', True) else None,
+        dedupe=coordinator.claim_transition if coordinator is not None else None,
+    )
+    
+    # 每轮耗时汇总与慢检测日志
+    slow_threshold = config_mgr.get_int('report.slow_check_threshold', 10)
+    report_top_n = config_mgr.get_int('report.top_n', 5)
+    
+    # 检测链路追踪
+    tracing_task = None
+    if config_mgr.get_bool('tracing.enabled', False):
+        tracing_task = setup_tracing(
+            config_mgr.get_str('tracing.exporter', 'jsonl'),
+            path=config_mgr.get_str('tracing.path', 'logs/traces.jsonl'),
+            endpoint=config_mgr.get_str('tracing.endpoint', 'http://127.0.0.1:4318/v1/traces'),
+            batch_size=config_mgr.get_int('tracing.batch_size', 512),
+            flush_interval=config_mgr.get_int('tracing.flush_interval', 5),
+        )
+    
+    configure_http_replay(config_mgr)
+    
+    # 按需性能采样：SIGUSR1，显式开启时还可通过指标接口的 /debug/profile、/debug/tasks 触发
+    if config_mgr.get_bool('profiling.enabled', True):
+        profiling.install_signal_handler(
+            config_mgr.get_int('profiling.seconds', 30),
+            config_mgr.get_int('profiling.interval_ms', 5) / 1000,
+        )
+        # 指标接口没有鉴权，调试接口默认不注册
+        if config_mgr.get_bool('profiling.debug_routes', False):
+            register_route('/debug/profile', profiling.handle_profile_request)
+            register_route('/debug/tasks', profiling.handle_tasks_request)
+    
+    # 内存诊断
+    memory = None
+    if config_mgr.get_bool('memory.enabled', False):
+        memory = MemoryDiagnostics(
+            every_cycles=config_mgr.get_int('memory.every_cycles', 10),
+            top_n=config_mgr.get_int('memory.top_n', 15),
+            frames=config_mgr.get_int('memory.frames', 5),
+            report_path=config_mgr.get_str('memory.report_path', 'logs/memory.log'),
+        )
+        memory.start()
+    
+    # 指标接口
+    if config_mgr.get_bool('metrics.enabled', False):
+        await start_metrics_server(
+            config_mgr.get_str('metrics.host', '127.0.0.1'),
+            config_mgr.get_int('metrics.port', 9108)
+        )
+    
+    # 有序退出：收到 SIGTERM/SIGINT 后停止调度，等待进行中的检测与推送完成
+    stopping = _install_shutdown_handlers()
+    shutdown_timeout = config_mgr.get_int('shutdown.timeout', 20)
+    state_path = config_mgr.get_str('shutdown.state_path', 'logs/state.json')
+    if state_path:
+        tracker.load_state(state_path, config_mgr.get_int('shutdown.state_max_age', 86400))
+    
+    # 多进程分片：工作进程负责检测，本进程只做状态确认与推送
+    shards = config_mgr.get_int('sharding.workers', 0)
+    if shards > 1:
+        graceful = False
+        try:
+            await _run_coordinator(shards, push_handler, tracker, check_interval, memory, coordinator,
+                                   stopping, shutdown_timeout,
+                                   recheck_timeout=config_mgr.get_int('scheduler.check_timeout', 60) or 60)
+            graceful = True
+        finally:
+            await _shutdown(None, tracker, coordinator, shutdown_timeout if graceful else 0, state_path)
+        return
+    
+    # 流水线调度：每个直播间按各自的到期时间独立检测
+    scheduler = RoomScheduler(
+        lambda item: _process_single_url(item, detector, tracker),
+        interval=check_interval,
+        workers=config_mgr.get_int('scheduler.workers', 100),
+        check_timeout=config_mgr.get_int('scheduler.check_timeout', 60),
+        intervals=build_priority_intervals(config_mgr, check_interval),
+    )
+    scheduler.start()
+    logger.info("各优先级检测间隔: " + ", ".join(
+        f"{priority} {interval}s" for priority, interval in scheduler.intervals.items()))
     
     cycle_count = 0
+    graceful = False
     
-    # 主循环
-    while True:
-        cycle_count += 1
-        logger.info(f"=== 第{cycle_count}轮检测开始 ===")
-        
-        urls = load_url_config()
-        
-        if not urls:
-            logger.warning("未找到有效的直播间配置")
-        else:
-            tasks = []
-            for item in urls:
-                task = asyncio.create_task(
-                    _process_single_url(item, detector, tracker)
-                )
-                tasks.append(task)
+    # 主循环：每轮重新加载直播间配置，并在所有直播间各完成一次检测后汇总
+    try:
+        while not stopping.is_set():
+            cycle_count += 1
+            logger.info(f"=== 第{cycle_count}轮检测开始 ===")
+            cycle_start = time.perf_counter()
+            detector.report = CycleReport(cycle_count, slow_threshold, report_top_n)
             
-            # 并发处理所有直播间
-            await asyncio.gather(*tasks, return_exceptions=True)
-        
-        logger.info(f"第{cycle_count}轮检测完成，等待{check_interval}秒后继续...")
-        await asyncio.sleep(check_interval)
+            urls, groups = load_url_config()
+            push_handler.routing.rebuild(urls, groups)
+            ROOMS.set(value=len(urls))
+            if coordinator is not None:
+                # 只检测本实例持有租约的分区
+                owned = [item for item in urls if coordinator.owns(item['key'])]
+                logger.info(f"本实例负责 {len(owned)}/{len(urls)} 个直播间")
+            else:
+                owned = urls
+            scheduler.sync(owned)
+            
+            if not urls:
+                logger.warning("未找到有效的直播间配置")
+                await _wait_or_stop(asyncio.sleep(check_interval), stopping)
+            elif not owned:
+                await _wait_or_stop(asyncio.sleep(check_interval), stopping)
+            else:
+                await _wait_or_stop(scheduler.wait_round(), stopping)
+            if stopping.is_set():
+                break
+            
+            detector.report.log()
+            if memory is not None:
+                await memory.maybe_report(cycle_count)
+            CYCLE_DURATION.observe(value=time.perf_counter() - cycle_start)
+            CYCLES.inc()
+            logger.info(f"第{cycle_count}轮检测完成")
+        graceful = True
+    finally:
+        # 被取消(如再次收到退出信号)时不再等待，直接取消进行中的检测
+        await _shutdown(scheduler, tracker, coordinator, shutdown_timeout if graceful else 0, state_path)
+
+def _install_shutdown_handlers(signals: Tuple[int, ...] = (signal.SIGTERM, signal.SIGINT)) -> asyncio.Event:
+    """收到退出信号时设置事件进入有序退出，再次收到时立即取消当前任务"""
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    
+    def on_signal(sig: signal.Signals) -> None:
+        if stopping.is_set():
+            logger.warning(f"再次收到 {sig.name}，立即退出")
+            task.cancel()
+            return
+        logger.info(f"收到 {sig.name}，停止调度并等待进行中的检测完成")
+        stopping.set()
+    
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, on_signal, sig)
+        except (NotImplementedError, RuntimeError):
+            # Windows 不支持，仍按 KeyboardInterrupt 退出
+            pass
+    return stopping
+
+async def _wait_or_stop(awaitable: Awaitable, stopping: asyncio.Event) -> None:
+    """等待 awaitable 完成，收到退出信号时提前返回并取消它"""
+    task = asyncio.ensure_future(awaitable)
+    stopper = asyncio.ensure_future(stopping.wait())
+    try:
+        await asyncio.wait({task, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for pending in (task, stopper):
+            if not pending.done():
+                pending.cancel()
+        await asyncio.gather(task, stopper, return_exceptions=True)
+
+async def _shutdown(scheduler: Optional[RoomScheduler], tracker: StatusTracker,
+                    coordinator: Optional[LeaseCoordinator], timeout: float, state_path: str) -> None:
+    """有序退出：完成进行中的检测与推送，保存状态，释放租约并写出缓冲的追踪与日志"""
+    deadline_at = time.monotonic() + timeout
+    if scheduler is not None:
+        cancelled = await scheduler.drain(timeout)
+        if cancelled:
+            logger.warning(f"退出时取消了 {cancelled} 个进行中的检测")
+    # 进行中的检测被取消时，其 HTTP 客户端与浏览器随之关闭
+    await tracker.drain(max(0.0, deadline_at - time.monotonic()))
+    if state_path:
+        try:
+            tracker.save_state(state_path)
+        except OSError as e:
+            logger.error(f"保存状态失败: {e}")
+    if coordinator is not None:
+        await coordinator.stop()
+    await stop_metrics_server()
+    tracer.flush()
+    logger.info("程序已退出")
+    await logger.complete()
+
+async def _run_coordinator(shards: int, push_handler: PushHandler, tracker: StatusTracker,
+                           check_interval: int, memory: Optional[MemoryDiagnostics],
+                           coordinator: Optional[LeaseCoordinator], stopping: asyncio.Event,
+                           shutdown_timeout: float, recheck_timeout: float = 60) -> None:
+    """多进程模式的协调者：维护工作进程，汇总检测结果并统一确认状态、推送"""
+    # 开启多实例协调时，检测进程按本实例的 ID 读取持有的分区
+    instance_id = coordinator.instance_id if coordinator is not None else ''
+    pool = ShardPool(shards, _shard_main, args=(instance_id, shutdown_timeout))
+    pool.start()
+    consumer = asyncio.create_task(pool.consume(lambda result: _process_shard_result(result, tracker)))
+    
+    async def recheck(url: str) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        # 复查交给直播间所属的工作进程，使用该进程分到的并发上限
+        try:
+            result = await pool.request(shard_of(canonical_room_key(url), shards), url, recheck_timeout)
+        except asyncio.TimeoutError:
+            result = None
+        return tuple(result) if result is not None else (None, "检测失败", {})
+    
+    tracker.recheck = recheck
+    cycle_count = 0
+    try:
+        while not stopping.is_set():
+            cycle_count += 1
+            cycle_start = time.perf_counter()
+            received = pool.received
+            
+            # 推送路由与直播间数量仍由本进程按最新配置维护，工作进程各自重新加载分片
+            urls, groups = load_url_config()
+            push_handler.routing.rebuild(urls, groups)
+            ROOMS.set(value=len(urls))
+            if not urls:
+                logger.warning("未找到有效的直播间配置")
+            pool.ensure_alive()
+            
+            await _wait_or_stop(asyncio.sleep(check_interval), stopping)
+            if stopping.is_set():
+                break
+            
+            if memory is not None:
+                await memory.maybe_report(cycle_count)
+            CYCLE_DURATION.observe(value=time.perf_counter() - cycle_start)
+            CYCLES.inc()
+            logger.info(f"第{cycle_count}轮: {shards} 个工作进程共返回 {pool.received - received} 条检测结果")
+    finally:
+        if stopping.is_set():
+            # 工作进程收到 SIGTERM 后完成进行中的检测再退出，其结果仍会被处理
+            await asyncio.to_thread(pool.stop, shutdown_timeout + 5)
+            await asyncio.gather(consumer, return_exceptions=True)
+            await pool.join_handlers(shutdown_timeout)
+        else:
+            consumer.cancel()
+            pool.stop(0)
+
+async def _process_shard_result(result: tuple, tracker: StatusTracker) -> None:
+    """处理工作进程返回的一条检测结果"""
+    url, name, is_live, anchor_name, info = result
+    CHECK_RESULTS.inc(get_platform(url)[0], outcome_of(is_live))
+    try:
+        await tracker.process(url, name, is_live, anchor_name, info)
+    except Exception as e:
+        logger.error(f"处理直播间失败 [{name or '未知'}]: {e}")
+
+async def _run_shard(index: int, count: int, results, requests, instance_id: str = '',
+                     shutdown_timeout: float = 20) -> None:
+    """工作进程：只检测属于自己分片的直播间，结果发回协调者"""
+    config_mgr = ConfigManager()
+    event_loop.tune(config_mgr.get_int('event_loop.executor_workers', 0))
+    coordinator = build_coordinator(config_mgr, instance_id) if instance_id else None
+    setup_logging(config_mgr.get('logging', {}) or {}, suffix=f'.shard{index}')
+    configure_http_replay(config_mgr)
+    push_config, check_interval = build_runtime_config(config_mgr)
+    detector = build_detector(config_mgr, push_config, shards=count)
+    
+    async def check(item: Dict[str, str]) -> None:
+        try:
+            is_live, anchor_name, info = await detector.check_status(
+                item['url'], item['name'], item.get('priority', DEFAULT_PRIORITY))
+        except Exception as e:
+            logger.error(f"检测直播间失败 [{item.get('name', '未知')}]: {e}")
+            return
+        results.put((item['url'], item['name'], is_live, anchor_name, info))
+    
+    scheduler = RoomScheduler(
+        check,
+        interval=check_interval,
+        workers=max(1, config_mgr.get_int('scheduler.workers', 100) // count),
+        check_timeout=config_mgr.get_int('scheduler.check_timeout', 60),
+        intervals=build_priority_intervals(config_mgr, check_interval),
+    )
+    scheduler.start()
+    
+    # 协调者发来的状态确认复查
+    rooms: Dict[str, Dict[str, str]] = {}
+    
+    async def recheck(url: str) -> Tuple[Optional[bool], str, Dict[str, Any]]:
+        item = rooms.get(url, {})
+        return await detector.check_status(url, item.get('name', ''), item.get('priority', DEFAULT_PRIORITY))
+    
+    serve_requests(requests, results, recheck)
+    
+    # 检测相关的指标(并发上限、检测耗时、HTTP 请求等)记录在工作进程中，
+    # 每个工作进程在 metrics.port + 1 + 编号 上提供各自的指标接口
+    if config_mgr.get_bool('metrics.enabled', False):
+        await start_metrics_server(
+            config_mgr.get_str('metrics.host', '127.0.0.1'),
+            config_mgr.get_int('metrics.port', 9108) + 1 + index
+        )
+    slow_threshold = config_mgr.get_int('report.slow_check_threshold', 10)
+    report_top_n = config_mgr.get_int('report.top_n', 5)
+    cycle_count = 0
+    # 协调者退出时发送 SIGTERM，完成进行中的检测后退出
+    stopping = _install_shutdown_handlers((signal.SIGTERM,))
+    logger.info(f"检测工作进程 {index}/{count} 已启动")
+    graceful = False
+    try:
+        while not stopping.is_set():
+            urls, _ = load_url_config()
+            if coordinator is not None:
+                try:
+                    await coordinator.refresh()
+                except Exception as e:
+                    logger.warning(f"读取分区租约失败: {e}")
+                urls = [item for item in urls if coordinator.owns(item['key'])]
+            owned = [item for item in urls if shard_of(item['key'], count) == index]
+            rooms = {item['url']: item for item in owned}
+            scheduler.sync(owned)
+            if owned:
+                # 每个工作进程各自汇总本进程的检测耗时，慢检测写入 slow_checks.shard<编号>.log
+                cycle_count += 1
+                detector.report = CycleReport(cycle_count, slow_threshold, report_top_n)
+                await _wait_or_stop(scheduler.wait_round(), stopping)
+                if not stopping.is_set():
+                    detector.report.log()
+            else:
+                await _wait_or_stop(asyncio.sleep(check_interval), stopping)
+        graceful = True
+    finally:
+        await scheduler.drain(shutdown_timeout if graceful else 0)
+        if coordinator is not None:
+            # 租约属于协调进程所在的实例，这里只关闭连接
+            await coordinator.backend.close()
+        await stop_metrics_server()
+        await logger.complete()
+
+def _shard_main(index: int, count: int, results, requests, instance_id: str = '',
+                shutdown_timeout: float = 20) -> None:
+    """工作进程入口(spawn 启动，必须是模块级函数)"""
+    # Ctrl+C 会发给整个进程组，工作进程忽略 SIGINT，由协调者统一停止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        event_loop.install(ConfigManager().get_str('event_loop.loop', 'asyncio'))
+        asyncio.run(_run_shard(index, count, results, requests, instance_id, shutdown_timeout))
+    except asyncio.CancelledError:
+        pass
 
 async def _process_single_url(item: Dict[str, str], detector: PlatformDetector, tracker: StatusTracker) -> None:
     """处理单个直播间"""
     try:
-        is_live, anchor_name = await detector.check_status(item['url'])
-        await tracker.process(item['url'], item['name'], is_live, anchor_name)
+        with span('room', root=True, url=item['url'], name=item['name']):
+            is_live, anchor_name, info = await detector.check_status(
+                item['url'], item['name'], item.get('priority', DEFAULT_PRIORITY))
+            await tracker.process(item['url'], item['name'], is_live, anchor_name, info)
     except Exception as e:
         logger.error(f"处理直播间失败 [{item.get('name', '未知')}]: {e}")
 
 if __name__ == "__main__":
     try:
+        # 事件循环需在 asyncio.run() 之前选择
+        event_loop.install(ConfigManager().get_str('event_loop.loop', 'asyncio'))
         asyncio.run(main())
     except KeyboardInterrupt:
+        tracer.flush()
         logger.info("\n程序已手动退出")
     except Exception as e:
         logger.error(f"程序异常退出: {e}")
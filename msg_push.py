@@ -7,10 +7,12 @@ Date: 2023-09-03 19:18:36
 Update: 2025-01-23 17:16:12
 Copyright (c) 2023-2024 by Hmily, All Rights Reserved.
 """
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
 import json
 import base64
 import os
+import time
 import urllib.request
 import urllib.error
 import smtplib
@@ -30,63 +32,106 @@ proxy_handler = urllib.request.ProxyHandler(proxy_config) if proxy_config else u
 opener = urllib.request.build_opener(proxy_handler)
 headers: Dict[str, str] = {'Content-Type': 'application/json'}
 
+# 多地址推送的整体超时时间(秒)及最大并发数
+FAN_OUT_DEADLINE = 15
+FAN_OUT_MAX_WORKERS = 8
 
-def dingtalk(url: str, content: str, number: str = None, is_atall: bool = False) -> Dict[str, Any]:
+
+def _fan_out(api_list: List[str], send_one: Callable[[str], Tuple[bool, str]],
+             deadline: float = FAN_OUT_DEADLINE) -> Dict[str, Any]:
+    """
+    并发推送到多个地址，并统一限制整体耗时。
+
+    :param api_list: 推送地址列表
+    :param send_one: 单地址推送函数，返回 (是否成功, 说明信息)
+    :param deadline: 整体超时时间(秒)，超时未完成的地址记为失败
+    :return: 包含成功、失败列表及每个地址推送结果的字典
+    """
     success = []
     error = []
+    results: Dict[str, Dict[str, Any]] = {}
+    if not api_list:
+        return {"success": success, "error": error, "results": results}
+
+    def timed_send(api: str) -> Tuple[bool, str, float]:
+        start = time.monotonic()
+        ok, detail = send_one(api)
+        return ok, detail, time.monotonic() - start
+
+    executor = ThreadPoolExecutor(max_workers=min(len(api_list), FAN_OUT_MAX_WORKERS))
+    futures = {executor.submit(timed_send, api): api for api in api_list}
+    done, not_done = wait(futures, timeout=deadline)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, api in futures.items():
+        if future in done:
+            try:
+                ok, detail, elapsed = future.result()
+            except Exception as e:
+                ok, detail, elapsed = False, str(e), deadline
+        else:
+            ok, detail, elapsed = False, f'超过整体推送时限 {deadline} 秒', deadline
+        results[api] = {"ok": ok, "detail": detail, "elapsed": round(elapsed, 3)}
+        (success if ok else error).append(api)
+    return {"success": success, "error": error, "results": results}
+
+
+def _post_json(api: str, data: bytes) -> dict:
+    req = urllib.request.Request(api, data=data, headers=headers)
+    response = opener.open(req, timeout=10)
+    json_str = response.read().decode('utf-8')
+    return json.loads(json_str)
+
+
+def dingtalk(url: str, content: str, number: str = None, is_atall: bool = False) -> Dict[str, Any]:
     api_list = url.replace('，', ',').split(',') if url.strip() else []
-    for api in api_list:
-        json_data = {
-            'msgtype': 'text',
-            'text': {
-                'content': content,
-            },
-            "at": {
-                "atMobiles": [number] if number else [],
-                "isAtAll": is_atall
-            },
-        }
+    json_data = {
+        'msgtype': 'text',
+        'text': {
+            'content': content,
+        },
+        "at": {
+            "atMobiles": [n.strip() for n in number.replace('，', ',').split(',') if n.strip()] if number else [],
+            "isAtAll": is_atall
+        },
+    }
+    # 同一内容发往多个地址时只编码一次
+    data = json.dumps(json_data).encode('utf-8')
+
+    def send_one(api: str) -> Tuple[bool, str]:
         try:
-            data = json.dumps(json_data).encode('utf-8')
-            req = urllib.request.Request(api, data=data, headers=headers)
-            response = opener.open(req, timeout=10)
-            json_str = response.read().decode('utf-8')
-            json_data = json.loads(json_str)
-            if json_data['errcode'] == 0:
-                success.append(api)
-            else:
-                error.append(api)
-                logger.error(f'钉钉推送失败, 推送地址：{api}, {json_data["errmsg"]}')
+            resp_data = _post_json(api, data)
+            if resp_data['errcode'] == 0:
+                return True, 'ok'
+            logger.error(f'钉钉推送失败, 推送地址：{api}, {resp_data["errmsg"]}')
+            return False, str(resp_data["errmsg"])
         except Exception as e:
-            error.append(api)
             logger.error(f'钉钉推送失败, 推送地址：{api}, 错误信息:{e}')
-    return {"success": success, "error": error}
+            return False, str(e)
+
+    return _fan_out(api_list, send_one)
 
 
 def xizhi(url: str, title: str, content: str) -> Dict[str, Any]:
-    success = []
-    error = []
     api_list = url.replace('，', ',').split(',') if url.strip() else []
-    for api in api_list:
-        json_data = {
-            'title': title,
-            'content': content
-        }
+    json_data = {
+        'title': title,
+        'content': content
+    }
+    data = json.dumps(json_data).encode('utf-8')
+
+    def send_one(api: str) -> Tuple[bool, str]:
         try:
-            data = json.dumps(json_data).encode('utf-8')
-            req = urllib.request.Request(api, data=data, headers=headers)
-            response = opener.open(req, timeout=10)
-            json_str = response.read().decode('utf-8')
-            json_data = json.loads(json_str)
-            if json_data['code'] == 200:
-                success.append(api)
-            else:
-                error.append(api)
-                logger.error(f'微信推送失败, 推送地址：{api}, 失败信息：{json_data["msg"]}')
+            resp_data = _post_json(api, data)
+            if resp_data['code'] == 200:
+                return True, 'ok'
+            logger.error(f'微信推送失败, 推送地址：{api}, 失败信息：{resp_data["msg"]}')
+            return False, str(resp_data["msg"])
         except Exception as e:
-            error.append(api)
             logger.error(f'微信推送失败, 推送地址：{api}, 错误信息:{e}')
-    return {"success": success, "error": error}
+            return False, str(e)
+
+    return _fan_out(api_list, send_one)
 
 
 def send_email(email_host: str, login_email: str, email_pass: str, sender_email: str, sender_name: str,
@@ -141,30 +186,30 @@ def bark(api: str, title: str = "message", content: str = 'test', level: str = "
     success = []
     error = []
     api_list = api.replace('，', ',').split(',') if api.strip() else []
+    json_data = {
+        "title": title,
+        "body": content,
+        "level": level,
+        "badge": badge,
+        "autoCopy": auto_copy,
+        "sound": sound,
+        "icon": icon,
+        "group": group,
+        "isArchive": is_archive,
+        "url": url
+    }
+    data = json.dumps(json_data).encode('utf-8')
     for _api in api_list:
-        json_data = {
-            "title": title,
-            "body": content,
-            "level": level,
-            "badge": badge,
-            "autoCopy": auto_copy,
-            "sound": sound,
-            "icon": icon,
-            "group": group,
-            "isArchive": is_archive,
-            "url": url
-        }
         try:
-            data = json.dumps(json_data).encode('utf-8')
             req = urllib.request.Request(_api, data=data, headers=headers)
             response = opener.open(req, timeout=10)
             json_str = response.read().decode("utf-8")
-            json_data = json.loads(json_str)
-            if json_data['code'] == 200:
+            resp_data = json.loads(json_str)
+            if resp_data['code'] == 200:
                 success.append(_api)
             else:
                 error.append(_api)
-                logger.error(f'Bark推送失败, 推送地址：{_api}, 失败信息：{json_data["message"]}')
+                logger.error(f'Bark推送失败, 推送地址：{_api}, 失败信息：{resp_data["message"]}')
         except Exception as e:
             error.append(_api)
             logger.error(f'Bark推送失败, 推送地址：{_api}, 错误信息:{e}')
@@ -0,0 +1,204 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Per-check timing with phase breakdown and per-cycle timing report.
+
+单个直播间检测期间，通过 contextvar 记录各阶段耗时：
+connect(DNS+TCP) / tls / first_byte(等待响应头) / body(读取响应体) / sign(签名) / 其余归为 parse(解析及其他)。
+HTTP 各阶段通过 httpx 的 trace 扩展采集。
+"""
+
+import contextlib
+import contextvars
+import math
+import time
+from typing import Dict, List, Optional
+from .logger import logger
+from .tracing import current_span, span
+
+HTTP_PHASES = ('connect', 'tls', 'first_byte', 'body')
+PHASES = HTTP_PHASES + ('sign', 'parse')
+
+# httpcore trace 事件 -> 阶段名
+_TRACE_PHASES = {
+    'connection.connect_tcp': 'connect',
+    'connection.connect_unix_socket': 'connect',
+    'connection.start_tls': 'tls',
+    'http11.receive_response_headers': 'first_byte',
+    'http2.receive_response_headers': 'first_byte',
+}
+
+
+class CheckTiming:
+    """单个直播间一次检测的耗时记录"""
+
+    __slots__ = ('url', 'name', 'platform', 'start', 'elapsed', 'phases', 'requests', 'retries',
+                 'timeouts', 'throttled', 'outcome', '_trace_starts')
+
+    def __init__(self, url: str, platform: str, name: str = ''):
+        self.url = url
+        self.name = name
+        self.platform = platform
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        self.phases: Dict[str, float] = {}
+        self.requests = 0
+        self.retries = 0
+        self.timeouts = 0
+        # 收到的限流/风控响应数
+        self.throttled = 0
+        self.outcome = ''
+        self._trace_starts: Dict[str, float] = {}
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self, outcome: str) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        self.outcome = outcome
+        # 未被其他阶段覆盖的时间归为解析及其他
+        accounted = sum(self.phases.values())
+        self.phases['parse'] = self.phases.get('parse', 0.0) + max(0.0, self.elapsed - accounted)
+
+    def breakdown(self) -> str:
+        return ' '.join(f"{p}={self.phases[p]:.2f}s" for p in PHASES if self.phases.get(p))
+
+    async def http_trace(self, event_name: str, info: dict) -> None:
+        """httpx trace 扩展回调，按事件的 started/complete 计算阶段耗时"""
+        base, _, state = event_name.rpartition('.')
+        if base in ('http11.receive_response_body', 'http2.receive_response_body'):
+            phase = 'body'
+        else:
+            phase = _TRACE_PHASES.get(base)
+        if phase is None:
+            return
+        if state == 'started':
+            self._trace_starts[base] = time.perf_counter()
+        elif state in ('complete', 'failed'):
+            started = self._trace_starts.pop(base, None)
+            if started is not None:
+                seconds = time.perf_counter() - started
+                self.add_phase(phase, seconds)
+                # 同时记录到当前请求的 span 上
+                request_span = current_span()
+                if request_span is not None:
+                    key = f'http.{phase}_ms'
+                    request_span.attributes[key] = request_span.attributes.get(key, 0) + round(seconds * 1000, 3)
+
+
+_current: contextvars.ContextVar[Optional[CheckTiming]] = contextvars.ContextVar('check_timing', default=None)
+
+
+def current_timing() -> Optional[CheckTiming]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def track_check(url: str, platform: str, name: str = ''):
+    """在当前上下文中开始记录一次检测的耗时"""
+    timing = CheckTiming(url, platform, name)
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """记录一段同步或异步代码所属的阶段耗时并开启同名 span，不在检测上下文中时不做任何事"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        timing.add_phase(name, time.perf_counter() - start)
+
+
+def record_request(timeout: bool = False) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.requests += 1
+        if timeout:
+            timing.timeouts += 1
+
+
+def record_throttle() -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.throttled += 1
+
+
+def record_retry() -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.retries += 1
+
+
+def http_trace_extension() -> dict:
+    """返回 httpx 请求的 extensions 参数，不在检测上下文中时为空"""
+    timing = _current.get()
+    return {'trace': timing.http_trace} if timing is not None else {}
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # 最近秩法：第 ceil(p/100*n) 个值
+    index = min(len(sorted_values) - 1, max(0, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# 慢检测日志，由 setup_logging() 添加的处理器单独写入 logs/slow_checks.log
+slow_logger = logger.bind(slow_check=True)
+
+
+class CycleReport:
+    """一轮检测的耗时汇总"""
+
+    def __init__(self, cycle: int, slow_threshold: float = 10, top_n: int = 5):
+        self.cycle = cycle
+        self.slow_threshold = slow_threshold
+        self.top_n = top_n
+        self.start = time.perf_counter()
+        self.timings: List[CheckTiming] = []
+
+    def add(self, timing: CheckTiming) -> None:
+        self.timings.append(timing)
+        if self.slow_threshold and timing.elapsed >= self.slow_threshold:
+            slow_logger.info(
+                f"慢检测 第{self.cycle}轮 [{timing.platform}] {timing.name or ''} {timing.url} "
+                f"耗时 {timing.elapsed:.2f}s 结果={timing.outcome} 请求={timing.requests} "
+                f"重试={timing.retries} 超时={timing.timeouts} {timing.breakdown()}"
+            )
+
+    def summary(self) -> List[str]:
+        """生成汇总文本，每个元素为一行"""
+        wall = time.perf_counter() - self.start
+        lines = [f"第{self.cycle}轮检测耗时 {wall:.2f}s，共 {len(self.timings)} 次检测，"
+                 f"重试 {sum(t.retries for t in self.timings)} 次，"
+                 f"超时 {sum(t.timeouts for t in self.timings)} 次"]
+
+        by_platform: Dict[str, List[float]] = {}
+        for timing in self.timings:
+            by_platform.setdefault(timing.platform, []).append(timing.elapsed)
+        for platform, values in sorted(by_platform.items()):
+            values.sort()
+            lines.append(f"  [{platform}] n={len(values)} p50={_percentile(values, 50):.2f}s "
+                         f"p95={_percentile(values, 95):.2f}s max={values[-1]:.2f}s")
+
+        slowest = sorted(self.timings, key=lambda t: t.elapsed, reverse=True)[:self.top_n]
+        if slowest:
+            lines.append(f"  最慢的 {len(slowest)} 个直播间:")
+            for timing in slowest:
+                lines.append(f"    {timing.elapsed:.2f}s [{timing.platform}] {timing.name or timing.url} "
+                             f"{timing.breakdown()}")
+        return lines
+
+    def log(self) -> None:
+        for line in self.summary():
+            logger.info(line)
@@ -0,0 +1,206 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Adaptive per-platform concurrency limits (AIMD).
+
+每个平台一个并发上限，根据每次检测的结果调整：
+  - 检测正常且延迟平稳时加性增长，每完成约 limit 次检测上限 +increase
+  - 出现限流信号(429、"请求过快"等风控提示、空响应、验证码页)或延迟明显升高时乘性下降
+下降后有冷却时间，同一批并发请求触发的多次限流只下降一次。
+等待名额的检测按优先级排队，空出的名额总是先给优先级最高的等待者；低优先级的检测只能占用上限的一部分(share)，
+上限因限流下降时先被挤出。
+另有 SingleFlight，同一 key 的并发调用共享一次执行。
+"""
+
+import asyncio
+import bisect
+import contextlib
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from .logger import logger
+from .metrics import CONCURRENCY_DECREASES, CONCURRENCY_LIMIT
+
+# 风控/限流页面中的特征文本，只在较小的响应中查找，避免误判正常页面
+RISK_MARKERS = ('请求过快', '访问过于频繁', '操作太频繁', '验证码', 'captcha', 'verify_center')
+RISK_PAGE_MAX_BYTES = 64 * 1024
+
+T = TypeVar('T')
+
+
+def is_throttled(status_code: int, text: str) -> bool:
+    """根据 HTTP 状态码和响应内容判断是否被平台限流"""
+    if status_code == 429:
+        return True
+    if status_code // 100 != 2:
+        return False
+    if not text.strip():
+        # 抖音等平台触发风控时返回 200 空响应
+        return True
+    return len(text) <= RISK_PAGE_MAX_BYTES and any(marker in text for marker in RISK_MARKERS)
+
+
+class AdaptiveLimit:
+    def __init__(self, platform: str, initial: float = 10, minimum: float = 1, maximum: float = 100,
+                 increase: float = 1, decrease: float = 0.5, latency_tolerance: float = 2.0):
+        self.platform = platform
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, float(initial)))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        # 等待名额的检测：按 (优先级, 到达顺序) 排序的 (优先级, 序号, share, future)
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # 延迟的慢速(基线)与快速指数移动平均
+        self._baseline: Optional[float] = None
+        self._recent: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        CONCURRENCY_LIMIT.set(platform, value=self.limit)
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def _admits(self, share: float) -> bool:
+        return self.in_flight < max(1, int(self.limit * share))
+
+    @contextlib.asynccontextmanager
+    async def slot(self, rank: int = 0, share: float = 1.0):
+        """
+        占用一个并发名额，rank 越小优先级越高。
+        只在进行中的检测少于 上限 * share 且没有更高优先级的等待者时直接进入，否则按优先级排队。
+        """
+        if self._admits(share) and not any(waiter[0] <= rank for waiter in self._waiters):
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            waiter = (rank, next(self._sequence), share, future)
+            bisect.insort(self._waiters, waiter)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif future.done() and not future.cancelled():
+                    # 名额已分配但调用方同时被取消，归还名额
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """按优先级把空出的名额分给等待者，share 不允许的等待者不阻塞其后的等待者"""
+        index = 0
+        while index < len(self._waiters) and self.in_flight < self.limit:
+            _, _, share, future = self._waiters[index]
+            if future.done():
+                del self._waiters[index]
+            elif self._admits(share):
+                del self._waiters[index]
+                self.in_flight += 1
+                future.set_result(None)
+            else:
+                index += 1
+
+    def feedback(self, latency: float, throttled: bool = False, failed: bool = False) -> None:
+        """根据一次检测的结果调整上限"""
+        if throttled:
+            self._back_off('throttled')
+            return
+        if failed:
+            # 网络错误等不代表平台限流，也不作为增长依据
+            return
+
+        self._samples += 1
+        self._recent = latency if self._recent is None else self._recent * 0.7 + latency * 0.3
+        self._baseline = latency if self._baseline is None else self._baseline * 0.98 + latency * 0.02
+        if self._samples >= 10 and self._recent > self._baseline * self.latency_tolerance:
+            self._back_off('latency')
+            return
+        if self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            CONCURRENCY_LIMIT.set(self.platform, value=self.limit)
+            self._wake()
+
+    def _back_off(self, reason: str) -> None:
+        now = time.monotonic()
+        # 冷却时间内已下降过，本批并发中的其他限流信号不再重复下降
+        if now - self._last_decrease < max(1.0, self._recent or 0.0):
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        if reason == 'latency':
+            # 以当前延迟作为新的基线，避免持续下降
+            self._baseline = self._recent
+        CONCURRENCY_LIMIT.set(self.platform, value=self.limit)
+        CONCURRENCY_DECREASES.inc(self.platform, reason)
+        if int(previous) != self.current:
+            logger.info(f"[{self.platform}] 并发上限 {int(previous)} -> {self.current} ({reason})")
+
+
+class PlatformLimits:
+    """按平台创建 AdaptiveLimit，平台配置覆盖默认配置"""
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None, platforms: Optional[Dict[str, dict]] = None):
+        self.defaults = defaults or {}
+        self.platforms = platforms or {}
+        self._limits: Dict[str, AdaptiveLimit] = {}
+
+    def get(self, platform: str) -> AdaptiveLimit:
+        limit = self._limits.get(platform)
+        if limit is None:
+            options = {**self.defaults, **(self.platforms.get(platform) or {})}
+            limit = self._limits[platform] = AdaptiveLimit(platform, **options)
+        return limit
+
+    def snapshot(self) -> Dict[str, int]:
+        return {platform: limit.current for platform, limit in self._limits.items()}
+
+
+class SingleFlight:
+    """同一 key 的并发调用共享一次执行及其结果，执行在独立任务中进行，最后一个调用方取消时才取消执行"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        # 执行任务 -> 仍在等待结果的调用方数量
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """返回 (结果, 是否复用了进行中的调用)"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._done(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            remaining = self._waiters.pop(task) - 1
+            if remaining:
+                self._waiters[task] = remaining
+            elif not task.done():
+                # 所有调用方都已取消(如超出检测时间预算)，取消执行以释放并发名额与浏览器资源，
+                # 之后的调用重新开始一次执行
+                task.cancel()
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 调用方都已取消时，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
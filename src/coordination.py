@@ -0,0 +1,325 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Multi-instance coordination with lease-based room ownership.
+
+多个监控实例(容器)共享一个租约存储，总检测量保持一份：
+  - 直播间按 crc32(key) 分到固定数量的分区，每个分区同一时间只由一个实例持有租约并检测
+  - 每个实例定期心跳续约，按存活实例数计算应得分区数，多余的释放、不足的认领空闲分区，
+    实例加入或退出(租约过期)后自动重新平衡
+  - 状态变化推送前在存储中原子地写入最新状态，已由其他实例推送过的变化不再重复推送
+存储可选：
+  - sqlite: 共享的 SQLite 文件(多个容器挂载同一数据卷)
+  - redis: Redis 协议(RESP)，只用到 SET NX/XX/PX/GET、GET、DEL、PTTL、KEYS、MGET，
+    可指向 Redis 或兼容服务，benchmarks/mock_redis_server.py 可作为本地替身
+"""
+
+import asyncio
+import math
+import os
+import socket
+import sqlite3
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Set
+from .logger import logger
+from .metrics import COORDINATION_INSTANCES, COORDINATION_PARTITIONS
+from .sharding import shard_of
+
+
+class LeaseBackend:
+    """租约存储接口，ttl 单位为秒"""
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """租约空闲、已过期或已属于 owner 时占用并续期"""
+        raise NotImplementedError
+
+    async def release(self, name: str, owner: str) -> None:
+        """释放属于 owner 的租约"""
+        raise NotImplementedError
+
+    async def owners(self, prefix: str) -> Dict[str, str]:
+        """所有以 prefix 开头的有效租约：名称 -> 持有者"""
+        raise NotImplementedError
+
+    async def swap(self, name: str, value: str, ttl: float) -> Optional[str]:
+        """原子地写入新值并返回旧值，不存在或已过期时返回 None"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = asyncio.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS leases '
+                           '(name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)')
+
+    def _transaction(self, func, *args) -> Any:
+        # BEGIN IMMEDIATE 取得写锁，读取与写入之间不会被其他实例插入
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(*args)
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+        return result
+
+    async def _run(self, func, *args) -> Any:
+        async with self._lock:
+            return await asyncio.to_thread(self._transaction, func, *args)
+
+    def _current(self, name: str, now: float) -> Optional[str]:
+        row = self._conn.execute('SELECT owner, expires FROM leases WHERE name = ?', (name,)).fetchone()
+        return row[0] if row and row[1] > now else None
+
+    def _acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        current = self._current(name, now)
+        if current is not None and current != owner:
+            return False
+        self._conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)',
+                           (name, owner, now + ttl))
+        return True
+
+    def _swap(self, name: str, value: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        previous = self._current(name, now)
+        self._conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)',
+                           (name, value, now + ttl))
+        return previous
+
+    def _owners(self, prefix: str) -> Dict[str, str]:
+        now = time.time()
+        # 顺便清理过期的行
+        self._conn.execute('DELETE FROM leases WHERE expires <= ?', (now,))
+        rows = self._conn.execute('SELECT name, owner FROM leases WHERE substr(name, 1, ?) = ?',
+                                  (len(prefix), prefix))
+        return dict(rows.fetchall())
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        return await self._run(self._acquire, name, owner, ttl)
+
+    async def release(self, name: str, owner: str) -> None:
+        await self._run(lambda: self._conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?',
+                                                   (name, owner)))
+
+    async def owners(self, prefix: str) -> Dict[str, str]:
+        return await self._run(self._owners, prefix)
+
+    async def swap(self, name: str, value: str, ttl: float) -> Optional[str]:
+        return await self._run(self._swap, name, value, ttl)
+
+    async def close(self) -> None:
+        self._conn.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisLeaseBackend(LeaseBackend):
+    """最小的 RESP 客户端，命令串行执行"""
+
+    def __init__(self, url: str = 'redis://127.0.0.1:6379/0', prefix: str = 'live:'):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = urllib.parse.unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip('/') or 0)
+        self.prefix = prefix
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._send('AUTH', self.password)
+        if self.db:
+            await self._send('SELECT', self.db)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('redis connection closed')
+        kind, data = line[:1], line[1:-2]
+        if kind == b'+':
+            return data.decode()
+        if kind == b'-':
+            raise RedisError(data.decode())
+        if kind == b':':
+            return int(data)
+        if kind == b'$':
+            size = int(data)
+            if size < 0:
+                return None
+            return (await self._reader.readexactly(size + 2))[:-2].decode()
+        if kind == b'*':
+            size = int(data)
+            return None if size < 0 else [await self._read_reply() for _ in range(size)]
+        raise RedisError(f'unexpected reply: {line!r}')
+
+    async def _send(self, *args: Any) -> Any:
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            value = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(value), value))
+        self._writer.write(b''.join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def command(self, *args: Any) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+                return await self._send(*args)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                # 连接断开时丢弃，下次命令重新连接
+                await self._reset()
+                raise
+
+    async def _reset(self) -> None:
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        key = self.prefix + name
+        ttl_ms = max(1, int(ttl * 1000))
+        if await self.command('SET', key, owner, 'NX', 'PX', ttl_ms) == 'OK':
+            return True
+        # 已是自己的租约时续期；剩余时间足够时才续期，保证读取与写入之间租约不会过期被他人占用
+        if await self.command('GET', key) != owner or await self.command('PTTL', key) < min(1000, ttl_ms // 2):
+            return False
+        return await self.command('SET', key, owner, 'XX', 'PX', ttl_ms) == 'OK'
+
+    async def release(self, name: str, owner: str) -> None:
+        key = self.prefix + name
+        if await self.command('GET', key) == owner:
+            await self.command('DEL', key)
+
+    async def owners(self, prefix: str) -> Dict[str, str]:
+        keys = await self.command('KEYS', f'{self.prefix}{prefix}*') or []
+        if not keys:
+            return {}
+        values = await self.command('MGET', *keys)
+        return {key[len(self.prefix):]: value for key, value in zip(keys, values) if value is not None}
+
+    async def swap(self, name: str, value: str, ttl: float) -> Optional[str]:
+        return await self.command('SET', self.prefix + name, value, 'PX', max(1, int(ttl * 1000)), 'GET')
+
+    async def close(self) -> None:
+        await self._reset()
+
+
+def create_backend(kind: str, path: str = 'logs/coordination.db', url: str = '') -> LeaseBackend:
+    if kind == 'sqlite':
+        return SQLiteLeaseBackend(path)
+    if kind == 'redis':
+        return RedisLeaseBackend(url or 'redis://127.0.0.1:6379/0')
+    raise ValueError(f'unknown coordination backend: {kind}')
+
+
+def default_instance_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class LeaseCoordinator:
+    def __init__(self, backend: LeaseBackend, instance_id: str = '', partitions: int = 64,
+                 lease_ttl: float = 30, heartbeat: float = 10, dedupe_ttl: float = 7 * 86400):
+        self.backend = backend
+        self.instance_id = instance_id or default_instance_id()
+        self.partitions = max(1, partitions)
+        self.lease_ttl = lease_ttl
+        self.heartbeat = heartbeat
+        self.dedupe_ttl = dedupe_ttl
+        self.owned: Set[int] = set()
+        self.members: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    def owns(self, room_key: str) -> bool:
+        return shard_of(room_key, self.partitions) in self.owned
+
+    async def start(self) -> None:
+        """先完成一次认领再返回，之后在后台定期心跳"""
+        await self.rebalance()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopped:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                # 存储不可用时保留现有分区，租约过期前由其他实例接管
+                logger.warning(f"租约续期失败: {e}")
+
+    async def refresh(self) -> None:
+        """只读取本实例当前持有的分区，供多进程模式下的检测进程使用"""
+        leases = await self.backend.owners('partition:')
+        self.owned = {int(name.split(':', 1)[1]) for name, owner in leases.items() if owner == self.instance_id}
+
+    async def rebalance(self) -> None:
+        """续约成员与分区租约，按存活实例数释放多余或认领空闲的分区"""
+        backend, me, ttl = self.backend, self.instance_id, self.lease_ttl
+        await backend.acquire(f'member:{me}', me, ttl)
+        self.members = sorted(name.split(':', 1)[1] for name in await backend.owners('member:'))
+        leases = await backend.owners('partition:')
+        fair = math.ceil(self.partitions / max(1, len(self.members)))
+
+        owned = sorted(int(name.split(':', 1)[1]) for name, owner in leases.items() if owner == me)
+        for partition in owned[fair:]:
+            await backend.release(f'partition:{partition}', me)
+        owned = [p for p in owned[:fair] if await backend.acquire(f'partition:{p}', me, ttl)]
+
+        if len(owned) < fair:
+            # 从按实例错开的位置开始认领，减少多个实例同时争抢同一批分区
+            start = shard_of(me, self.partitions)
+            taken = {int(name.split(':', 1)[1]) for name in leases}
+            for offset in range(self.partitions):
+                if len(owned) >= fair:
+                    break
+                partition = (start + offset) % self.partitions
+                if partition not in taken and await backend.acquire(f'partition:{partition}', me, ttl):
+                    owned.append(partition)
+
+        if set(owned) != self.owned:
+            logger.info(f"实例 {me} 持有 {len(owned)}/{self.partitions} 个分区，存活实例 {len(self.members)} 个")
+        self.owned = set(owned)
+        COORDINATION_INSTANCES.set(value=len(self.members))
+        COORDINATION_PARTITIONS.set(value=len(self.owned))
+
+    async def claim_transition(self, room_key: str, state: str) -> bool:
+        """记录直播间的最新状态，返回 False 表示该变化已由其他实例推送"""
+        try:
+            previous = await self.backend.swap(f'transition:{room_key}', state, self.dedupe_ttl)
+        except Exception as e:
+            # 存储不可用时宁可重复推送，也不漏推
+            logger.warning(f"状态变化去重失败，照常推送: {e}")
+            return True
+        return previous != state
+
+    async def stop(self) -> None:
+        """释放全部租约，其他实例在下次心跳时接管"""
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            for partition in sorted(self.owned):
+                await self.backend.release(f'partition:{partition}', self.instance_id)
+            await self.backend.release(f'member:{self.instance_id}', self.instance_id)
+        except Exception as e:
+            logger.warning(f"释放租约失败: {e}")
+        self.owned = set()
+        await self.backend.close()
@@ -0,0 +1,62 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Per-check deadline budget propagated through contextvars.
+
+PlatformDetector 在拿到平台并发名额后为每次检测设置时间预算，之后的网络请求、重试等待和浏览器操作
+都通过 budget() / sleep() 把自身超时限制在剩余预算内；预算用完时抛出 DeadlineExceeded，
+检测结果记为未知，而不是未开播。
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前检测的截止时间(time.monotonic)，None 表示不限制
+_deadline: ContextVar[Optional[float]] = ContextVar('check_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """检测的时间预算已用完"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """在当前上下文设置时间预算，嵌套时取更早的截止时间"""
+    if not seconds:
+        yield
+        return
+    end = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余预算(秒)，未设置预算时返回 None"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def budget(timeout: float) -> float:
+    """把单次操作的超时限制在剩余预算内，预算已用完时抛出 DeadlineExceeded"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded('check deadline exceeded')
+    return min(timeout, left)
+
+
+async def sleep(seconds: float) -> None:
+    """不超过剩余预算的等待，等待后预算用完时抛出 DeadlineExceeded"""
+    left = remaining()
+    if left is not None and left <= seconds:
+        await asyncio.sleep(max(0.0, left))
+        raise DeadlineExceeded('check deadline exceeded')
+    await asyncio.sleep(seconds)
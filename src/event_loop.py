@@ -0,0 +1,58 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Optional uvloop event loop and loop-level tuning.
+
+监控几乎全部是 asyncio 网络 I/O，可选用 uvloop(基于 libuv)替换标准库事件循环：
+  - asyncio: 标准库事件循环(默认)
+  - uvloop: 使用 uvloop，未安装或平台不支持(Windows)时回退到标准库并给出警告
+  - auto: 已安装 uvloop 时使用，否则使用标准库
+事件循环必须在 asyncio.run() 之前选择，环境变量 LIVE_EVENT_LOOP 优先于配置文件。
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .logger import logger
+
+LOOP_CHOICES = ('asyncio', 'uvloop', 'auto')
+
+
+def uvloop_available() -> bool:
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def install(choice: str = 'asyncio') -> str:
+    """设置事件循环策略，返回实际使用的事件循环名称"""
+    choice = (os.environ.get('LIVE_EVENT_LOOP') or choice or 'asyncio').strip().lower()
+    if choice not in LOOP_CHOICES:
+        logger.warning(f"未知的事件循环 {choice}，使用标准库事件循环")
+        choice = 'asyncio'
+    if choice == 'asyncio':
+        return 'asyncio'
+    try:
+        import uvloop
+    except ImportError:
+        if choice == 'uvloop':
+            logger.warning("未安装 uvloop(pip install uvloop)，使用标准库事件循环")
+        return 'asyncio'
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return 'uvloop'
+
+
+def current() -> str:
+    """当前运行中的事件循环实现名称"""
+    loop = asyncio.get_running_loop()
+    return 'uvloop' if type(loop).__module__.startswith('uvloop') else 'asyncio'
+
+
+def tune(executor_workers: Optional[int] = None) -> None:
+    """调整运行中的事件循环：默认线程池大小(推送、SQLite、导出等 to_thread 调用)"""
+    if executor_workers:
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='live-executor'))
@@ -0,0 +1,136 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Local outage detection.
+
+本地网络或代理故障时，几乎所有平台的检测都会失败或返回"未开播"，
+若照常提交状态会产生大量误报的关播推送，恢复后又是一轮开播推送。
+OutageDetector 统计最近一段时间内的检测结果，当失败率或"直播中 -> 未开播"的比例
+在多个平台上同时异常升高时，判定为本地故障，期间冻结状态、跳过推送。
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from .logger import logger
+
+# 检测结果
+OUTCOME_LIVE = 'live'
+OUTCOME_OFFLINE = 'offline'
+OUTCOME_UNKNOWN = 'unknown'
+
+
+def outcome_of(is_live: Optional[bool]) -> str:
+    if is_live is None:
+        return OUTCOME_UNKNOWN
+    return OUTCOME_LIVE if is_live else OUTCOME_OFFLINE
+
+
+class OutageDetector:
+    """基于滑动窗口的本地故障检测"""
+
+    def __init__(self, window: float = 120, min_samples: int = 10, failure_ratio: float = 0.6,
+                 drop_ratio: float = 0.8, min_live_samples: int = 5, max_outage: float = 900):
+        """
+        :param window: 统计窗口(秒)
+        :param min_samples: 窗口内至少需要的检测次数，低于此值不做判断
+        :param failure_ratio: 检测失败(未知)比例阈值
+        :param drop_ratio: 原本直播中的房间被检测为未开播的比例阈值
+        :param min_live_samples: 计算 drop_ratio 时至少需要的直播中房间检测次数
+        :param max_outage: 最长冻结时间(秒)，超过后清空统计并恢复状态提交，避免真实的集体下播被永久冻结
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_ratio = failure_ratio
+        self.drop_ratio = drop_ratio
+        self.min_live_samples = min_live_samples
+        self.max_outage = max_outage
+        # (时间, 平台, 结果, 之前是否直播中)
+        self._samples: Deque[Tuple[float, str, str, bool]] = deque()
+        self._reset()
+        self._outage = False
+        self._outage_since: Optional[float] = None
+
+    def record(self, platform: str, is_live: Optional[bool], was_live: bool) -> None:
+        """记录一次检测结果"""
+        now = time.monotonic()
+        sample = (now, platform, outcome_of(is_live), was_live)
+        self._samples.append(sample)
+        self._count(sample, 1)
+        self._expire(now)
+        self._evaluate()
+
+    def _count(self, sample: Tuple[float, str, str, bool], delta: int) -> None:
+        """增量维护窗口内的计数，避免每次记录都遍历整个窗口"""
+        _, platform, outcome, was_live = sample
+        counts = self._counts
+        counts['total'] += delta
+        self._bump(self._platforms['all'], platform, delta)
+        if outcome == OUTCOME_UNKNOWN:
+            counts['failed'] += delta
+            self._bump(self._platforms['failed'], platform, delta)
+        elif was_live:
+            counts['live_seen'] += delta
+            if outcome == OUTCOME_OFFLINE:
+                counts['dropped'] += delta
+                self._bump(self._platforms['dropped'], platform, delta)
+
+    @staticmethod
+    def _bump(counter: Dict[str, int], key: str, delta: int) -> None:
+        value = counter.get(key, 0) + delta
+        if value > 0:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    def _expire(self, now: float) -> None:
+        samples = self._samples
+        threshold = now - self.window
+        while samples and samples[0][0] < threshold:
+            self._count(samples.popleft(), -1)
+
+    def _reset(self) -> None:
+        self._samples.clear()
+        self._counts = {'total': 0, 'failed': 0, 'live_seen': 0, 'dropped': 0}
+        self._platforms: Dict[str, Dict[str, int]] = {'all': {}, 'failed': {}, 'dropped': {}}
+
+    def stats(self) -> dict:
+        """窗口内的统计信息"""
+        return {
+            **self._counts,
+            'platforms': len(self._platforms['all']),
+            'failed_platforms': len(self._platforms['failed']),
+            'dropped_platforms': len(self._platforms['dropped']),
+        }
+
+    def _evaluate(self) -> None:
+        stats = self.stats()
+        # 只有一个平台时无法区分平台故障与本地故障，按单平台判断
+        min_platforms = min(2, stats['platforms'])
+        outage = False
+        if stats['total'] >= self.min_samples:
+            if stats['failed'] / stats['total'] >= self.failure_ratio \
+                    and stats['failed_platforms'] >= min_platforms:
+                outage = True
+        if stats['live_seen'] >= self.min_live_samples:
+            if stats['dropped'] / stats['live_seen'] >= self.drop_ratio \
+                    and stats['dropped_platforms'] >= min_platforms:
+                outage = True
+
+        if outage and self._outage and time.monotonic() - self._outage_since > self.max_outage:
+            logger.warning(f"疑似本地故障已持续超过 {self.max_outage} 秒，清空统计并恢复状态提交")
+            self._reset()
+            outage = False
+
+        if outage and not self._outage:
+            self._outage_since = time.monotonic()
+            logger.warning(f"检测到疑似本地网络故障，暂停状态提交与推送: {stats}")
+        elif not outage and self._outage:
+            duration = time.monotonic() - (self._outage_since or time.monotonic())
+            logger.warning(f"本地网络故障已恢复，持续 {duration:.0f} 秒: {stats}")
+            self._outage_since = None
+        self._outage = outage
+
+    @property
+    def in_outage(self) -> bool:
+        return self._outage
@@ -1,11 +1,42 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+import time
+import urllib.parse
 import httpx
 from typing import Dict, Any
 from .. import utils
+from ..metrics import HTTP_CLIENTS_OPEN, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+from ..check_timing import http_trace_extension, record_request, record_throttle
+from ..concurrency import is_throttled
+from ..tracing import span
+from ..deadline import DeadlineExceeded, budget
+from .replay import http_replay
 
 OptionalStr = str | None
 OptionalDict = Dict[str, Any] | None
 
+# 将所有请求转发到指定地址(如本地模拟平台服务 http://127.0.0.1:8900)，原始域名通过 X-Forwarded-Host 传递
+UPSTREAM_OVERRIDE: OptionalStr = os.environ.get('LIVE_HTTP_UPSTREAM') or None
+
+
+def _apply_upstream(url: str, headers: dict, host: str) -> tuple:
+    if not UPSTREAM_OVERRIDE:
+        return url, headers
+    parts = urllib.parse.urlsplit(url)
+    target = urllib.parse.urlsplit(UPSTREAM_OVERRIDE)
+    url = urllib.parse.urlunsplit((target.scheme, target.netloc, parts.path, parts.query, ''))
+    return url, {**headers, 'X-Forwarded-Host': host}
+
+
+def _body_bytes(data: dict | bytes | None, json_data: dict | list | None) -> bytes | None:
+    """请求体的稳定字节表示，用于计算录制/回放夹具的 key"""
+    if json_data is not None:
+        return json.dumps(json_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    if isinstance(data, dict):
+        return urllib.parse.urlencode(sorted(data.items())).encode('utf-8')
+    return data
+
 
 async def async_req(
         url: str,
@@ -24,24 +55,64 @@ async def async_req(
 ) -> OptionalDict | OptionalStr | tuple:
     if headers is None:
         headers = {}
-    try:
-        proxy_addr = utils.handle_proxy_addr(proxy_addr)
-        if data or json_data:
-            async with httpx.AsyncClient(proxy=proxy_addr, timeout=timeout, verify=verify, http2=http2) as client:
-                response = await client.post(url, data=data, json=json_data, headers=headers)
-        else:
-            async with httpx.AsyncClient(proxy=proxy_addr, timeout=timeout, verify=verify, http2=http2) as client:
-                response = await client.get(url, headers=headers, follow_redirects=True)
-
-        if redirect_url:
-            return str(response.url)
-        elif return_cookies:
-            cookies_dict = {name: value for name, value in response.cookies.items()}
-            return (response.text, cookies_dict) if include_cookies else cookies_dict
-        else:
-            resp_str = response.text
-    except Exception as e:
-        resp_str = str(e)
+    host = urllib.parse.urlsplit(url).hostname or 'unknown'
+    request_url, headers = _apply_upstream(url, headers, host)
+    start = time.perf_counter()
+    outcome = 'error'
+    HTTP_IN_FLIGHT.inc()
+    with span('http.request', host=host, method='POST' if data or json_data else 'GET') as request_span:
+        try:
+            # 超时不超过本次检测剩余的时间预算
+            timeout = budget(timeout)
+            proxy_addr = utils.handle_proxy_addr(proxy_addr)
+            HTTP_CLIENTS_OPEN.inc()
+            try:
+                method = 'POST' if data or json_data else 'GET'
+                if http_replay.replaying:
+                    response = await http_replay.replay(method, url, _body_bytes(data, json_data))
+                elif data or json_data:
+                    async with httpx.AsyncClient(proxy=proxy_addr, timeout=timeout, verify=verify, http2=http2) as client:
+                        response = await client.post(request_url, data=data, json=json_data, headers=headers,
+                                                     extensions=http_trace_extension())
+                else:
+                    async with httpx.AsyncClient(proxy=proxy_addr, timeout=timeout, verify=verify, http2=http2) as client:
+                        response = await client.get(request_url, headers=headers, follow_redirects=True,
+                                                    extensions=http_trace_extension())
+                if http_replay.recording:
+                    http_replay.record(method, url, _body_bytes(data, json_data), response,
+                                       time.perf_counter() - start)
+            finally:
+                HTTP_CLIENTS_OPEN.dec()
+            outcome = f'{response.status_code // 100}xx'
+            if is_throttled(response.status_code, response.text):
+                record_throttle()
+            if request_span is not None:
+                request_span.set('http.status_code', response.status_code)
+
+            if redirect_url:
+                return str(response.url)
+            elif return_cookies:
+                cookies_dict = {name: value for name, value in response.cookies.items()}
+                return (response.text, cookies_dict) if include_cookies else cookies_dict
+            else:
+                resp_str = response.text
+        except httpx.TimeoutException as e:
+            outcome = 'timeout'
+            resp_str = str(e)
+        except DeadlineExceeded:
+            outcome = 'timeout'
+            raise
+        except Exception as e:
+            resp_str = str(e)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_LATENCY.observe(host, value=time.perf_counter() - start)
+            HTTP_REQUESTS.inc(host, outcome)
+            record_request(timeout=outcome == 'timeout')
+            if request_span is not None:
+                request_span.set('http.outcome', outcome)
+                if outcome in ('timeout', 'error'):
+                    request_span.status = 'error'
 
     return resp_str
 
@@ -51,9 +122,11 @@ async def get_response_status(url: str, proxy_addr: OptionalStr = None, headers:
 
     try:
         proxy_addr = utils.handle_proxy_addr(proxy_addr)
-        async with httpx.AsyncClient(proxy=proxy_addr, timeout=timeout, verify=verify) as client:
+        async with httpx.AsyncClient(proxy=proxy_addr, timeout=budget(timeout), verify=verify) as client:
             response = await client.head(url, headers=headers, follow_redirects=True)
             return response.status_code == 200
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(e)
     return False
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Function: Offline record/replay of HTTP responses for spider functions.
+
+三种模式，通过 configure() 或环境变量 LIVE_HTTP_MODE / LIVE_HTTP_FIXTURES / LIVE_HTTP_LATENCY 设置：
+  - off: 正常请求(默认)
+  - record: 正常请求，同时把响应保存为夹具文件 <目录>/<host>/<key>.json
+  - replay: 不访问网络，从夹具文件返回响应；找不到夹具时按请求失败处理
+夹具的 key 由请求方法、URL(去掉签名/时间戳等易变参数)和请求体计算，回放结果是确定的。
+快手使用 Playwright，录制为 HAR 文件，回放时通过 route_from_har 提供。
+"""
+
+import asyncio
+import email.message
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+from typing import Any, Optional
+import httpx
+from ..logger import logger
+
+MODE_OFF = 'off'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+# 每次请求都会变化的参数，不参与 key 计算
+VOLATILE_PARAMS = frozenset({
+    'a_bogus', 'X-Bogus', 'msToken', '_signature', 'signature', 'sign', 'w_rid', 'wts',
+    't', 'ts', 'time', 'timestamp', '_', 'callback', 'seqid', 'uuid', 'did',
+})
+
+
+class ReplayMissError(Exception):
+    """回放模式下找不到对应夹具"""
+
+
+class HttpReplay:
+    def __init__(self):
+        self.mode = MODE_OFF
+        self.directory = 'fixtures/http'
+        # 回放延迟(毫秒)，None 表示按录制时的实际耗时
+        self.latency: Optional[float] = 0
+        self.configure(
+            os.environ.get('LIVE_HTTP_MODE', MODE_OFF),
+            os.environ.get('LIVE_HTTP_FIXTURES', self.directory),
+            os.environ.get('LIVE_HTTP_LATENCY', '0'),
+        )
+
+    def configure(self, mode: str, directory: Optional[str] = None, latency: Any = 0) -> None:
+        mode = (mode or MODE_OFF).lower()
+        if mode not in (MODE_OFF, MODE_RECORD, MODE_REPLAY):
+            logger.warning(f"未知的 HTTP 回放模式: {mode}，已关闭")
+            mode = MODE_OFF
+        self.mode = mode
+        if directory:
+            self.directory = directory
+        self.latency = None if str(latency).lower() == 'recorded' else float(latency or 0)
+        if mode != MODE_OFF:
+            logger.info(f"HTTP {'录制' if mode == MODE_RECORD else '回放'}模式，夹具目录: {self.directory}")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        parts = urllib.parse.urlsplit(url)
+        query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                 if k not in VOLATILE_PARAMS]
+        query.sort()
+        return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, urllib.parse.urlencode(query), ''))
+
+    def key(self, method: str, url: str, body: Optional[bytes] = None) -> str:
+        digest = hashlib.sha1(f"{method.upper()} {self.normalize_url(url)}".encode('utf-8'))
+        if body:
+            digest.update(body)
+        return digest.hexdigest()[:20]
+
+    def fixture_path(self, method: str, url: str, body: Optional[bytes] = None, suffix: str = '.json') -> str:
+        host = urllib.parse.urlsplit(url).hostname or 'unknown'
+        return os.path.join(self.directory, host, self.key(method, url, body) + suffix)
+
+    def record(self, method: str, url: str, body: Optional[bytes], response: httpx.Response,
+               elapsed: float) -> None:
+        """保存一次真实响应"""
+        path = self.fixture_path(method, url, body)
+        fixture = {
+            'method': method.upper(),
+            'url': url,
+            'final_url': str(response.url),
+            'status': response.status_code,
+            'content_type': response.headers.get('content-type', ''),
+            'set_cookie': response.headers.get_list('set-cookie'),
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'text': response.text,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            logger.error(f"保存 HTTP 夹具失败 {path}: {e}")
+
+    async def replay(self, method: str, url: str, body: Optional[bytes] = None) -> httpx.Response:
+        """按夹具构造响应，找不到时抛出 ReplayMissError"""
+        path = self.fixture_path(method, url, body)
+        try:
+            with open(path, encoding='utf-8') as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            logger.debug(f"未找到 HTTP 夹具: {method} {url} -> {path}")
+            raise ReplayMissError(f"no fixture for {method} {url}") from None
+
+        delay = fixture.get('elapsed_ms', 0) if self.latency is None else self.latency
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        # 还原录制时的 content-type，响应体按其中的字符集编码，response.text 与录制时一致
+        content_type = fixture.get('content_type') or 'text/plain; charset=utf-8'
+        headers = [('content-type', content_type)]
+        headers.extend(('set-cookie', cookie) for cookie in fixture.get('set_cookie', []))
+        return httpx.Response(
+            fixture['status'],
+            headers=headers,
+            content=self._encode(fixture['text'], content_type),
+            request=httpx.Request(method, fixture.get('final_url') or url),
+        )
+
+    @staticmethod
+    def _encode(text: str, content_type: str) -> bytes:
+        message = email.message.Message()
+        message['content-type'] = content_type
+        try:
+            return text.encode(message.get_content_charset() or 'utf-8', errors='replace')
+        except LookupError:
+            return text.encode('utf-8')
+
+    def har_path(self, url: str) -> str:
+        """Playwright 页面录制使用的 HAR 文件路径"""
+        return self.fixture_path('PAGE', url, suffix='.har')
+
+    async def apply_to_browser_context(self, context, url: str, url_filter: str = '**/*') -> None:
+        """
+        为 Playwright 浏览器上下文开启回放：请求从 HAR 文件提供，未录制的请求直接中止。
+        录制模式下需要在创建上下文时传入 record_har_path=har_path(url)。
+        """
+        if not self.replaying:
+            return
+        path = self.har_path(url)
+        if not os.path.exists(path):
+            raise ReplayMissError(f"no har fixture for {url}")
+        await context.route_from_har(path, url=url_filter, not_found='abort')
+        if self.latency:
+            delay = self.latency / 1000
+
+            async def delay_route(route):
+                await asyncio.sleep(delay)
+                await route.fallback()
+
+            # 后注册的路由先执行，延迟后交给 HAR 路由处理
+            await context.route(url_filter, delay_route)
+
+
+http_replay = HttpReplay()
@@ -8,16 +8,19 @@ Function: Get kuaishou live stream data.
 
 import os
 import traceback
-import asyncio
 from typing import Optional
 from playwright.async_api import async_playwright
 from .utils import trace_error_decorator, logger
+from .http_clients.replay import http_replay
+from . import deadline
+from .check_timing import record_throttle
 from playwright_stealth import Stealth
 
 
 @trace_error_decorator
 async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, cookies: Optional[str] = None) -> dict:
-    result = {"type": 2, "is_live": False, "anchor_name": "未知"}
+    # is_live 为 None 表示状态未知（风控、验证码、页面异常），False 表示确认未开播
+    result = {"type": 2, "is_live": None, "anchor_name": "未知"}
 
     # 检测是否在 Docker 容器中（无 GUI 环境）
     in_docker = os.path.exists('/.dockerenv') or os.environ.get('CONTAINER') == '1'
@@ -45,10 +48,19 @@ async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, c
                 '--no-zygote',
             ] if in_docker else []
         }
-
+        # 录制模式下保存页面的 HAR，供离线回放
+        if http_replay.recording:
+            har_path = http_replay.har_path(url)
+            os.makedirs(os.path.dirname(har_path), exist_ok=True)
+            launch_args.update(record_har_path=har_path, record_har_content='embed')
+
+        # 浏览器启动与页面操作的超时都不超过本次检测剩余的时间预算
+        launch_args['timeout'] = deadline.budget(30) * 1000
         context = await p.chromium.launch_persistent_context(**launch_args)
 
         try:
+            await http_replay.apply_to_browser_context(context, url)
+
             # 注入 Cookies
             if cookies:
                 try:
@@ -62,6 +74,7 @@ async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, c
                     logger.error(f"Cookie 注入失败: {e}")
 
 
+            context.set_default_timeout(deadline.budget(30) * 1000)
             page = await context.new_page()
             await Stealth().apply_stealth_async(page)
 
@@ -80,19 +93,21 @@ async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, c
             page.on("response", handle_response)
 
             # 设置较短的超时，避免任务堆积
-            await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+            await page.goto(url, wait_until="domcontentloaded", timeout=deadline.budget(15) * 1000)
             
             # 等待一小会儿确保 API 触发或初始状态挂载
-            await asyncio.sleep(1) 
+            await deadline.sleep(1)
 
             content = await page.content()
 
             if "请求过快" in content:
                 logger.warning(f"触发反爬虫提示！当前页面内容检测到：'请求过快'。")
+                record_throttle()
                 # headless 模式下无法暂停，等待后重试
-                await asyncio.sleep(3)
+                await deadline.sleep(3)
 
             if "captcha" in content or "验证码" in page.url or "拖动下方滑块" in content:
+                record_throttle()
                 logger.warning("检测到验证码！headless 模式下无法自动处理验证码，请考虑："
                                "1. 在本地运行（非 Docker）并手动过验证码；"
                                "2. 更新 Cookie 以绕过验证；"
@@ -122,10 +137,13 @@ async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, c
                 # 检查是否是因为被封禁导致没数据
                 if 'errorType' in source_data:
                     logger.warning(f"访问受限或页面异常: {source_data.get('errorType')}")
+                else:
+                    result["is_live"] = False
                 return result
 
             # 既然 live_stream 不为 None，现在可以安全地调用 .get()
             is_living = live_stream.get('isLive') or live_stream.get('living')
+            result["is_live"] = bool(is_living)
 
             if is_living:
                 play_urls = live_stream.get('playUrls', {})
@@ -146,6 +164,8 @@ async def get_kuaishou_stream_data(url: str, proxy_addr: Optional[str] = None, c
                         "flv_url_list": play_urls[0].get('adaptationSet', {}).get('representation', [])
                     })
 
+        except deadline.DeadlineExceeded:
+            logger.warning(f"检测超出时间预算 [{url}]")
         except Exception as e:
             logger.error(f"检测出错 [{url}]: {e}")
             logger.debug(f"详细错误日志:\n{traceback.format_exc()}")
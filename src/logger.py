@@ -2,42 +2,205 @@
 
 import os
 import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from loguru import logger
 
 logger.remove()
 
 custom_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> - <level>{message}</level>"
-
-logger.add(
-    sink=sys.stderr,
-    format=custom_format,
-    level="DEBUG",
-    colorize=True,
-    enqueue=True
-)
+file_format = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
 
 script_path = os.path.split(os.path.realpath(sys.argv[0]))[0]
 
-logger.add(
-    f"{script_path}/logs/streamget.log",
-    level="DEBUG",
-    format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
-    filter=lambda i: i["level"].name != "INFO",
-    serialize=False,
-    enqueue=True,
-    retention=1,
-    rotation="300 KB",
-    encoding='utf-8'
-)
-
-logger.add(
-    f"{script_path}/logs/PlayURL.log",
-    level="INFO",
-    format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}",
-    filter=lambda i: i["level"].name == "INFO",
-    serialize=False,
-    enqueue=True,
-    retention=1,
-    rotation="300 KB",
-    encoding='utf-8'
-)
+# 本模块添加的处理器，setup_logging() 重新配置时只替换这些
+_handler_ids: List[int] = []
+
+
+def _is_slow_check(record: Dict[str, Any]) -> bool:
+    """慢检测明细(check_timing.slow_logger)只写入 slow_checks.log"""
+    return record["extra"].get("slow_check", False)
+
+
+def _add_default_handlers() -> None:
+    _handler_ids.append(logger.add(
+        sink=sys.stderr,
+        format=custom_format,
+        level="DEBUG",
+        colorize=True,
+        enqueue=True
+    ))
+
+    _handler_ids.append(logger.add(
+        f"{script_path}/logs/streamget.log",
+        level="DEBUG",
+        format=file_format,
+        filter=lambda i: i["level"].name != "INFO",
+        serialize=False,
+        enqueue=True,
+        retention=1,
+        rotation="300 KB",
+        encoding='utf-8'
+    ))
+
+    _handler_ids.append(logger.add(
+        f"{script_path}/logs/PlayURL.log",
+        level="INFO",
+        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}",
+        filter=lambda i: i["level"].name == "INFO" and not _is_slow_check(i),
+        serialize=False,
+        enqueue=True,
+        retention=1,
+        rotation="300 KB",
+        encoding='utf-8'
+    ))
+
+
+_add_default_handlers()
+
+
+class RateLimiter:
+    """
+    按调用位置限流：每个位置在 window 秒内最多输出 burst 条，超出的被丢弃，
+    下一个窗口的第一条日志附带被抑制的数量。用于"状态未变"这类每轮每个直播间都会输出的日志。
+    """
+
+    def __init__(self, window: float = 60, burst: int = 20, levels: Iterable[str] = ('DEBUG',)):
+        self.window = window
+        self.burst = burst
+        self.levels = frozenset(level.upper() for level in levels)
+        # (模块, 函数, 行号) -> [窗口开始时间, 已输出数, 已抑制数]
+        self._sites: Dict[tuple, List[float]] = {}
+        self._last: tuple = (None, True)
+
+    def allow(self, record: Dict[str, Any]) -> bool:
+        # 同一条记录会依次经过多个处理器的过滤器，只判定一次
+        last_record, last_decision = self._last
+        if last_record is record:
+            return last_decision
+        decision = self._decide(record)
+        self._last = (record, decision)
+        return decision
+
+    def _decide(self, record: Dict[str, Any]) -> bool:
+        if record["level"].name not in self.levels:
+            return True
+        site = (record["name"], record["function"], record["line"])
+        now = time.monotonic()
+        state = self._sites.get(site)
+        if state is None or now - state[0] >= self.window:
+            suppressed = int(state[2]) if state else 0
+            self._sites[site] = [now, 1, 0]
+            if suppressed:
+                record["message"] += f" (过去 {self.window:g} 秒内另有 {suppressed} 条同类日志被抑制)"
+            return True
+        if state[1] < self.burst:
+            state[1] += 1
+            return True
+        state[2] += 1
+        return False
+
+
+def _make_filter(module_levels: Dict[str, str], limiter: Optional[RateLimiter] = None,
+                 extra: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Callable[[Dict[str, Any]], bool]:
+    """组合按模块的最低级别、限流与额外条件"""
+    levels = {name: logger.level(level.upper()).no for name, level in module_levels.items()}
+    # 模块名 -> 最低级别编号，按最长前缀匹配后缓存
+    resolved: Dict[str, int] = {}
+
+    def min_level(name: Optional[str]) -> int:
+        name = name or ''
+        if name not in resolved:
+            match = max((prefix for prefix in levels if prefix == '' or name == prefix
+                         or name.startswith(prefix + '.')), key=len, default=None)
+            resolved[name] = levels[match] if match is not None else 0
+        return resolved[name]
+
+    def log_filter(record: Dict[str, Any]) -> bool:
+        if levels and record["level"].no < min_level(record["name"]):
+            return False
+        if extra is not None and not extra(record):
+            return False
+        return limiter is None or limiter.allow(record)
+
+    return log_filter
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None, suffix: str = '') -> None:
+    """
+    按 config.yml 的 logging 配置重建控制台与文件日志：
+    按模块的最低级别、重复日志限流、可选的 JSON 结构化日志，以及带缓冲的批量写入；
+    慢检测明细单独写入 slow_checks.log。
+    suffix 追加在日志文件名后，多进程模式下每个工作进程写各自的文件，避免轮转冲突。
+    """
+    config = config or {}
+    console_level = str(config.get('console_level', 'DEBUG')).upper()
+    file_level = str(config.get('file_level', 'DEBUG')).upper()
+    module_levels = config.get('modules') or {}
+    rotation = config.get('rotation', '10 MB')
+    retention = config.get('retention', 3)
+    # 文件写入缓冲(字节)，日志在缓冲满或程序退出时批量写入磁盘
+    buffering = int(config.get('buffering', 0) or 0)
+    file_options = dict(rotation=rotation, retention=retention, encoding='utf-8', enqueue=True)
+    if buffering > 0:
+        file_options['buffering'] = buffering
+
+    limiter = None
+    rate_limit = config.get('rate_limit') or {}
+    if rate_limit.get('enabled', True):
+        limiter = RateLimiter(
+            window=float(rate_limit.get('window', 60)),
+            burst=int(rate_limit.get('burst', 20)),
+            levels=rate_limit.get('levels') or ('DEBUG',),
+        )
+
+    for handler_id in _handler_ids:
+        try:
+            logger.remove(handler_id)
+        except ValueError:
+            # 已被其他代码移除，例如 logger.remove()
+            pass
+    _handler_ids.clear()
+
+    _handler_ids.append(logger.add(
+        sink=sys.stderr,
+        format=custom_format,
+        level=console_level,
+        filter=_make_filter(module_levels, limiter),
+        colorize=True,
+        enqueue=True
+    ))
+    _handler_ids.append(logger.add(
+        f"{script_path}/logs/streamget{suffix}.log",
+        level=file_level,
+        format=file_format,
+        filter=_make_filter(module_levels, limiter, lambda i: i["level"].name != "INFO"),
+        **file_options
+    ))
+    _handler_ids.append(logger.add(
+        f"{script_path}/logs/PlayURL{suffix}.log",
+        level="INFO",
+        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}",
+        filter=lambda i: i["level"].name == "INFO" and not _is_slow_check(i),
+        **file_options
+    ))
+    _handler_ids.append(logger.add(
+        f"{script_path}/logs/slow_checks{suffix}.log",
+        level="INFO",
+        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}",
+        filter=_is_slow_check,
+        **file_options
+    ))
+
+    json_path = config.get('json_path')
+    if json_path:
+        if suffix:
+            root, ext = os.path.splitext(json_path)
+            json_path = f"{root}{suffix}{ext}"
+        _handler_ids.append(logger.add(
+            json_path if os.path.isabs(json_path) else os.path.join(script_path, json_path),
+            level=file_level,
+            filter=_make_filter(module_levels, limiter),
+            serialize=True,
+            **file_options
+        ))
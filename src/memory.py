@@ -0,0 +1,171 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Opt-in memory diagnostics for the long-running monitor.
+
+开启后使用 tracemalloc 跟踪 Python 内存分配，每隔若干轮检测做一次快照，
+与上一次快照对比得出增长最多的分配位置，并记录本进程 RSS 以及
+Chromium(快手检测使用的 Playwright 浏览器)等子进程的内存，写入 logs/memory.log。
+子进程内存通过 /proc 读取，仅在 Linux 上可用。
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+from .logger import logger
+
+REPORT_PATH = 'logs/memory.log'
+
+# 快照中忽略的分配来源
+_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>')
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def _read_proc_status(pid: int) -> Tuple[str, int, int]:
+    """读取 /proc/<pid>/status，返回 (进程名, 父进程号, RSS 字节数)"""
+    name, ppid, rss = '', 0, 0
+    with open(f'/proc/{pid}/status', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key == 'Name':
+                name = value.strip()
+            elif key == 'PPid':
+                ppid = int(value)
+            elif key == 'VmRSS':
+                rss = int(value.split()[0]) * 1024
+    return name, ppid, rss
+
+
+def process_rss() -> int:
+    """当前进程 RSS(字节)，非 Linux 时退化为峰值 RSS"""
+    try:
+        return _read_proc_status(os.getpid())[2]
+    except OSError:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+        except (ImportError, OSError):
+            return 0
+
+
+def child_processes_rss() -> Dict[str, Tuple[int, int]]:
+    """按进程名汇总所有子孙进程的 RSS，返回 {进程名: (进程数, RSS 字节数)}"""
+    if not os.path.isdir('/proc'):
+        return {}
+    processes: Dict[int, Tuple[str, int, int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            processes[int(entry)] = _read_proc_status(int(entry))
+        except (OSError, ValueError):
+            continue
+
+    children: Dict[int, List[int]] = {}
+    for pid, (_, ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+
+    result: Dict[str, Tuple[int, int]] = {}
+    stack = list(children.get(os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        name, _, rss = processes[pid]
+        count, total = result.get(name, (0, 0))
+        result[name] = (count + 1, total + rss)
+        stack.extend(children.get(pid, []))
+    return result
+
+
+class MemoryDiagnostics:
+    """周期性内存快照与对比"""
+
+    def __init__(self, every_cycles: int = 10, top_n: int = 15, frames: int = 5,
+                 report_path: str = REPORT_PATH):
+        self.every_cycles = max(1, every_cycles)
+        self.top_n = top_n
+        self.frames = frames
+        self.report_path = report_path
+        self._first: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_rss = 0
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        logger.info(f"内存诊断已开启，每 {self.every_cycles} 轮生成一次报告: {self.report_path}")
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([tracemalloc.Filter(False, f) for f in _IGNORED_FILES])
+
+    def report(self, cycle: int, task_count: int = 0) -> List[str]:
+        """生成一次快照并返回报告文本，可在线程中调用"""
+        snapshot = self._take_snapshot()
+        traced, peak = tracemalloc.get_traced_memory()
+        rss = process_rss()
+        lines = [
+            f"=== 第{cycle}轮内存报告 {time.strftime('%Y-%m-%d %H:%M:%S')} ===",
+            f"RSS {_format_bytes(rss)} (变化 {_format_bytes(rss - self._previous_rss) if self._previous_rss else '-'})，"
+            f"tracemalloc 当前 {_format_bytes(traced)} 峰值 {_format_bytes(peak)}，"
+            f"gc 对象 {len(gc.get_objects())} 个，asyncio 任务 {task_count} 个",
+        ]
+
+        children = child_processes_rss()
+        if children:
+            total = sum(rss for _, rss in children.values())
+            lines.append(f"子进程合计 {_format_bytes(total)}:")
+            for name, (count, child_rss) in sorted(children.items(), key=lambda i: -i[1][1]):
+                lines.append(f"  {name} x{count}: {_format_bytes(child_rss)}")
+
+        if self._previous is not None:
+            lines.append(f"相比上次快照增长最多的 {self.top_n} 处分配:")
+            lines.extend(self._format_diff(snapshot.compare_to(self._previous, 'traceback')))
+        if self._first is not None and self._first is not self._previous:
+            lines.append(f"相比首次快照增长最多的 {self.top_n} 处分配:")
+            lines.extend(self._format_diff(snapshot.compare_to(self._first, 'lineno')))
+        if self._previous is None:
+            lines.append(f"当前占用最多的 {self.top_n} 处分配:")
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                lines.append(f"  {_format_bytes(stat.size)} ({stat.count} 个) {stat.traceback[0]}")
+
+        if self._first is None:
+            self._first = snapshot
+        self._previous = snapshot
+        self._previous_rss = rss
+        return lines
+
+    def _format_diff(self, stats: List[tracemalloc.StatisticDiff]) -> List[str]:
+        lines = []
+        for stat in [s for s in stats if s.size_diff > 0][:self.top_n]:
+            lines.append(f"  +{_format_bytes(stat.size_diff)} (共 {_format_bytes(stat.size)}，"
+                         f"+{stat.count_diff} 个) {stat.traceback[-1]}")
+            # 多帧时追加调用链，便于定位来源
+            for frame in list(stat.traceback)[-2::-1][:self.frames - 1]:
+                lines.append(f"      <- {frame}")
+        return lines or ['  无']
+
+    async def maybe_report(self, cycle: int) -> None:
+        """每隔 every_cycles 轮生成一次报告并写入文件"""
+        if cycle % self.every_cycles:
+            return
+        try:
+            lines = await asyncio.to_thread(self.report, cycle, len(asyncio.all_tasks()))
+        except Exception as e:
+            logger.error(f"生成内存报告失败: {e}")
+            return
+        with open(self.report_path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n\n')
+        logger.info(lines[1])
@@ -0,0 +1,293 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Prometheus-style metrics and an embedded asyncio metrics endpoint.
+
+指标在进程内始终采集（只是简单的计数与分桶），是否对外暴露由 metrics.enabled 控制。
+"""
+
+import asyncio
+import bisect
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from .logger import logger
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Tuple[str, ...]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {labels}")
+        return tuple(str(v) for v in labels)
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Dict[LabelValues, float]:
+        return dict(self._values)
+
+    def _samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {v}' for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[self._key(labels)] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数..., +Inf 计数], 总和
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def get_sum(self, *labels: str) -> float:
+        return self._sums.get(self._key(labels), 0.0)
+
+    def get_count(self, *labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {self._sums[key]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# --- 检测流程 ---
+CHECK_LATENCY = REGISTRY.histogram(
+    'live_check_duration_seconds', '单个直播间检测耗时', ('platform',))
+CHECK_RESULTS = REGISTRY.counter(
+    'live_check_results_total', '检测结果计数(live/offline/unknown)', ('platform', 'outcome'))
+CHECKS_COALESCED = REGISTRY.counter(
+    'live_checks_coalesced_total', '复用同一直播间进行中检测结果的次数', ('platform',))
+CHECKS_IN_FLIGHT = REGISTRY.gauge(
+    'live_checks_in_flight', '正在进行中的检测数', ('platform',))
+CYCLE_DURATION = REGISTRY.histogram(
+    'live_cycle_duration_seconds', '每轮检测总耗时', (),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200))
+CYCLES = REGISTRY.counter('live_cycles_total', '已完成的检测轮数')
+ROOMS = REGISTRY.gauge('live_rooms', '配置的直播间数量')
+SCHEDULE_LAG = REGISTRY.histogram(
+    'live_schedule_lag_seconds', '直播间到期到实际开始检测的延迟', ('priority',),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600))
+
+# --- 自适应并发 ---
+CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'live_concurrency_limit', '各平台当前的并发检测上限', ('platform',))
+CONCURRENCY_DECREASES = REGISTRY.counter(
+    'live_concurrency_decreases_total', '并发上限下降次数(throttled/latency)', ('platform', 'reason'))
+
+# --- 多实例协调 ---
+COORDINATION_INSTANCES = REGISTRY.gauge('live_coordination_instances', '当前存活的监控实例数')
+COORDINATION_PARTITIONS = REGISTRY.gauge('live_coordination_partitions', '本实例持有租约的分区数')
+DUPLICATE_TRANSITIONS = REGISTRY.counter(
+    'live_duplicate_transitions_total', '已由其他实例推送而跳过的状态变化', ('platform',))
+
+# --- 端到端延迟 ---
+LATENCY_BUCKETS = (5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+DETECTION_LATENCY = REGISTRY.histogram(
+    'live_detection_latency_seconds', '平台开播时间到状态确认的延迟', ('platform',), buckets=LATENCY_BUCKETS)
+NOTIFICATION_LATENCY = REGISTRY.histogram(
+    'live_notification_latency_seconds', '平台开播时间到推送完成的延迟', ('platform',), buckets=LATENCY_BUCKETS)
+CONFIRM_DELAY = REGISTRY.histogram(
+    'live_confirm_delay_seconds', '首次观察到状态变化到确认的耗时', ('platform', 'transition'),
+    buckets=(0, 5, 10, 20, 30, 60, 120, 300, 600))
+
+# --- HTTP ---
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'async_req 请求计数', ('host', 'outcome'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'async_req 请求耗时', ('host',))
+HTTP_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', '进行中的 HTTP 请求数')
+HTTP_CLIENTS_OPEN = REGISTRY.gauge('http_clients_open', '当前打开的 HTTP 客户端(连接池)数量')
+
+# --- 推送 ---
+PUSH_LATENCY = REGISTRY.histogram(
+    'push_delivery_duration_seconds', '推送耗时', ('channel',))
+PUSH_RESULTS = REGISTRY.counter(
+    'push_deliveries_total', '推送结果计数', ('channel', 'outcome'))
+
+# --- 事件循环 ---
+LOOP_LAG = REGISTRY.histogram(
+    'event_loop_lag_seconds', '事件循环调度延迟', (),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+LOOP_LAG_LAST = REGISTRY.gauge('event_loop_lag_last_seconds', '最近一次测得的事件循环调度延迟')
+
+
+async def monitor_loop_lag(interval: float = 0.5) -> None:
+    """周期性测量事件循环调度延迟"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        LOOP_LAG.observe(value=lag)
+        LOOP_LAG_LAST.set(value=lag)
+
+
+# 额外的调试接口: 路径 -> 处理函数(查询字符串) -> 响应文本
+_ROUTES: Dict[str, Callable[[str], Awaitable[str]]] = {}
+
+
+def register_route(path: str, handler: Callable[[str], Awaitable[str]]) -> None:
+    """在指标接口上注册额外的路径"""
+    _ROUTES[path] = handler
+
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # 丢弃请求头
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if not line or line in (b'\r\n', b'\n'):
+                break
+        parts = request_line.decode('latin-1').split()
+        path, _, query = (parts[1] if len(parts) > 1 else '/').partition('?')
+        if path in ('/metrics', '/'):
+            body = REGISTRY.expose().encode('utf-8')
+            status = '200 OK'
+        elif path in _ROUTES:
+            body = (await _ROUTES[path](query)).encode('utf-8')
+            status = '200 OK'
+        else:
+            body = b'not found\n'
+            status = '404 Not Found'
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug(f"指标接口请求处理失败: {e}")
+    finally:
+        writer.close()
+
+
+# 运行中的指标接口与事件循环延迟测量任务，保留引用避免任务被回收
+_server: Optional[asyncio.AbstractServer] = None
+_lag_task: Optional[asyncio.Task] = None
+
+
+async def start_metrics_server(host: str = '127.0.0.1', port: int = 9108) -> Optional[asyncio.AbstractServer]:
+    """启动内置的指标 HTTP 接口，并开始测量事件循环延迟"""
+    global _server, _lag_task
+    try:
+        server = await asyncio.start_server(_handle_request, host, port)
+    except OSError as e:
+        logger.error(f"指标接口启动失败 {host}:{port}: {e}")
+        return None
+    _server = server
+    _lag_task = asyncio.create_task(monitor_loop_lag(), name='metrics-loop-lag')
+    logger.info(f"指标接口已启动: http://{host}:{port}/metrics")
+    return server
+
+
+async def stop_metrics_server() -> None:
+    """关闭指标接口并停止事件循环延迟测量，未启动时不做任何事"""
+    global _server, _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        await asyncio.gather(_lag_task, return_exceptions=True)
+        _lag_task = None
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
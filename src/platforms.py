@@ -0,0 +1,68 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Platform identification for live room urls.
+"""
+
+import re
+import urllib.parse
+from typing import Tuple
+
+# (URL 关键字, 平台标识, 平台显示名称)
+PLATFORM_RULES = (
+    (('douyin.com', 'iesdouyin.com'), 'douyin', '抖音'),
+    (('bilibili.com',), 'bilibili', 'B站'),
+    (('huya.com',), 'huya', '虎牙'),
+    (('douyu.com',), 'douyu', '斗鱼'),
+    (('kuaishou.com', 'kuaishou.cn'), 'kuaishou', '快手'),
+    (('tiktok.com',), 'tiktok', 'TikTok'),
+    (('xhslink.com', 'xiaohongshu.com', 'redelight.cn'), 'xiaohongshu', '小红书'),
+)
+
+UNKNOWN_PLATFORM = ('unknown', '未知平台')
+
+PLATFORM_NAMES = {key: name for _, key, name in PLATFORM_RULES}
+
+
+def get_platform(url: str) -> Tuple[str, str]:
+    """根据 URL 识别平台，返回 (平台标识, 平台显示名称)"""
+    for keywords, key, name in PLATFORM_RULES:
+        for keyword in keywords:
+            if keyword in url:
+                return key, name
+    return UNKNOWN_PLATFORM
+
+
+# 平台 -> 提取房间标识的正则(第一个分组)，按顺序尝试
+ROOM_ID_RULES = {
+    'douyin': [re.compile(r'live\.douyin\.com/(\w+)')],
+    'bilibili': [re.compile(r'live\.bilibili\.com/(?:h5/|blanc/)?(\d+)')],
+    'huya': [re.compile(r'huya\.com/(\w+)')],
+    'douyu': [re.compile(r'douyu\.com/.*?[?&]rid=(\w+)'), re.compile(r'douyu\.com/(?!topic/)(?:beta/)?(\w+)')],
+    'kuaishou': [re.compile(r'live\.kuaishou\.com/u/([\w-]+)')],
+    'tiktok': [re.compile(r'tiktok\.com/@([\w.-]+)')],
+    'xiaohongshu': [re.compile(r'/user/profile/(\w+)'), re.compile(r'[?&]host_id=(\w+)')],
+}
+
+
+def normalize_url(url: str) -> str:
+    """统一协议与域名大小写，去掉 www./m. 前缀、查询参数、锚点和末尾的斜杠"""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def canonical_room_key(url: str) -> str:
+    """
+    同一直播间不同形式的 URL(移动版、带分享参数等)对应同一个 key，如 douyin:123456。
+    无法从 URL 中识别房间标识的(如短链接)使用规范化后的 URL。
+    """
+    platform = get_platform(url)[0]
+    for pattern in ROOM_ID_RULES.get(platform, ()):
+        match = pattern.search(url)
+        if match:
+            return f"{platform}:{match.group(1)}"
+    return f"{platform}:{normalize_url(url)}"
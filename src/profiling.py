@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: On-demand sampling profiler and asyncio task dump.
+
+收到 SIGUSR1 信号（或访问指标接口的 /debug/profile）时，在后台线程中以固定间隔对
+事件循环所在线程采样调用栈，持续 N 秒后写出 flamegraph 可用的折叠栈文件
+(logs/profile-时间.folded，可直接交给 flamegraph.pl / speedscope)，
+同时写出当前所有 asyncio 任务及其等待位置 (logs/tasks-时间.txt)。
+"""
+
+import asyncio
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+from types import FrameType
+from typing import Counter, List, Optional, Tuple
+from .logger import logger
+
+PROFILE_DIR = 'logs'
+
+_running = False
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+def sample_thread(thread_id: int, seconds: float, interval: float) -> Tuple[Counter[str], int]:
+    """对指定线程采样调用栈，返回 (折叠栈计数, 采样次数)"""
+    samples: Counter[str] = collections.Counter()
+    count = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples[_collapse(frame)] += 1
+            count += 1
+        del frame
+        time.sleep(interval)
+    return samples, count
+
+
+def _await_chain(coro) -> List[str]:
+    """沿 cr_await 展开协程的等待链，得到任务当前挂起的位置"""
+    chain = []
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            # Future 等非协程对象，链条到此为止
+            chain.append(f"<{type(coro).__name__}>")
+            break
+        chain.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})")
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return chain
+
+
+def dump_tasks() -> str:
+    """生成当前事件循环中所有任务的文本快照"""
+    tasks = sorted(asyncio.all_tasks(), key=lambda t: t.get_name())
+    lines = [f"共 {len(tasks)} 个任务，时间 {time.strftime('%Y-%m-%d %H:%M:%S')}", '']
+    for task in tasks:
+        coro = task.get_coro()
+        state = 'done' if task.done() else 'pending'
+        lines.append(f"- {task.get_name()} [{state}] {getattr(coro, '__qualname__', coro)}")
+        for entry in _await_chain(coro):
+            lines.append(f"    {entry}")
+    return '\n'.join(lines) + '\n'
+
+
+async def profile(seconds: float = 30, interval: float = 0.005) -> Optional[Tuple[str, str]]:
+    """采样事件循环线程 seconds 秒，返回 (折叠栈文件, 任务快照文件)，已在采样中时返回 None"""
+    global _running
+    if _running:
+        logger.warning("性能采样正在进行中，忽略本次请求")
+        return None
+    _running = True
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        tasks_path = os.path.join(PROFILE_DIR, f'tasks-{stamp}.txt')
+        folded_path = os.path.join(PROFILE_DIR, f'profile-{stamp}.folded')
+
+        with open(tasks_path, 'w', encoding='utf-8') as f:
+            f.write(dump_tasks())
+
+        logger.info(f"开始性能采样，持续 {seconds} 秒...")
+        samples, count = await asyncio.to_thread(
+            sample_thread, threading.get_ident(), seconds, interval)
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, hits in samples.most_common():
+                f.write(f"{stack} {hits}\n")
+        logger.info(f"性能采样完成，共 {count} 次采样: {folded_path}，任务快照: {tasks_path}")
+        return folded_path, tasks_path
+    finally:
+        _running = False
+
+
+async def handle_profile_request(query: str) -> str:
+    """指标接口 /debug/profile?seconds=N 的处理函数"""
+    params = urllib.parse.parse_qs(query)
+    try:
+        seconds = min(300.0, float(params.get('seconds', ['30'])[0]))
+    except ValueError:
+        seconds = 30.0
+    result = await profile(seconds)
+    if result is None:
+        return "profiling already running\n"
+    return '\n'.join(result) + '\n'
+
+
+async def handle_tasks_request(query: str) -> str:
+    """指标接口 /debug/tasks 的处理函数"""
+    return dump_tasks()
+
+
+def install_signal_handler(seconds: float = 30, interval: float = 0.005) -> bool:
+    """注册 SIGUSR1 触发性能采样，平台不支持时返回 False"""
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    def on_signal():
+        task = loop.create_task(profile(seconds, interval))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    try:
+        loop.add_signal_handler(signal.SIGUSR1, on_signal)
+    except (NotImplementedError, RuntimeError):
+        return False
+    logger.info(f"已注册 SIGUSR1 性能采样 (kill -USR1 {os.getpid()})，持续 {seconds} 秒")
+    return True
@@ -0,0 +1,148 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Precompiled push message templates.
+"""
+
+import re
+import time
+import datetime
+import functools
+from typing import Any, Dict, Optional, Tuple
+from .logger import logger
+
+# 模板变量 -> 渲染字段
+TEMPLATE_VARIABLES = {
+    '直播间名称': 'anchor',
+    '时间': 'now',
+    '链接': 'url',
+    'URL': 'url',
+    '标题': 'title',
+    '平台': 'platform',
+    '开播时长': 'duration',
+    '观看人数': 'viewers',
+}
+
+VARIABLE_PATTERN = re.compile(r'\[([^\[\]\n]+)\]')
+
+
+def _escape_literal(text: str) -> str:
+    """转义普通文本中的花括号，避免被 str.format 解析"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def _normalize_newlines(text: str) -> str:
+    """配置文件中可能是 "\\n" 或 "\n"，这里统一转换为实际的换行符"""
+    return text.replace('\\n', '\n')
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """将秒数格式化为 'X小时Y分钟'"""
+    if seconds is None or seconds < 0:
+        return '未知'
+    minutes = int(seconds) // 60
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}小时{minutes}分钟"
+    return f"{minutes}分钟"
+
+
+class _NowCache:
+    """按秒缓存格式化后的当前时间，同一秒内多次推送不重复 strftime"""
+
+    __slots__ = ('_second', '_text')
+
+    def __init__(self):
+        self._second = -1
+        self._text = ''
+
+    def get(self) -> str:
+        second = int(time.time())
+        if second != self._second:
+            self._text = datetime.datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S')
+            self._second = second
+        return self._text
+
+
+now_cache = _NowCache()
+
+
+class CompiledTemplate:
+    """
+    编译后的推送模板。
+
+    模板在配置加载时解析一次：变量替换为 str.format 占位符，换行符与花括号在编译期处理，
+    推送时只需一次 format_map 调用。
+    """
+
+    __slots__ = ('source', '_format', 'fields', 'unknown')
+
+    def __init__(self, source: str, format_str: str, fields: frozenset, unknown: Tuple[str, ...]):
+        self.source = source
+        self._format = format_str
+        self.fields = fields
+        self.unknown = unknown
+
+    def render(self, anchor: str, url: str, info: Optional[Dict[str, Any]] = None) -> str:
+        """渲染模板，info 中可携带 title/platform/viewers/live_since 等信息"""
+        info = info or {}
+        values = {'anchor': anchor, 'url': url}
+        fields = self.fields
+        if 'now' in fields:
+            values['now'] = now_cache.get()
+        if 'title' in fields:
+            values['title'] = info.get('title') or ''
+        if 'platform' in fields:
+            values['platform'] = info.get('platform') or ''
+        if 'viewers' in fields:
+            viewers = info.get('viewers')
+            values['viewers'] = '未知' if viewers in (None, '') else str(viewers)
+        if 'duration' in fields:
+            live_since = info.get('live_since')
+            values['duration'] = format_duration(time.time() - live_since if live_since else None)
+        return self._format.format_map(values)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    """
+    编译推送模板。
+
+    :param template: 形如 "[直播间名称] 已开播！\\n[时间]" 的模板字符串
+    :return: CompiledTemplate，未知变量按原样输出并记录警告
+    """
+    if not template:
+        format_str = '主播：{anchor}\n时间：{now}\n链接：{url}'
+        return CompiledTemplate('', format_str, frozenset({'anchor', 'now', 'url'}), ())
+
+    source = template
+    template = _normalize_newlines(template)
+    parts = []
+    fields = set()
+    unknown = []
+    pos = 0
+    for match in VARIABLE_PATTERN.finditer(template):
+        parts.append(_escape_literal(template[pos:match.start()]))
+        name = match.group(1).strip()
+        field = TEMPLATE_VARIABLES.get(name) or TEMPLATE_VARIABLES.get(name.upper())
+        if field:
+            parts.append('{' + field + '}')
+            fields.add(field)
+        else:
+            parts.append(_escape_literal(match.group(0)))
+            unknown.append(name)
+        pos = match.end()
+    parts.append(_escape_literal(template[pos:]))
+
+    # 确保包含完整信息
+    if 'url' not in fields:
+        parts.append('\n链接：{url}')
+        fields.add('url')
+
+    format_str = ''.join(parts)
+    # 编译期校验占位符与转义是否合法
+    format_str.format_map({field: '' for field in fields})
+
+    if unknown:
+        logger.warning(f"推送模板包含未知变量: {', '.join(unknown)}，将按原样输出")
+    return CompiledTemplate(source, format_str, frozenset(fields), tuple(unknown))
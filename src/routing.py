@@ -0,0 +1,153 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Per-room subscriber routing index.
+
+urls.yml 示例:
+
+groups:
+  team_a:
+    channels: ["dingtalk"]
+    dingtalk:
+      url: "https://oapi.dingtalk.com/robot/send?access_token=xxx"
+    mentions: "13800000000"
+    template:
+      start: "[直播间名称] 开播了: [标题]"
+      stop: "[直播间名称] 下播了，本次直播 [开播时长]"
+
+urls:
+  - url: "https://live.douyin.com/123456"
+    name: "主播A"
+    groups: ["team_a", "default"]   # default 表示全局 push 配置
+  - url: "https://live.bilibili.com/789"
+    name: "主播B"
+    channels: ["bark"]              # 房间级配置，覆盖所在分组的配置，未配置分组时覆盖全局 push 配置
+"""
+
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .logger import logger
+
+DEFAULT_GROUP = 'default'
+
+# 房间项中与路由相关的字段
+ROOM_ROUTE_KEYS = ('channels', 'mentions', 'template')
+
+
+class DeliveryTarget:
+    """一个订阅者的推送目标：渠道集合、渠道配置及模板"""
+
+    __slots__ = ('name', 'config', 'channels', 'start_template', 'stop_template')
+
+    def __init__(self, name: str, config: dict, channels, start_template, stop_template):
+        self.name = name
+        self.config = config
+        self.channels = channels
+        self.start_template = start_template
+        self.stop_template = stop_template
+
+    def __repr__(self) -> str:
+        return f"DeliveryTarget({self.name!r}, channels={sorted(self.channels)})"
+
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """递归合并两个字典，override 中的值优先"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def route_to_push_section(route: dict) -> dict:
+    """将分组/房间的路由字段转换为 push 配置段的覆盖项"""
+    section = {k: v for k, v in route.items() if k not in ('mentions', 'template', 'groups', 'url', 'name')}
+    if isinstance(section.get('channels'), str):
+        section['channels'] = [section['channels']]
+
+    mentions = route.get('mentions')
+    if mentions:
+        if isinstance(mentions, list):
+            mentions = ','.join(str(m) for m in mentions)
+        section.setdefault('dingtalk', {})['at_mobiles'] = str(mentions)
+        section.setdefault('feishu', {})['at'] = str(mentions)
+
+    template = route.get('template')
+    if isinstance(template, dict):
+        if template.get('start'):
+            section['custom_start_msg'] = template['start']
+        if template.get('stop'):
+            section['custom_stop_msg'] = template['stop']
+    elif isinstance(template, str) and template:
+        section['custom_start_msg'] = section['custom_stop_msg'] = template
+    return section
+
+
+class RoutingIndex:
+    """
+    房间 -> 推送目标 的路由索引。
+
+    每个直播间只检测一次，状态变化时按索引分发给所有订阅者。
+    未配置路由的直播间使用全局 push 配置。
+    """
+
+    def __init__(self, target_factory: Callable[[str, dict], DeliveryTarget], default_target: DeliveryTarget):
+        self._target_factory = target_factory
+        self.default_target = default_target
+        self._index: Dict[str, Tuple[DeliveryTarget, ...]] = {}
+        # 已编译目标缓存，配置未变化时复用
+        self._target_cache: Dict[str, DeliveryTarget] = {}
+        self._default_targets = (default_target,)
+
+    def _get_target(self, name: str, route: dict) -> DeliveryTarget:
+        key = name + '|' + json.dumps(route, sort_keys=True, ensure_ascii=False, default=str)
+        target = self._target_cache.get(key)
+        if target is None:
+            target = self._target_factory(name, route_to_push_section(route))
+            self._target_cache[key] = target
+        return target
+
+    def rebuild(self, urls: List[Dict[str, Any]], groups: Optional[Dict[str, dict]] = None) -> None:
+        """根据 URL 配置重建索引"""
+        groups = groups or {}
+        index: Dict[str, Tuple[DeliveryTarget, ...]] = {}
+        used_keys = set()
+
+        for item in urls:
+            targets: List[DeliveryTarget] = []
+            # 房间级字段作为覆盖项应用到直播间所在的每个分组
+            room_route = {k: item[k] for k in ROOM_ROUTE_KEYS if item.get(k)}
+            for group_name in item.get('groups') or []:
+                if group_name == DEFAULT_GROUP:
+                    group_route = {}
+                elif group_name in groups:
+                    group_route = groups[group_name]
+                else:
+                    logger.warning(f"直播间 {item.get('name')} 引用了不存在的推送分组: {group_name}")
+                    continue
+                if room_route:
+                    target = self._get_target(f"group:{group_name}/room:{item.get('name')}",
+                                              {**group_route, **room_route})
+                elif group_name == DEFAULT_GROUP:
+                    target = self.default_target
+                else:
+                    target = self._get_target(f"group:{group_name}", group_route)
+                targets.append(target)
+
+            if room_route and not targets:
+                targets.append(self._get_target(f"room:{item.get('name')}", room_route))
+
+            # 去重，保持顺序
+            unique_targets = tuple(dict.fromkeys(targets)) or self._default_targets
+            used_keys.update(id(t) for t in unique_targets)
+            index[item['url']] = unique_targets
+
+        self._index = index
+        # 清理已不再被引用的目标
+        self._target_cache = {k: t for k, t in self._target_cache.items() if id(t) in used_keys}
+
+    def targets_for(self, url: str) -> Tuple[DeliveryTarget, ...]:
+        return self._index.get(url, self._default_targets)
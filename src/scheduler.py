@@ -0,0 +1,208 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Continuous pipeline scheduler for room checks.
+
+每个直播间按各自的下次检测时间独立调度，不再等待整轮检测全部完成：
+  - 调度任务从时间轮中按 tick 批量取出到期的直播间，放入有界队列
+  - 固定数量的常驻工作任务从队列取出并执行检测，每次检测有超时上限
+  - 检测结束后按 开始时间 + 间隔 重新调度，慢平台不会拖慢其他直播间
+  - 直播间可设置优先级(high/normal/low)：各优先级有各自的检测间隔，到期的直播间按优先级取出，
+    空闲的工作任务总是先检测高优先级的直播间
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from .logger import logger
+from .metrics import SCHEDULE_LAG
+from .timing_wheel import TimingWheel
+
+Item = Dict[str, str]
+
+# 优先级从高到低，未设置时为 normal
+PRIORITIES = ('high', 'normal', 'low')
+DEFAULT_PRIORITY = 'normal'
+# 排在所有检测之后的停止标记
+_STOP = (len(PRIORITIES), math.inf, '')
+
+
+def priority_rank(item: Item) -> int:
+    priority = item.get('priority', DEFAULT_PRIORITY)
+    return PRIORITIES.index(priority) if priority in PRIORITIES else PRIORITIES.index(DEFAULT_PRIORITY)
+
+
+class RoomScheduler:
+    def __init__(self, handler: Callable[[Item], Awaitable[None]], interval: float,
+                 workers: int = 100, check_timeout: float = 60, tick: float = 0.1,
+                 intervals: Optional[Dict[str, float]] = None):
+        self.handler = handler
+        self.interval = interval
+        # 各优先级的检测间隔，未配置的使用 interval
+        self.intervals = intervals or {}
+        self.workers = max(1, workers)
+        self.check_timeout = check_timeout
+        # 直播间 key(URL) -> 配置项
+        self._rooms: Dict[str, Item] = {}
+        # 等待到期的直播间
+        self._wheel = TimingWheel(tick=tick)
+        # 已到期、等待放入队列的直播间：(优先级, 到期时间, key) 堆
+        self._ready: List[Tuple[int, float, str]] = []
+        # 已取出、正在排队或检测中的直播间
+        self._inflight: Set[str] = set()
+        # 正在执行检测的直播间
+        self._running: Set[str] = set()
+        # 调度任务计划的下次唤醒时间
+        self._next_wake: Optional[float] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopped = False
+        # 当前一轮中尚未完成检测的直播间
+        self._round_pending: Set[str] = set()
+        self._round_done: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.workers)
+        self._wakeup = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._dispatch(), name='scheduler-dispatch'))
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f'scheduler-worker-{index}'))
+
+    async def stop(self) -> None:
+        # wait_for 在取消与完成同时发生时可能吞掉取消，循环需要自行检查停止标志
+        self._stopped = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def drain(self, timeout: float) -> int:
+        """停止派发新的检测，等待进行中的检测完成，超时后取消；返回被取消的检测数量"""
+        if not self._tasks:
+            return 0
+        self._stopped = True
+        dispatcher, workers = self._tasks[0], self._tasks[1:]
+        dispatcher.cancel()
+        await asyncio.gather(dispatcher, return_exceptions=True)
+        # 丢弃尚未开始的检测，空闲的工作任务收到 None 后退出
+        while not self._queue.empty():
+            _, _, key = self._queue.get_nowait()
+            self._inflight.discard(key)
+            self._queue.task_done()
+        for _ in workers:
+            self._queue.put_nowait(_STOP)
+        pending: Set[asyncio.Task] = set()
+        if timeout > 0:
+            _, pending = await asyncio.wait(workers, timeout=timeout)
+        else:
+            pending = {task for task in workers if not task.done()}
+        cancelled = len(self._running)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._tasks.clear()
+        return cancelled
+
+    def sync(self, items: List[Item]) -> None:
+        """按最新的 urls.yml 增删直播间，新增的立即检测，已有的保持原有节奏"""
+        rooms = {item['url']: item for item in items}
+        removed = self._rooms.keys() - rooms.keys()
+        for key in removed:
+            self._wheel.cancel(key)
+            self._round_pending.discard(key)
+        now = time.monotonic()
+        for key in rooms.keys() - self._rooms.keys():
+            if key not in self._inflight:
+                self._schedule(key, now)
+        for key in rooms.keys() & self._rooms.keys():
+            # 优先级调整后间隔变短的，不必等到原定时间
+            entry = self._wheel.get(key)
+            if entry is not None and rooms[key].get('priority') != self._rooms[key].get('priority'):
+                due = now + self.interval_for(rooms[key])
+                if due < entry.deadline:
+                    self._schedule(key, due)
+        self._rooms = rooms
+        if removed:
+            logger.debug(f"移除 {len(removed)} 个直播间的调度")
+        self._check_round()
+
+    async def wait_round(self) -> None:
+        """等待当前所有直播间各完成一次检测，用于按轮汇总统计"""
+        self._round_pending = set(self._rooms)
+        self._round_done = asyncio.Event()
+        self._check_round()
+        await self._round_done.wait()
+
+    def _check_round(self) -> None:
+        if self._round_done is not None and not self._round_pending:
+            self._round_done.set()
+
+    def interval_for(self, item: Item) -> float:
+        return self.intervals.get(item.get('priority', DEFAULT_PRIORITY)) or self.interval
+
+    def _schedule(self, key: str, due: float) -> None:
+        self._wheel.add(key, due)
+        if self._wakeup is not None and (self._next_wake is None or due < self._next_wake):
+            self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        """按 tick 取出到期的直播间放入队列，队列满时等待，未放入的按优先级保留在待处理堆中"""
+        while not self._stopped:
+            for entry in self._wheel.advance(time.monotonic()):
+                item = self._rooms.get(entry.key)
+                if item is None:
+                    continue
+                self._inflight.add(entry.key)
+                heapq.heappush(self._ready, (priority_rank(item), entry.deadline, entry.key))
+            # 只在队列有空位时从堆中取出，队列满时等工作任务取走后再推进时间轮，
+            # 等待期间到期的高优先级直播间会排在已到期的低优先级直播间前面
+            while self._ready and not self._queue.full():
+                ready = heapq.heappop(self._ready)
+                if ready[2] not in self._rooms:
+                    self._inflight.discard(ready[2])
+                    continue
+                self._queue.put_nowait(ready)
+            self._next_wake = self._wheel.next_expiry()
+            delay = None if self._next_wake is None else max(0.0, self._next_wake - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while not self._stopped:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+            if self._ready:
+                # 队列腾出空位，唤醒调度任务补充
+                self._wakeup.set()
+            _, due, key = entry
+            item = self._rooms.get(key)
+            started = time.monotonic()
+            self._running.add(key)
+            try:
+                if item is not None:
+                    SCHEDULE_LAG.observe(item.get('priority', DEFAULT_PRIORITY), value=max(0.0, started - due))
+                    await asyncio.wait_for(self.handler(item), self.check_timeout or None)
+            except asyncio.TimeoutError:
+                logger.warning(f"检测超时({self.check_timeout}s)，已取消: {item.get('name', '')} {key}")
+            except Exception as e:
+                logger.error(f"调度检测失败 [{key}]: {e}")
+            finally:
+                self._running.discard(key)
+                self._inflight.discard(key)
+                self._queue.task_done()
+                if key in self._rooms:
+                    self._schedule(key, max(started + self.interval_for(self._rooms[key]), time.monotonic()))
+                self._round_pending.discard(key)
+                self._check_round()
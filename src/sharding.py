@@ -0,0 +1,165 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Multi-process sharded room checking.
+
+开启后主进程作为协调者，启动 N 个工作进程：
+  - 每个工作进程有独立的事件循环、HTTP 连接与浏览器，只检测 crc32(直播间 key) % N 等于自身编号的直播间
+  - 检测结果通过进程间队列发回协调者，由协调者统一做状态确认、记录与推送
+  - 状态确认的复查由协调者发给直播间所属的工作进程执行，与常规检测共用该进程的并发上限
+  - 检测相关的指标与每轮耗时汇总在各工作进程中记录，工作进程在 metrics.port + 1 + 编号 上提供各自的指标接口
+工作进程异常退出时由协调者在下一轮重新启动；退出时先发送 SIGTERM，工作进程完成进行中的检测后退出。
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from .logger import logger
+
+
+# 结果队列中工作进程对请求的应答：(REPLY, 请求编号, 结果)
+REPLY = 'shard-reply'
+
+
+def shard_of(key: str, count: int) -> int:
+    """稳定的分片编号，不受进程间哈希随机化影响"""
+    return zlib.crc32(key.encode('utf-8')) % count if count > 1 else 0
+
+
+class ShardPool:
+    def __init__(self, count: int, target: Callable[..., None], args: tuple = ()):
+        self.count = count
+        self.target = target
+        # 追加在 (编号, 进程数, 结果队列, 请求队列) 之后传给 target
+        self.args = args
+        # 使用 spawn，避免 fork 继承事件循环和浏览器状态
+        self._context = multiprocessing.get_context('spawn')
+        self.results = self._context.Queue()
+        # 每个工作进程一个请求队列，重启后沿用
+        self.requests = [self._context.Queue() for _ in range(count)]
+        # 请求编号 -> 等待应答的 future
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_id = 0
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * count
+        self._reader: Optional[threading.Thread] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.received = 0
+
+    def start(self) -> None:
+        for index in range(self.count):
+            self._spawn(index)
+        logger.info(f"已启动 {self.count} 个检测工作进程")
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=self.target, args=(index, self.count, self.results, self.requests[index]) + self.args,
+                                        name=f'live-shard-{index}', daemon=True)
+        process.start()
+        self._processes[index] = process
+
+    def ensure_alive(self) -> None:
+        """重新启动异常退出的工作进程"""
+        for index, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                logger.warning(f"检测工作进程 {index} 已退出(退出码 {process.exitcode})，正在重新启动")
+                self._spawn(index)
+
+    async def consume(self, handler: Callable[[tuple], Awaitable[None]]) -> None:
+        """在后台线程读取结果队列，每条结果交给 handler 处理"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def read() -> None:
+            while True:
+                item = self.results.get()
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+                if item is None:
+                    return
+
+        self._reader = threading.Thread(target=read, name='shard-results', daemon=True)
+        self._reader.start()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if item[0] == REPLY:
+                future = self._pending.pop(item[1], None)
+                if future is not None and not future.done():
+                    future.set_result(item[2])
+                continue
+            self.received += 1
+            task = asyncio.create_task(handler(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def request(self, index: int, payload: Any, timeout: float) -> Any:
+        """向指定工作进程发送请求并等待应答，超时抛出 asyncio.TimeoutError(需已调用 consume)"""
+        self._request_id += 1
+        request_id = self._request_id
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.requests[index].put((request_id, payload))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def join_handlers(self, timeout: float) -> None:
+        """等待已收到结果的处理(状态确认、推送)完成，超时后取消"""
+        tasks = list(self._tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout) if timeout > 0 else (set(), set(tasks))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self, timeout: float = 10) -> None:
+        """向工作进程发送 SIGTERM，timeout 秒内未退出的强制结束"""
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    logger.warning(f"检测工作进程 {process.name} 未在 {timeout}s 内退出，强制结束")
+                    process.kill()
+                    process.join()
+        if self._reader is not None and self._reader.is_alive():
+            self.results.put(None)
+            self._reader.join(5)
+        self.results.close()
+        self.results.join_thread()
+        for requests in self.requests:
+            # 工作进程已退出，未读取的请求直接丢弃
+            requests.cancel_join_thread()
+            requests.close()
+
+
+def serve_requests(requests, results, handler: Callable[[Any], Awaitable[Any]]) -> threading.Thread:
+    """在工作进程中处理协调者的请求，handler 的结果(出错时为 None)经结果队列返回"""
+    loop = asyncio.get_running_loop()
+
+    async def run(request_id: int, payload: Any) -> None:
+        try:
+            value = await handler(payload)
+        except Exception as e:
+            logger.error(f"处理协调者请求失败 [{payload}]: {e}")
+            value = None
+        results.put((REPLY, request_id, value))
+
+    def read() -> None:
+        while True:
+            request = requests.get()
+            try:
+                asyncio.run_coroutine_threadsafe(run(*request), loop)
+            except RuntimeError:
+                # 事件循环已关闭，进程正在退出
+                return
+
+    thread = threading.Thread(target=read, name='shard-requests', daemon=True)
+    thread.start()
+    return thread
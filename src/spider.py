@@ -17,11 +17,12 @@ import ssl
 import re
 import json
 import execjs
-from . import utils
+from . import deadline, utils
 from .utils import trace_error_decorator
 from .room import get_sec_user_id, get_unique_id, UnsupportedUrlError
 from .http_clients.async_http import async_req
 from .ab_sign import ab_sign
+from .check_timing import phase, record_retry
 
 ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
@@ -41,6 +42,11 @@ def get_params(url: str, params: str) -> OptionalStr:
 async def get_play_url_list(m3u8: str, proxy: OptionalStr = None, header: OptionalDict = None,
                             abroad: bool = False) -> List[str]:
     resp = await async_req(url=m3u8, proxy_addr=proxy, headers=header, abroad=abroad)
+    return parse_play_url_list(resp)
+
+
+def parse_play_url_list(resp: str) -> List[str]:
+    """解析 m3u8 主播放列表，按码率从高到低返回各清晰度地址"""
     play_url_list = []
     for i in resp.split('\n'):
         if i.startswith('https://'):
@@ -84,13 +90,15 @@ async def get_douyin_web_stream_data(url: str, proxy_addr: OptionalStr = None, c
         }
 
         api = f'https://live.douyin.com/webcast/room/web/enter/?{urllib.parse.urlencode(params)}'
-        a_bogus = ab_sign(urllib.parse.urlparse(api).query, headers['user-agent'])
+        with phase('sign'):
+            a_bogus = ab_sign(urllib.parse.urlparse(api).query, headers['user-agent'])
         api += "&a_bogus=" + a_bogus
         try:
             json_str = await async_req(url=api, proxy_addr=proxy_addr, headers=headers)
             if not json_str:
                 raise Exception("it triggered risk control")
-            json_data = json.loads(json_str)['data']
+            with phase('parse'):
+                json_data = json.loads(json_str)['data']
             if not json_data['data']:
                 raise Exception(f"{url} VR live is not supported")
             room_data = json_data['data'][0]
@@ -270,6 +278,7 @@ async def get_douyin_stream_data(url: str, proxy_addr: OptionalStr = None, cooki
 
     except Exception as e:
         print(f"First data retrieval failed: {url} Preparing to switch parsing methods due to {e}")
+        record_retry()
         return await get_douyin_app_stream_data(url=url, proxy_addr=proxy_addr, cookies=cookies)
 
 
@@ -284,8 +293,10 @@ async def get_tiktok_stream_data(url: str, proxy_addr: OptionalStr = None, cooki
     }
 
     for i in range(3):
+        if i:
+            record_retry()
         html_str = await async_req(url=url, proxy_addr=proxy_addr, headers=headers, abroad=True, http2=False)
-        time.sleep(1)
+        await deadline.sleep(1)
         if "We regret to inform you that we have discontinued operating TikTok" in html_str:
             msg = re.search('<p>\n\\s+(We regret to inform you that we have discontinu.*?)\\.\n\\s+</p>', html_str)
             raise ConnectionError(
@@ -476,6 +487,7 @@ async def get_douyu_info_data(url: str, proxy_addr: OptionalStr = None, cookies:
         result["title"] = json_data['room']['room_name'].replace('&nbsp;', '')
         result["is_live"] = True
         result["room_id"] = json_data['room']['room_id']
+        result["start_time"] = json_data['room'].get('show_time')
     return result
 
 
@@ -587,20 +599,24 @@ async def get_bilibili_room_info(url: str, proxy_addr: OptionalStr = None, cooki
         room_id = url.split('?')[0].rsplit('/', maxsplit=1)[1]
         json_str = await async_req(f'https://api.live.bilibili.com/room/v1/Room/room_init?id={room_id}',
                            proxy_addr=proxy_addr, headers=headers)
-        room_info = json.loads(json_str)
+        with phase('parse'):
+            room_info = json.loads(json_str)
         uid = room_info['data']['uid']
         live_status = True if room_info['data']['live_status'] == 1 else False
 
         api = f'https://api.live.bilibili.com/live_user/v1/Master/info?uid={uid}'
         json_str2 = await async_req(url=api, proxy_addr=proxy_addr, headers=headers)
-        anchor_info = json.loads(json_str2)
+        with phase('parse'):
+            anchor_info = json.loads(json_str2)
         anchor_name = anchor_info['data']['info']['uname']
 
         title = await get_bilibili_room_info_h5(url, proxy_addr, cookies)
-        return {"anchor_name": anchor_name, "live_status": live_status, "room_url": url, "title": title}
+        return {"anchor_name": anchor_name, "live_status": live_status, "room_url": url, "title": title,
+                "live_time": room_info['data'].get('live_time')}
     except Exception as e:
         print(e)
-        return {"anchor_name": '', "live_status": False, "room_url": url}
+        # live_status 为 None 表示请求失败、状态未知
+        return {"anchor_name": '', "live_status": None, "room_url": url}
 
 
 @trace_error_decorator
@@ -206,6 +206,43 @@ async def get_kuaishou_stream_url(json_data: dict, video_quality: str) -> dict:
     return result
 
 
+def get_huya_anti_code(old_anti_code: str, stream_name: str) -> str:
+    """根据页面中的 sFlvAntiCode 生成虎牙直播流地址的防盗链参数"""
+    # js地址：https://hd.huya.com/cdn_libs/mobile/hysdk-m-202402211431.js
+
+    params_t = 100
+    sdk_version = 2403051612
+
+    # sdk_id是13位数毫秒级时间戳
+    t13 = int(time.time()) * 1000
+    sdk_sid = t13
+
+    # 计算uuid和uid参数值
+    init_uuid = (int(t13 % 10 ** 10 * 1000) + int(1000 * random.random())) % 4294967295  # 直接初始化
+    uid = random.randint(1400000000000, 1400009999999)  # 经过测试uid也可以使用init_uuid代替
+    seq_id = uid + sdk_sid  # 移动端请求的直播流地址中包含seqId参数
+
+    # 计算ws_time参数值(16进制) 可以是当前毫秒时间戳，当然也可以直接使用url_query['wsTime'][0]
+    # 原始最大误差不得慢240000毫秒
+    target_unix_time = (t13 + 110624) // 1000
+    ws_time = f"{target_unix_time:x}".lower()
+
+    # fm参数值是经过url编码然后base64编码得到的，解码结果类似 DWq8BcJ3h6DJt6TY_$0_$1_$2_$3
+    # 具体细节在上面js中查看，大概在32657行代码开始，有base64混淆代码请自行替换
+    url_query = urllib.parse.parse_qs(old_anti_code)
+    ws_secret_pf = base64.b64decode(urllib.parse.unquote(url_query['fm'][0]).encode()).decode().split("_")[0]
+    ws_secret_hash = hashlib.md5(f'{seq_id}|{url_query["ctype"][0]}|{params_t}'.encode()).hexdigest()
+    ws_secret = f'{ws_secret_pf}_{uid}_{stream_name}_{ws_secret_hash}_{ws_time}'
+    ws_secret_md5 = hashlib.md5(ws_secret.encode()).hexdigest()
+
+    anti_code = (
+        f'wsSecret={ws_secret_md5}&wsTime={ws_time}&seqid={seq_id}&ctype={url_query["ctype"][0]}&ver=1'
+        f'&fs={url_query["fs"][0]}&uuid={init_uuid}&u={uid}&t={params_t}&sv={sdk_version}'
+        f'&sdk_sid={sdk_sid}&codec=264'
+    )
+    return anti_code
+
+
 @trace_error_decorator
 async def get_huya_stream_url(json_data: dict, video_quality: str) -> dict:
     game_live_info = json_data['data'][0]['gameLiveInfo']
@@ -227,43 +264,7 @@ async def get_huya_stream_url(json_data: dict, video_quality: str) -> dict:
         hls_url_suffix = select_cdn.get('sHlsUrlSuffix')
         flv_anti_code = select_cdn.get('sFlvAntiCode')
 
-        def get_anti_code(old_anti_code: str) -> str:
-
-            # js地址：https://hd.huya.com/cdn_libs/mobile/hysdk-m-202402211431.js
-
-            params_t = 100
-            sdk_version = 2403051612
-
-            # sdk_id是13位数毫秒级时间戳
-            t13 = int(time.time()) * 1000
-            sdk_sid = t13
-
-            # 计算uuid和uid参数值
-            init_uuid = (int(t13 % 10 ** 10 * 1000) + int(1000 * random.random())) % 4294967295  # 直接初始化
-            uid = random.randint(1400000000000, 1400009999999)  # 经过测试uid也可以使用init_uuid代替
-            seq_id = uid + sdk_sid  # 移动端请求的直播流地址中包含seqId参数
-
-            # 计算ws_time参数值(16进制) 可以是当前毫秒时间戳，当然也可以直接使用url_query['wsTime'][0]
-            # 原始最大误差不得慢240000毫秒
-            target_unix_time = (t13 + 110624) // 1000
-            ws_time = f"{target_unix_time:x}".lower()
-
-            # fm参数值是经过url编码然后base64编码得到的，解码结果类似 DWq8BcJ3h6DJt6TY_$0_$1_$2_$3
-            # 具体细节在上面js中查看，大概在32657行代码开始，有base64混淆代码请自行替换
-            url_query = urllib.parse.parse_qs(old_anti_code)
-            ws_secret_pf = base64.b64decode(urllib.parse.unquote(url_query['fm'][0]).encode()).decode().split("_")[0]
-            ws_secret_hash = hashlib.md5(f'{seq_id}|{url_query["ctype"][0]}|{params_t}'.encode()).hexdigest()
-            ws_secret = f'{ws_secret_pf}_{uid}_{stream_name}_{ws_secret_hash}_{ws_time}'
-            ws_secret_md5 = hashlib.md5(ws_secret.encode()).hexdigest()
-
-            anti_code = (
-                f'wsSecret={ws_secret_md5}&wsTime={ws_time}&seqid={seq_id}&ctype={url_query["ctype"][0]}&ver=1'
-                f'&fs={url_query["fs"][0]}&uuid={init_uuid}&u={uid}&t={params_t}&sv={sdk_version}'
-                f'&sdk_sid={sdk_sid}&codec=264'
-            )
-            return anti_code
-
-        new_anti_code = get_anti_code(flv_anti_code)
+        new_anti_code = get_huya_anti_code(flv_anti_code, stream_name)
         flv_url = f'{flv_url}/{stream_name}.{flv_url_suffix}?{new_anti_code}&ratio='
         m3u8_url = f'{hls_url}/{stream_name}.{hls_url_suffix}?{new_anti_code}&ratio='
 
@@ -291,6 +292,7 @@ async def get_huya_stream_url(json_data: dict, video_quality: str) -> dict:
         result |= {
             'is_live': True,
             'title': live_title,
+            'start_time': game_live_info.get('startTime'),
             'quality': video_quality,
             'm3u8_url': m3u8_url,
             'flv_url': flv_url,
@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Hierarchical timing wheel for scheduling very large room sets.
+
+分层时间轮：每层 2^bits 个槽，第 0 层每槽一个 tick，上层每槽覆盖下一层一整圈。
+到期时间较远的条目放在上层，指针转完一圈时整槽下放(cascade)到下层。
+  - 添加/取消都是 O(1)：每个槽是 key -> 条目 的字典，条目记录自己所在的槽
+  - 推进时按 tick 批量取出到期条目，一次唤醒处理一整批
+默认 tick=0.1 秒、每层 64 槽、4 层，可覆盖约 19 天，更远的条目暂存在溢出区。
+"""
+
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class TimerEntry:
+    __slots__ = ('key', 'deadline', 'tick', 'slot', 'data')
+
+    def __init__(self, key: Hashable, deadline: float, tick: int, data: Any = None):
+        self.key = key
+        self.deadline = deadline
+        self.tick = tick
+        # 当前所在的槽，取消时直接从中删除
+        self.slot: Optional[Dict[Hashable, 'TimerEntry']] = None
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f'TimerEntry({self.key!r}, {self.deadline:.3f})'
+
+
+class TimingWheel:
+    def __init__(self, tick: float = 0.1, bits: int = 6, levels: int = 4, now: Optional[float] = None):
+        self.tick = tick
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.levels = levels
+        self._wheels: List[List[Dict[Hashable, TimerEntry]]] = [
+            [{} for _ in range(self.size)] for _ in range(levels)]
+        self._entries: Dict[Hashable, TimerEntry] = {}
+        # 已到期但尚未被 advance() 取出的条目
+        self._expired: Dict[Hashable, TimerEntry] = {}
+        # 超出最高层范围的条目
+        self._overflow: Dict[Hashable, TimerEntry] = {}
+        # 下一个待处理的 tick
+        self._current = int((time.monotonic() if now is None else now) / tick)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[TimerEntry]:
+        return self._entries.get(key)
+
+    def add(self, key: Hashable, deadline: float, data: Any = None) -> TimerEntry:
+        """添加定时条目，key 已存在时复用原条目并更新到期时间"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = TimerEntry(key, deadline, int(deadline / self.tick), data)
+        else:
+            del entry.slot[key]
+            entry.deadline = deadline
+            entry.tick = int(deadline / self.tick)
+            entry.data = data
+        self._place(entry)
+        return entry
+
+    def cancel(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        del entry.slot[key]
+        entry.slot = None
+        return True
+
+    def _place(self, entry: TimerEntry) -> None:
+        tick = entry.tick
+        delta = tick - self._current
+        if delta < 0:
+            slot = self._expired
+        else:
+            # delta 的二进制位数决定所在层
+            level = (delta.bit_length() - 1) // self.bits if delta else 0
+            if level < self.levels:
+                slot = self._wheels[level][(tick >> (self.bits * level)) & self.mask]
+            else:
+                slot = self._overflow
+        slot[entry.key] = entry
+        entry.slot = slot
+
+    def _cascade(self, level: int, index: int) -> None:
+        """把上层一个槽中的条目重新放置到下层"""
+        slot = self._wheels[level][index]
+        if not slot:
+            return
+        self._wheels[level][index] = {}
+        for entry in slot.values():
+            self._place(entry)
+
+    def advance(self, now: Optional[float] = None) -> List[TimerEntry]:
+        """推进到 now，返回所有已到期的条目(按到期时间排序)，并从时间轮中移除"""
+        target = int((time.monotonic() if now is None else now) / self.tick)
+        expired = list(self._expired.values())
+        self._expired = {}
+        if not self._entries or len(expired) == len(self._entries):
+            # 没有其他条目，直接跳到目标 tick
+            self._current = max(self._current, target + 1)
+        while self._current <= target:
+            current = self._current
+            index = current & self.mask
+            if index == 0:
+                for level in range(1, self.levels):
+                    level_index = (current >> (self.bits * level)) & self.mask
+                    self._cascade(level, level_index)
+                    if level_index != 0:
+                        break
+                else:
+                    if self._overflow:
+                        overflow, self._overflow = self._overflow, {}
+                        for entry in overflow.values():
+                            self._place(entry)
+            slot = self._wheels[0][index]
+            if slot:
+                self._wheels[0][index] = {}
+                expired.extend(slot.values())
+            self._current = current + 1
+        for entry in expired:
+            del self._entries[entry.key]
+            entry.slot = None
+        expired.sort(key=lambda e: e.deadline)
+        return expired
+
+    def next_expiry(self) -> Optional[float]:
+        """下次需要调用 advance() 的时间，没有条目时返回 None"""
+        if not self._entries:
+            return None
+        if self._expired:
+            return self._current * self.tick
+        wheel = self._wheels[0]
+        # 第 0 层只需检查到本圈结束，之后需要下放上层条目
+        for current in range(self._current, (self._current | self.mask) + 1):
+            if wheel[current & self.mask]:
+                return current * self.tick
+        return ((self._current | self.mask) + 1) * self.tick
@@ -0,0 +1,216 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: Lightweight tracing spans for room checks.
+
+每次直播间检测是一条 trace：调度器处理直播间时的 room 为根 span，其下为 check(check_status)，
+以及签名、每次 async_req 请求、JSON 解析和推送等子 span；单独调用 check_status 或推送时它们各自作为根 span。span 结束后进入内存缓冲，由后台任务批量导出到：
+  - jsonl: 本地 JSONL 文件，每行一个 span
+  - otlp: OTLP/HTTP JSON 协议，可指向本地 collector，如 http://127.0.0.1:4318/v1/traces
+未开启时 span() 只做一次 contextvar 读取，开销可以忽略。
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import random
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+from .logger import logger
+
+SERVICE_NAME = 'live_status_notify'
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'status')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = 'ok'
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class JsonlExporter:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n')
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON 导出"""
+
+    def __init__(self, endpoint: str, timeout: float = 5):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]) -> None:
+        otlp_spans = [{
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id or '',
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in span.attributes.items()],
+            'status': {'code': 2 if span.status == 'error' else 1},
+        } for span in spans]
+        body = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': otlp_spans}],
+        }]}
+        req = urllib.request.Request(self.endpoint, data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.exporter = None
+        self.batch_size = 512
+        self.flush_interval = 5.0
+        self._buffer: List[Span] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def configure(self, exporter, batch_size: int = 512, flush_interval: float = 5.0) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = exporter is not None
+
+    def finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self.flush_async())
+
+    def _take(self) -> List[Span]:
+        spans, self._buffer = self._buffer, []
+        return spans
+
+    def flush(self) -> None:
+        spans = self._take()
+        if spans and self.exporter is not None:
+            try:
+                self.exporter.export(spans)
+            except Exception as e:
+                logger.debug(f"导出 trace 失败: {e}")
+
+    async def flush_async(self) -> None:
+        spans = self._take()
+        if spans and self.exporter is not None:
+            try:
+                await asyncio.to_thread(self.exporter.export, spans)
+            except Exception as e:
+                logger.debug(f"导出 trace 失败: {e}")
+
+    async def run(self) -> None:
+        """后台定期导出"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_async()
+
+
+tracer = Tracer()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name: str, /, root: bool = False, **attributes):
+    """
+    开启一个 span，可用于同步或异步代码块。
+
+    :param root: 为 True 时，若当前没有父 span 则开启新的 trace；
+                 为 False 时只在已有 trace 中记录，避免产生零散的孤立 span
+    """
+    if not tracer.enabled:
+        yield None
+        return
+    parent = _current_span.get()
+    if parent is None and not root:
+        yield None
+        return
+    if parent is None:
+        new_span = Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    else:
+        new_span = Span(name, parent.trace_id, parent.span_id, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = 'error'
+        new_span.attributes['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish(new_span)
+
+
+def setup_tracing(exporter_type: str, path: str = 'logs/traces.jsonl', endpoint: str = '',
+                  batch_size: int = 512, flush_interval: float = 5.0) -> Optional[asyncio.Task]:
+    """根据配置开启 tracing，返回后台导出任务"""
+    exporter_type = (exporter_type or '').lower()
+    if exporter_type == 'jsonl':
+        exporter = JsonlExporter(path)
+    elif exporter_type == 'otlp':
+        exporter = OtlpHttpExporter(endpoint or 'http://127.0.0.1:4318/v1/traces')
+    else:
+        logger.warning(f"未知的 tracing 导出方式 {exporter_type}(可选 jsonl / otlp)，tracing 未开启")
+        return None
+    tracer.configure(exporter, batch_size, flush_interval)
+    logger.info(f"tracing 已开启，导出方式: {exporter_type}")
+    return asyncio.create_task(tracer.run())
@@ -0,0 +1,73 @@
+# -*- encoding: utf-8 -*-
+
+"""
+Function: End-to-end detection latency and state transition history.
+
+部分平台会返回开播时间（B站 live_time、抖音 create_time、虎牙 startTime、斗鱼 show_time 等），
+据此计算每次开播的:
+  - 检测延迟: 平台开播时间 -> 状态确认(提交)的时间
+  - 通知延迟: 平台开播时间 -> 推送全部完成的时间
+每次状态变化都会写入历史文件(JSONL)，便于按实际 SLO 调整检测策略。
+"""
+
+import datetime
+import json
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from .logger import logger
+
+# 不带时区的时间字符串按北京时间解析
+_DEFAULT_TZ = datetime.timezone(datetime.timedelta(hours=8))
+
+
+def parse_start_time(value: Any) -> Optional[float]:
+    """
+    将平台返回的开播时间统一转换为 Unix 时间戳(秒)，无法识别时返回 None。
+
+    支持秒/毫秒时间戳(数字或数字字符串)、ISO 8601(如 Twitch 的 createdAt)以及 "YYYY-MM-DD HH:MM:SS"。
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value or value in ('0', '0000-00-00 00:00:00'):
+            return None
+        if not value.isdigit():
+            try:
+                parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=_DEFAULT_TZ)
+            return parsed.timestamp()
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        return None
+    if timestamp <= 0:
+        return None
+    # 毫秒时间戳
+    if timestamp > 1e11:
+        timestamp /= 1000
+    return timestamp
+
+
+class TransitionHistory:
+    """状态变化历史，保留最近的记录在内存中，并追加写入 JSONL 文件"""
+
+    def __init__(self, path: Optional[str] = 'logs/transitions.jsonl', keep: int = 1000):
+        self.path = path
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        self.recent.append(entry)
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.error(f"写入状态变化历史失败: {e}")
@@ -0,0 +1,7 @@
+# -*- encoding: utf-8 -*-
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,11 @@
+# -*- encoding: utf-8 -*-
+
+from src.check_timing import _percentile
+
+
+def test_percentile_nearest_rank():
+    assert _percentile([], 50) == 0.0
+    assert _percentile([1.0, 2.0], 50) == 1.0
+    assert _percentile([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], 50) == 3.0
+    assert _percentile([float(i) for i in range(1, 101)], 95) == 95.0
+    assert _percentile([5.0], 99) == 5.0
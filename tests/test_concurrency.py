@@ -0,0 +1,68 @@
+# -*- encoding: utf-8 -*-
+
+import asyncio
+
+from src.concurrency import AdaptiveLimit, SingleFlight
+
+
+def test_single_flight_cancels_after_last_waiter():
+    """部分调用方取消时共享执行继续，全部取消后执行被取消"""
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do('room', work))
+        second = asyncio.ensure_future(flight.do('room', work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled and len(flight) == 1
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled and len(flight) == 0
+        # 之后的调用重新执行
+        assert await flight.do('room', lambda: asyncio.sleep(0, result='ok')) == ('ok', False)
+
+    asyncio.run(run())
+
+
+def test_adaptive_limit_serves_higher_priority_first():
+    """名额已满时，空出的名额先给高优先级的等待者，而不是先到的普通优先级"""
+    order = []
+
+    async def check(limit, rank, label, hold):
+        async with limit.slot(rank):
+            order.append(label)
+            await asyncio.sleep(hold)
+
+    async def run():
+        limit = AdaptiveLimit('test', initial=1, maximum=1)
+        first = asyncio.create_task(check(limit, 1, 'first', 0.05))
+        await asyncio.sleep(0)
+        normal = [asyncio.create_task(check(limit, 1, f'normal{i}', 0)) for i in range(3)]
+        await asyncio.sleep(0)
+        high = asyncio.create_task(check(limit, 0, 'high', 0))
+        await asyncio.gather(first, high, *normal)
+
+    asyncio.run(run())
+    assert order == ['first', 'high', 'normal0', 'normal1', 'normal2']
+
+
+def test_adaptive_limit_cancelled_waiter_releases_nothing():
+    async def run():
+        limit = AdaptiveLimit('test', initial=1, maximum=1)
+        async with limit.slot():
+            waiter = asyncio.create_task(limit.slot(0).__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        assert limit.in_flight == 0 and not limit._waiters
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+# -*- encoding: utf-8 -*-
+
+import asyncio
+import os
+
+import pytest
+
+from src import spider
+from src.http_clients.replay import http_replay
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'http')
+ROOM_URL = 'https://live.bilibili.com/22603245'
+
+
+@pytest.fixture
+def replaying():
+    http_replay.configure('replay', FIXTURES, 0)
+    try:
+        yield http_replay
+    finally:
+        http_replay.configure('off')
+
+
+def test_replay_bilibili_room(replaying):
+    """夹具录制自 benchmarks/mock_platform_server.py，回放时不访问网络"""
+    info = asyncio.run(spider.get_bilibili_room_info(ROOM_URL))
+    assert info['live_status'] is True
+    assert info['anchor_name'] == 'bilibili主播22603245'
+    assert info['title'] == 'B站直播间22603245'
+
+
+def test_replay_restores_recorded_headers(replaying):
+    url = 'https://api.live.bilibili.com/room/v1/Room/room_init?id=22603245'
+    response = asyncio.run(replaying.replay('GET', url))
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json; charset=utf-8'
+    assert response.json()['data']['live_status'] == 1
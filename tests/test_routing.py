@@ -0,0 +1,33 @@
+# -*- encoding: utf-8 -*-
+
+from src.routing import DEFAULT_GROUP, DeliveryTarget, RoutingIndex, deep_merge
+
+GLOBAL_PUSH = {'channels': ['dingtalk', 'bark'], 'custom_start_msg': 'global start'}
+GROUPS = {'team_a': {'channels': ['feishu'], 'custom_start_msg': 'team start'}}
+
+
+def make_index() -> RoutingIndex:
+    def factory(name: str, overrides: dict) -> DeliveryTarget:
+        config = deep_merge(GLOBAL_PUSH, overrides)
+        return DeliveryTarget(name, config, set(config['channels']), config.get('custom_start_msg'), None)
+
+    default = DeliveryTarget(DEFAULT_GROUP, GLOBAL_PUSH, set(GLOBAL_PUSH['channels']), 'global start', None)
+    return RoutingIndex(factory, default)
+
+
+def test_room_fields_override_group_targets():
+    """房间级模板应用到所在分组，而不是额外推送到全局渠道"""
+    index = make_index()
+    index.rebuild([{'url': 'u1', 'name': 'A', 'groups': ['team_a'], 'template': 'room start'}], GROUPS)
+    targets = index.targets_for('u1')
+    assert len(targets) == 1
+    assert targets[0].channels == {'feishu'}
+    assert targets[0].start_template == 'room start'
+
+
+def test_room_fields_without_groups_override_global():
+    index = make_index()
+    index.rebuild([{'url': 'u1', 'name': 'A', 'channels': ['bark']},
+                   {'url': 'u2', 'name': 'B', 'groups': ['team_a', DEFAULT_GROUP]}], GROUPS)
+    assert [t.channels for t in index.targets_for('u1')] == [{'bark'}]
+    assert [t.channels for t in index.targets_for('u2')] == [{'feishu'}, {'dingtalk', 'bark'}]
@@ -0,0 +1,31 @@
+# -*- encoding: utf-8 -*-
+
+import asyncio
+from collections import Counter
+
+from src.scheduler import RoomScheduler
+
+
+def test_high_priority_not_starved_by_backlog():
+    """单个工作任务、大量已到期的低优先级直播间时，高优先级直播间仍按自己的间隔被检测"""
+    checks = Counter()
+
+    async def handler(item):
+        checks[item['priority']] += 1
+        await asyncio.sleep(0.05)
+
+    async def run():
+        scheduler = RoomScheduler(handler, interval=1000, workers=1, tick=0.01,
+                                  intervals={'high': 0.5, 'low': 1000})
+        rooms = [{'url': f'https://example.com/low/{i}', 'name': f'low{i}', 'priority': 'low'}
+                 for i in range(100)]
+        rooms.append({'url': 'https://example.com/high', 'name': 'high', 'priority': 'high'})
+        scheduler.start()
+        scheduler.sync(rooms)
+        await asyncio.sleep(2)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    # 2 秒内低优先级的积压检测不完，高优先级每 0.5 秒应检测一次
+    assert checks['low'] < 100
+    assert checks['high'] >= 3